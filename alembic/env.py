@@ -35,6 +35,11 @@ def get_url():
         return Settings.DB_URL
 
 
+def is_sqlite(url: str | None) -> bool:
+    # batch mode (table copy) is only needed where ALTER TABLE is limited
+    return bool(url) and str(url).startswith("sqlite")
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -53,7 +58,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
-        render_as_batch=True,
+        render_as_batch=is_sqlite(url),
+        transaction_per_migration=True,
     )
 
     with context.begin_transaction():
@@ -75,9 +81,20 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+            # short transactions, app.db.migration steps commit on their own
+            transaction_per_migration=True,
         )
 
+        if Settings.MIGRATION_DRY_RUN:
+            # online migration steps only log, the rest is rolled back
+            with connection.begin() as transaction:
+                context.run_migrations()
+                transaction.rollback()
+            return
+
         with context.begin_transaction():
             context.run_migrations()
 
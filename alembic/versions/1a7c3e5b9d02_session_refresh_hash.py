@@ -0,0 +1,43 @@
+"""session refresh hash
+
+Add sessions.refresh_hash, the sha256 of the current refresh token
+secret of the session (see SessionService.rotate_refresh), and
+sessions.previous_refresh_hash, the one it replaced, whose replay
+revokes the session. Sessions created before have none and cannot be
+refreshed, their users log in again.
+
+Revision ID: 1a7c3e5b9d02
+Revises:
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migration import OnlineMigration
+
+# revision identifiers, used by Alembic.
+revision: str = "1a7c3e5b9d02"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    online = OnlineMigration(op)
+    online.add_column(
+        "sessions", sa.Column("refresh_hash", sa.String(64), nullable=True)
+    )
+    online.add_column(
+        "sessions",
+        sa.Column("previous_refresh_hash", sa.String(64), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    online = OnlineMigration(op)
+    online.drop_column("sessions", "previous_refresh_hash")
+    online.drop_column("sessions", "refresh_hash")
@@ -0,0 +1,36 @@
+"""session last seen
+
+Add sessions.last_seen, the last authenticated use of the session
+written behind by the activity buffer and read by the idle timeout.
+Existing sessions start from their creation time.
+
+Revision ID: 2b8d4f6a0e13
+Revises: 1a7c3e5b9d02
+Create Date: 2026-10-19 20:05:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migration import OnlineMigration
+
+# revision identifiers, used by Alembic.
+revision: str = "2b8d4f6a0e13"
+down_revision: Union[str, None] = "1a7c3e5b9d02"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    online = OnlineMigration(op)
+    online.add_column(
+        "sessions", sa.Column("last_seen", sa.DateTime(), nullable=True)
+    )
+    online.backfill("sessions", "last_seen = create_date", "last_seen IS NULL")
+
+
+def downgrade() -> None:
+    OnlineMigration(op).drop_column("sessions", "last_seen")
@@ -0,0 +1,40 @@
+"""user token version
+
+Add platform_users.token_version, bumped to revoke every access token
+issued to the user. The constant server default fills existing rows
+without rewriting the table.
+
+Revision ID: 3c9e5a7b1f24
+Revises: 2b8d4f6a0e13
+Create Date: 2026-10-19 20:10:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migration import OnlineMigration
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9e5a7b1f24"
+down_revision: Union[str, None] = "2b8d4f6a0e13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    OnlineMigration(op).add_column(
+        "platform_users",
+        sa.Column(
+            "token_version",
+            sa.Integer(),
+            server_default="0",
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    OnlineMigration(op).drop_column("platform_users", "token_version")
@@ -0,0 +1,50 @@
+"""lookup indexes
+
+Indexes the application queries rely on:
+
+- ix_platform_users_username_lower: case insensitive username lookups
+- ix_sessions_create_date_id: keyset pagination of sessions
+- ix_sessions_platform_user_id: sessions of a user (login, revocation)
+
+Built CONCURRENTLY on PostgreSQL, writes go on meanwhile.
+
+Revision ID: 4b1e7d9f3a46
+Revises: 3c9e5a7b1f24
+Create Date: 2026-10-19 20:15:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migration import OnlineMigration
+
+# revision identifiers, used by Alembic.
+revision: str = "4b1e7d9f3a46"
+down_revision: Union[str, None] = "3c9e5a7b1f24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    online = OnlineMigration(op)
+    online.create_index(
+        "ix_platform_users_username_lower",
+        "platform_users",
+        [sa.text("lower(username)")],
+    )
+    online.create_index(
+        "ix_sessions_create_date_id", "sessions", ["create_date", "id"]
+    )
+    online.create_index(
+        "ix_sessions_platform_user_id", "sessions", ["platform_user_id"]
+    )
+
+
+def downgrade() -> None:
+    online = OnlineMigration(op)
+    online.drop_index("ix_sessions_platform_user_id", "sessions")
+    online.drop_index("ix_sessions_create_date_id", "sessions")
+    online.drop_index("ix_platform_users_username_lower", "platform_users")
@@ -0,0 +1,279 @@
+"""compact identifiers
+
+Store platform_users.hash_id and sessions.id as native UUID instead of
+their hex text, and make sessions.platform_user_id reference the integer
+platform_users.id. Ids stay 32 characters hex in the API.
+
+Opt-in: the application must run with COMPACT_IDS=true once this is
+applied, the migration refuses to run without it.
+
+Online on PostgreSQL (see app.db.migration): new columns are added and
+backfilled in batches while triggers keep them in sync with the writes
+of the running application, then swapped with the old ones in one short
+transaction. Restart the application with COMPACT_IDS=true right after.
+
+On SQLite, which cannot alter columns in place, both tables are
+rebuilt with the COMPACT_IDS=true schema and their rows copied over, in
+one go: stop the application and back the database file up first.
+
+Without COMPACT_IDS, upgrade to the previous revision (4b1e7d9f3a46)
+only and leave this one unapplied.
+
+Revision ID: 4c2d8e1f6a90
+Revises: 4b1e7d9f3a46
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+from typing import Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.settings import Settings
+from app.db.migration import IrreversibleMigration, OnlineMigration, log
+
+# revision identifiers, used by Alembic.
+revision: str = "4c2d8e1f6a90"
+down_revision: Union[str, None] = "4b1e7d9f3a46"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# new columns filled by the writes of the application until the swap
+SYNC_USERS = (
+    """
+    CREATE OR REPLACE FUNCTION compact_ids_platform_users() RETURNS trigger
+    AS $$
+    BEGIN
+        NEW.hash_uuid := CAST(NEW.hash_id AS uuid);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER compact_ids
+    BEFORE INSERT OR UPDATE OF hash_id ON platform_users
+    FOR EACH ROW EXECUTE FUNCTION compact_ids_platform_users()
+    """,
+)
+SYNC_SESSIONS = (
+    """
+    CREATE OR REPLACE FUNCTION compact_ids_sessions() RETURNS trigger
+    AS $$
+    BEGIN
+        NEW.id_uuid := CAST(NEW.id AS uuid);
+        NEW.user_ref := (
+            SELECT p.id FROM platform_users AS p
+            WHERE p.hash_id = NEW.platform_user_id
+        );
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER compact_ids
+    BEFORE INSERT OR UPDATE OF id, platform_user_id ON sessions
+    FOR EACH ROW EXECUTE FUNCTION compact_ids_sessions()
+    """,
+)
+# every index is built beforehand, only catalog changes take the locks;
+# dropping the old columns drops their indexes and constraints
+SWAP = (
+    "DROP TRIGGER compact_ids ON sessions",
+    "DROP TRIGGER compact_ids ON platform_users",
+    "DROP FUNCTION compact_ids_sessions()",
+    "DROP FUNCTION compact_ids_platform_users()",
+    "ALTER TABLE sessions DROP CONSTRAINT sessions_platform_user_id_fkey",
+    "ALTER TABLE sessions DROP CONSTRAINT sessions_pkey",
+    "ALTER TABLE sessions DROP COLUMN id",
+    "ALTER TABLE sessions DROP COLUMN platform_user_id",
+    "ALTER TABLE sessions RENAME COLUMN id_uuid TO id",
+    "ALTER TABLE sessions RENAME COLUMN user_ref TO platform_user_id",
+    "ALTER TABLE sessions ADD CONSTRAINT sessions_pkey"
+    " PRIMARY KEY USING INDEX ux_sessions_id_uuid",
+    "ALTER INDEX ix_sessions_create_date_id_uuid"
+    " RENAME TO ix_sessions_create_date_id",
+    "ALTER INDEX ix_sessions_user_ref RENAME TO ix_sessions_platform_user_id",
+    "ALTER TABLE platform_users DROP COLUMN hash_id",
+    "ALTER TABLE platform_users RENAME COLUMN hash_uuid TO hash_id",
+    "ALTER TABLE platform_users ADD CONSTRAINT platform_users_hash_id_key"
+    " UNIQUE USING INDEX ux_platform_users_hash_uuid",
+    # checked afterwards, without blocking writes
+    "ALTER TABLE sessions ADD CONSTRAINT sessions_platform_user_id_fkey"
+    " FOREIGN KEY (platform_user_id) REFERENCES platform_users (id)"
+    " NOT VALID",
+)
+
+
+def compact_tables(metadata: sa.MetaData) -> Tuple[sa.Table, sa.Table]:
+    """
+    Tables of this revision with COMPACT_IDS=true as stored by SQLite,
+    frozen here: later model changes come with their own revisions.
+    """
+
+    def base_columns() -> Sequence[sa.Column]:
+        return (
+            sa.Column("is_active", sa.SmallInteger(), nullable=False),
+            sa.Column("create_date", sa.DateTime(), nullable=False),
+            sa.Column("update_date", sa.DateTime(), nullable=False),
+        )
+
+    users = sa.Table(
+        "platform_users",
+        metadata,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("hash_id", sa.LargeBinary(16), nullable=False, unique=True),
+        sa.Column("username", sa.String(128), nullable=False, unique=True),
+        sa.Column("email", sa.String(128), nullable=False, unique=True),
+        sa.Column("pass_hash", sa.String(128), nullable=False),
+        sa.Column(
+            "token_version", sa.Integer(), server_default="0", nullable=False
+        ),
+        *base_columns(),
+        sa.Index("ix_platform_users_id", "id"),
+        sa.Index(
+            "ix_platform_users_username_lower", sa.text("lower(username)")
+        ),
+    )
+    sessions = sa.Table(
+        "sessions",
+        metadata,
+        sa.Column("id", sa.LargeBinary(16), primary_key=True),
+        sa.Column(
+            "platform_user_id",
+            sa.Integer(),
+            sa.ForeignKey("platform_users.id"),
+            nullable=False,
+        ),
+        sa.Column("refresh_hash", sa.String(64)),
+        sa.Column("previous_refresh_hash", sa.String(64)),
+        sa.Column("last_seen", sa.DateTime()),
+        *base_columns(),
+        sa.Index("ix_sessions_id", "id"),
+        sa.Index("ix_sessions_create_date_id", "create_date", "id"),
+        sa.Index("ix_sessions_platform_user_id", "platform_user_id"),
+    )
+    return users, sessions
+
+
+def upgrade() -> None:
+    if not Settings.COMPACT_IDS:
+        raise RuntimeError(
+            "compact identifiers are opt-in: run with COMPACT_IDS=true, "
+            "as the application must after this migration, or upgrade "
+            f"to {down_revision} only"
+        )
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        upgrade_sqlite()
+        return
+    if dialect != "postgresql":
+        raise RuntimeError(f"compact identifiers: {dialect} not supported")
+
+    online = OnlineMigration(op)
+    # expand
+    online.add_column(
+        "platform_users", sa.Column("hash_uuid", postgresql.UUID())
+    )
+    online.add_column("sessions", sa.Column("id_uuid", postgresql.UUID()))
+    online.add_column("sessions", sa.Column("user_ref", sa.Integer()))
+    online.execute("platform_users", *SYNC_USERS)
+    online.execute("sessions", *SYNC_SESSIONS)
+
+    online.backfill(
+        "platform_users",
+        "hash_uuid = CAST(hash_id AS uuid)",
+        "hash_uuid IS NULL",
+    )
+    online.backfill(
+        "sessions",
+        """
+        id_uuid = CAST(id AS uuid),
+        user_ref = (
+            SELECT p.id FROM platform_users AS p
+            WHERE p.hash_id = sessions.platform_user_id
+        )
+        """,
+        "id_uuid IS NULL",
+    )
+    online.set_not_null("platform_users", "hash_uuid")
+    online.set_not_null("sessions", "id_uuid")
+    online.set_not_null("sessions", "user_ref")
+
+    online.create_index(
+        "ux_platform_users_hash_uuid",
+        "platform_users",
+        ["hash_uuid"],
+        unique=True,
+    )
+    online.create_index(
+        "ux_sessions_id_uuid", "sessions", ["id_uuid"], unique=True
+    )
+    online.create_index("ix_sessions_user_ref", "sessions", ["user_ref"])
+    online.create_index(
+        "ix_sessions_create_date_id_uuid",
+        "sessions",
+        ["create_date", "id_uuid"],
+    )
+
+    # contract
+    online.execute("sessions", *SWAP)
+    online.execute(
+        "sessions",
+        "ALTER TABLE sessions VALIDATE CONSTRAINT"
+        " sessions_platform_user_id_fkey",
+    )
+
+
+def upgrade_sqlite() -> None:
+    """
+    Rebuild both tables with the schema of COMPACT_IDS=true and copy the
+    rows, hex ids converted to their 16 bytes and sessions pointed at the
+    integer user id.
+    """
+    if Settings.MIGRATION_DRY_RUN:
+        log.info("[dry run] rebuild platform_users and sessions")
+        return
+
+    bind = op.get_bind()
+    # hex text to the bytes stored by CompactId (no unhex() before 3.41)
+    bind.connection.driver_connection.create_function(
+        "compact_id", 1, bytes.fromhex, deterministic=True
+    )
+    metadata = sa.MetaData()
+    users_table, sessions_table = compact_tables(metadata)
+    # index names are global, the legacy tables must give theirs up
+    for table in (users_table, sessions_table):
+        for index in table.indexes:
+            op.execute(f"DROP INDEX IF EXISTS {index.name}")
+    op.rename_table("sessions", "sessions_legacy")
+    op.rename_table("platform_users", "platform_users_legacy")
+    metadata.create_all(bind)
+
+    users = [column.name for column in users_table.columns]
+    converted = {"hash_id": "compact_id(hash_id)"}
+    op.execute(
+        f"INSERT INTO platform_users ({', '.join(users)})"
+        f" SELECT {', '.join(converted.get(name, name) for name in users)}"
+        " FROM platform_users_legacy"
+    )
+    sessions = [column.name for column in sessions_table.columns]
+    converted = {"id": "compact_id(s.id)", "platform_user_id": "p.id"}
+    op.execute(
+        f"INSERT INTO sessions ({', '.join(sessions)})"
+        " SELECT "
+        + ", ".join(converted.get(name, f"s.{name}") for name in sessions)
+        + " FROM sessions_legacy AS s"
+        " JOIN platform_users_legacy AS p"
+        " ON p.hash_id = s.platform_user_id"
+    )
+    op.drop_table("sessions_legacy")
+    op.drop_table("platform_users_legacy")
+
+
+def downgrade() -> None:
+    raise IrreversibleMigration(
+        revision,
+        "the text ids are dropped by the upgrade, restore a backup",
+    )
@@ -10,6 +10,11 @@ class ResponseMsg(Enum):
     INTERNAL_ERROR = "Internal server error"
     BAD_REQUEST = "Bad request"
     NOT_FOUND = "Data not found"
+    VALIDATION_ERROR = "Validation error"
+    TOO_MANY_REQUESTS = "Too many requests, try again later"
+    OVERLOADED = "Server is busy, try again later"
+    DB_UNAVAILABLE = "Database is unavailable, try again later"
+    DEADLINE_EXCEEDED = "Request took too long"
 
 
 class LogMsg(Enum):
@@ -27,4 +32,7 @@ class ExcludeAuthMiddlewarePath(Enum):
     DOCS = "/docs"
     LOGIN = "/login"
     REGISTER = "/register"
+    REFRESH = "/refresh"
+    USERNAME_AVAILABLE = "/username-available"
     HEALTH_CHECK = "/health"
+    METRICS = "/metrics"
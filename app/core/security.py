@@ -0,0 +1,9 @@
+from functools import cache
+
+from passlib.context import CryptContext
+
+
+@cache
+def get_pwd_context() -> CryptContext:
+    """Password hashing context shared across the application."""
+    return CryptContext(schemes=["argon2"], deprecated="auto")
@@ -0,0 +1,286 @@
+import gc
+import logging
+import os
+import secrets
+import signal
+import socket
+import sys
+import time
+from types import FrameType
+from typing import Any, Dict, List
+
+import uvicorn
+
+logger = logging.getLogger("prefork")
+
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """
+    Resident (RSS) and proportional (PSS) memory of a process in KB.
+    PSS splits copy-on-write pages shared with the master between the
+    processes sharing them, so it shows the real cost of one worker.
+    """
+    memory = {"rss_kb": 0, "pss_kb": 0}
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            pages = int(statm.read().split()[1])
+        memory["rss_kb"] = pages * os.sysconf("SC_PAGE_SIZE") // 1024
+        with open(f"/proc/{pid}/smaps_rollup") as smaps:
+            for line in smaps:
+                if line.startswith("Pss:"):
+                    memory["pss_kb"] = int(line.split()[1])
+                    break
+    except (OSError, ValueError, IndexError):
+        pass  # not on Linux or process already gone
+    return memory
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn server leaving gracefully once RSS passes `max_rss_kb`."""
+
+    RSS_CHECK_TICKS = 50  # main loop ticks every 0.1s
+
+    def __init__(self, config: uvicorn.Config, max_rss_kb: int) -> None:
+        super().__init__(config)
+        self.max_rss_kb = max_rss_kb
+
+    async def on_tick(self, counter: int) -> bool:
+        if await super().on_tick(counter):
+            return True
+
+        if self.max_rss_kb and counter % _WorkerServer.RSS_CHECK_TICKS == 0:
+            rss_kb = process_memory(os.getpid())["rss_kb"]
+            if rss_kb > self.max_rss_kb:
+                logger.info(f"Worker {os.getpid()} RSS {rss_kb}KB, recycle")
+                return True
+
+        return False
+
+
+class PreforkServer:
+    """
+    Pre-forking process manager: the application is imported once in the
+    master, `gc.freeze()` moves every object created so far out of GC
+    tracking (so collections in workers do not touch, and thus copy,
+    the shared pages), then N workers are forked sharing that memory
+    copy-on-write and the listening socket.
+
+    Workers are replaced when they exit: after `max_requests` (+ random
+    jitter so they do not all restart together) or when RSS passes
+    `max_rss_mb`. SIGTERM/SIGINT drain workers gracefully, SIGHUP
+    replaces all workers, forking the new ones before the old drain.
+    """
+
+    POLL_INTERVAL = 0.5  # seconds
+
+    def __init__(
+        self,
+        app: Any,
+        host: str,
+        port: int,
+        workers: int,
+        max_requests: int = 0,
+        max_requests_jitter: int = 0,
+        max_rss_mb: int = 0,
+        graceful_timeout: int = 30,
+        report_interval: int = 60,
+        forwarded_allow_ips: str = "127.0.0.1",
+    ) -> None:
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_rss_mb = max_rss_mb
+        self.graceful_timeout = graceful_timeout
+        self.report_interval = report_interval
+        self.forwarded_allow_ips = forwarded_allow_ips
+        self._children: Dict[int, int] = {}  # pid: worker number
+        self._sock: socket.socket | None = None
+        self._stopping = False
+        self._recycle = False
+
+    def run(self) -> None:
+        """Bind, fork workers and supervise them until asked to stop."""
+        self._sock = self._bind()
+        gc.collect()
+        gc.freeze()
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_recycle)
+
+        logger.info(
+            f"Master {os.getpid()} listening on {self.host}:{self.port}, "
+            f"{self.workers} workers"
+        )
+        for number in range(self.workers):
+            self._spawn(number)
+
+        last_report = time.monotonic()
+        while not self._stopping:
+            self._reap()
+            if self._recycle:
+                self._recycle = False
+                self._recycle_workers()
+            if time.monotonic() - last_report >= self.report_interval:
+                last_report = time.monotonic()
+                self.report()
+            time.sleep(PreforkServer.POLL_INTERVAL)
+
+        self._shutdown()
+
+    def report(self) -> Dict[int, Dict[str, int]]:
+        """Log and return memory of every worker."""
+        memory = {pid: process_memory(pid) for pid in self._children}
+        for pid, mem in memory.items():
+            logger.info(
+                f"Worker {pid}: rss={mem['rss_kb']}KB pss={mem['pss_kb']}KB"
+            )
+        return memory
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, number: int) -> None:
+        pid = os.fork()
+        if pid:
+            self._children[pid] = number
+            return
+
+        # worker process
+        code = 0
+        try:
+            self._serve_worker()
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} crashed")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _serve_worker(self) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)  # uvicorn installs its own
+
+        server = _WorkerServer(
+            self.worker_config(), max_rss_kb=self.max_rss_mb * 1024
+        )
+        server.run(sockets=[self._sock] if self._sock else None)
+
+    def worker_config(self) -> uvicorn.Config:
+        """uvicorn config of one worker, max requests jittered per worker"""
+        max_requests = None
+        if self.max_requests:
+            jitter = secrets.randbelow(self.max_requests_jitter + 1)
+            max_requests = self.max_requests + jitter
+
+        return uvicorn.Config(
+            self.app,
+            lifespan="on",
+            limit_max_requests=max_requests,
+            timeout_graceful_shutdown=self.graceful_timeout,
+            access_log=False,
+            # client address from X-Forwarded-For, only sent by these peers
+            proxy_headers=True,
+            forwarded_allow_ips=self.forwarded_allow_ips,
+        )
+
+    def _reap(self) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+
+            number = self._children.pop(pid, None)
+            if number is None:
+                continue
+
+            logger.info(
+                f"Worker {pid} exited ({os.waitstatus_to_exitcode(status)})"
+            )
+            if not self._stopping:
+                self._spawn(number)
+
+    def _recycle_workers(self) -> None:
+        """
+        Replace every worker: the replacements are forked first and serve
+        the socket while the old workers drain their requests.
+        """
+        retiring = list(self._children.items())
+        self._children.clear()  # not respawned by _reap when they exit
+        for _, number in retiring:
+            self._spawn(number)
+        self._stop_workers([pid for pid, _ in retiring])
+        logger.info(f"Recycled {len(retiring)} workers")
+
+    def _stop_workers(self, pids: List[int]) -> None:
+        """
+        SIGTERM all given workers at once, wait for them with a single
+        `graceful_timeout` deadline, then SIGKILL those still running.
+        """
+        for pid in pids:
+            _kill(pid, signal.SIGTERM)
+
+        pending = set(pids)
+        deadline = time.monotonic() + self.graceful_timeout
+        while pending and time.monotonic() < deadline:
+            pending = {pid for pid in pending if not _exited(pid)}
+            self._reap()  # keep replacing workers crashing meanwhile
+            if pending:
+                time.sleep(0.1)
+
+        for pid in pending:
+            logger.info(f"Worker {pid} did not drain in time, killing")
+            _kill(pid, signal.SIGKILL)
+            _exited(pid, block=True)
+
+    def _shutdown(self) -> None:
+        logger.info("Draining workers")
+        pids = list(self._children)
+        self._children.clear()
+        self._stop_workers(pids)
+        if self._sock:
+            self._sock.close()
+
+    def _handle_stop(self, signum: int, frame: FrameType | None) -> None:
+        self._stopping = True
+
+    def _handle_recycle(self, signum: int, frame: FrameType | None) -> None:
+        self._recycle = True
+
+
+def _kill(pid: int, sig: int) -> None:
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass  # already exited
+
+
+def _exited(pid: int, block: bool = False) -> bool:
+    """Reap the worker if it exited, True when it is gone."""
+    try:
+        done, _ = os.waitpid(pid, 0 if block else os.WNOHANG)
+    except ChildProcessError:
+        return True  # already reaped
+    return bool(done)
+
+
+def setup_logging() -> None:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(
+        logging.Formatter(
+            "%(asctime)s - %(levelname)s - [prefork] %(message)s"
+        )
+    )
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from typing import Final
 
@@ -18,10 +19,126 @@ class Settings:
     INFO_LOG_FILE: Final = "app.info.log"
     ERR_LOG_FILE: Final = "app.err.log"
 
+    # observability
+    SERVER_TIMING: Final = os.getenv("SERVER_TIMING", "").lower() == "true"
+    # shared dir to aggregate metrics across workers, empty = per process
+    METRICS_DIR: Final = os.getenv("METRICS_DIR", "")
+    # per-request profiling, on a valid signed X-Profile header (needs
+    # PROFILE_SECRET) or at PROFILE_SAMPLE_RATE (0..1) of the requests
+    PROFILE_DIR: Final = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_SECRET: Final = os.getenv("PROFILE_SECRET", "")
+    PROFILE_SAMPLE_RATE: Final = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS: Final = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_MAX_MB: Final = int(os.getenv("PROFILE_MAX_MB", "100"))
+
+    # gzip of responses: bodies under COMPRESSION_MIN_SIZE bytes are not
+    # worth it, only listed content types are compressed
+    COMPRESSION_MIN_SIZE: Final = int(
+        os.getenv("COMPRESSION_MIN_SIZE", "1024")
+    )
+    COMPRESSION_LEVEL: Final = int(os.getenv("COMPRESSION_LEVEL", "6"))
+    COMPRESSION_TYPES: Final = frozenset(
+        media_type.strip().lower()
+        for media_type in os.getenv(
+            "COMPRESSION_TYPES",
+            "application/json,application/x-ndjson,text/plain,text/html",
+        ).split(",")
+        if media_type.strip()
+    )
+
     # database
     DB_DIALECT: Final = os.getenv("DB_DIALECT", "")
     DB_URL: Final = os.getenv(f"DB_{DB_DIALECT}_URL", "")
+    # opt-in schema: user and session ids stored as UUID/16 bytes and
+    # sessions referencing the integer platform_users.id (see app.db.ids)
+    COMPACT_IDS: Final = os.getenv("COMPACT_IDS", "").lower() == "true"
+    # statements slower than this are logged with their EXPLAIN plan
+    SLOW_QUERY_MS: Final = float(os.getenv("SLOW_QUERY_MS", "100"))
+    SLOW_QUERY_EXPLAIN: Final = (
+        os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+    )
+    # circuit breaker: open when this share of the database calls of the
+    # last DB_BREAKER_WINDOW seconds (at least DB_BREAKER_MIN_CALLS) fail
+    # to reach it, reject calls for DB_BREAKER_OPEN_SECONDS, then close
+    # after DB_BREAKER_PROBES successful trial calls; 0 rate disables it
+    DB_BREAKER_FAILURE_RATE: Final = float(
+        os.getenv("DB_BREAKER_FAILURE_RATE", "0.5")
+    )
+    DB_BREAKER_MIN_CALLS: Final = int(os.getenv("DB_BREAKER_MIN_CALLS", "10"))
+    DB_BREAKER_WINDOW: Final = int(os.getenv("DB_BREAKER_WINDOW", "10"))
+    DB_BREAKER_OPEN_SECONDS: Final = float(
+        os.getenv("DB_BREAKER_OPEN_SECONDS", "5")
+    )
+    DB_BREAKER_PROBES: Final = int(os.getenv("DB_BREAKER_PROBES", "3"))
+
+    # startup: prime pool connections, hashing and JWT before serving
+    WARMUP: Final = os.getenv("WARMUP", "").lower() == "true"
+    WARMUP_DB_CONNECTIONS: Final = int(os.getenv("WARMUP_DB_CONNECTIONS", "2"))
+
+    # online migrations: how long DDL may wait for its table lock before
+    # giving up (and retrying), so it never queues logins behind it
+    MIGRATION_LOCK_TIMEOUT_MS: Final = int(
+        os.getenv("MIGRATION_LOCK_TIMEOUT_MS", "2000")
+    )
+    # log the rows each online migration step would touch, change nothing
+    MIGRATION_DRY_RUN: Final = (
+        os.getenv("MIGRATION_DRY_RUN", "").lower() == "true"
+    )
+
+    # rate limit state: sqlite:///path (shared by the workers of a host),
+    # redis://host:port/db (shared by every host), memory:// (per worker,
+    # the limits are multiplied by the worker count) or none:// (disabled)
+    # client ip is taken from X-Forwarded-For (set by nginx) only for
+    # proxies trusted by FORWARDED_ALLOW_IPS (see main.py)
+    RATE_LIMIT_BACKEND: Final = os.getenv(
+        "RATE_LIMIT_BACKEND",
+        "sqlite:///"
+        + os.path.join(tempfile.gettempdir(), "lockerroom_rate_limit.db"),
+    )
+
+    # admission control per worker: concurrent requests, queued requests
+    # and max queue wait (seconds) of argon2 bound login/register routes
+    # and of every other route
+    ADMISSION_HEAVY_LIMIT: Final = int(
+        os.getenv("ADMISSION_HEAVY_LIMIT", str(os.cpu_count() or 1))
+    )
+    ADMISSION_HEAVY_QUEUE: Final = int(
+        os.getenv("ADMISSION_HEAVY_QUEUE", "32")
+    )
+    ADMISSION_HEAVY_TIMEOUT: Final = float(
+        os.getenv("ADMISSION_HEAVY_TIMEOUT", "2")
+    )
+    ADMISSION_LIMIT: Final = int(os.getenv("ADMISSION_LIMIT", "64"))
+    ADMISSION_QUEUE: Final = int(os.getenv("ADMISSION_QUEUE", "256"))
+    ADMISSION_TIMEOUT: Final = float(os.getenv("ADMISSION_TIMEOUT", "5"))
+
+    # request deadlines (seconds, 0 = none) of the argon2 bound
+    # login/register routes and of every other route; clients may ask for
+    # another one with the X-Request-Timeout header, up to
+    # REQUEST_DEADLINE_MAX (0 = header ignored)
+    REQUEST_DEADLINE_HEAVY: Final = float(
+        os.getenv("REQUEST_DEADLINE_HEAVY", "15")
+    )
+    REQUEST_DEADLINE: Final = float(os.getenv("REQUEST_DEADLINE", "10"))
+    REQUEST_DEADLINE_MAX: Final = float(
+        os.getenv("REQUEST_DEADLINE_MAX", "30")
+    )
 
     # authentication
     ALGO: Final = os.getenv("ALGORITHM", "")
     SECRET_KEY: Final = os.getenv("SECRET_KEY", "")
+    # usernames allowed to use the admin API, comma separated
+    ADMIN_USERNAMES: Final = frozenset(
+        name.strip()
+        for name in os.getenv("ADMIN_USERNAMES", "").split(",")
+        if name.strip()
+    )
+    # seconds a worker may keep using a cached user token version, so a
+    # revocation made on another worker takes at most this long
+    TOKEN_VERSION_TTL: Final = float(os.getenv("TOKEN_VERSION_TTL", "5"))
+    # seconds between two reads of the usernames registered since, so a
+    # name registered through another worker is reported available at
+    # most this long; also the retry delay of a failed filter build
+    USERNAME_FILTER_REFRESH: Final = float(
+        os.getenv("USERNAME_FILTER_REFRESH", "5")
+    )
@@ -0,0 +1,213 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Final, List, Tuple
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import Connection, ExceptionContext
+from sqlalchemy.pool import ConnectionPoolEntry
+from sqlalchemy.exc import DBAPIError
+
+from app.core.constants import ResponseMsg
+from app.helpers.exceptions import DatabaseUnavailable
+from app.helpers.logger import logger
+from app.helpers.metrics import (
+    DB_BREAKER_REJECTED,
+    DB_BREAKER_STATE,
+    DB_BREAKER_TRANSITIONS,
+)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the database is unreachable, instead of every request
+    waiting for its own connect or network timeout:
+
+    - closed: calls go through; once at least `min_calls` were made in
+      the last `window` seconds and `failure_rate` of them failed to
+      reach the database, the breaker opens
+    - open: calls are rejected at once with DatabaseUnavailable for
+      `open_seconds`, then the breaker turns half-open
+    - half-open: `probes` trial calls go through, the breaker closes when
+      they all succeed and opens again on the first failure
+
+    A call is a statement, together with the connect it triggered. Only
+    connectivity failures (failed connects, disconnects) count, any other
+    database error (constraint violation, sqlite "database is locked")
+    means the database answered.
+    """
+
+    CLOSED: Final = "closed"
+    OPEN: Final = "open"
+    HALF_OPEN: Final = "half_open"
+    # pool entry info key: the connect already took the trial of the call
+    TRIAL: Final = "breaker_trial"
+
+    def __init__(
+        self,
+        failure_rate: float,
+        min_calls: int,
+        window: int,
+        open_seconds: float,
+        probes: int,
+    ) -> None:
+        """
+        Args:
+            - failure_rate: failed share of calls opening the breaker,
+              0 disables it
+            - min_calls: calls in the window before the rate is judged
+            - window: seconds of calls the failure rate is computed on
+            - open_seconds: rejection time before trial calls
+            - probes: successful trial calls closing the breaker
+        """
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = max(window, 1)
+        self.open_seconds = open_seconds
+        self.probes = max(probes, 1)
+        self.state = CircuitBreaker.CLOSED
+        self._lock = threading.Lock()
+        # per second: [second, calls, failures]
+        self._buckets: Deque[List[int]] = deque()
+        self._opened_at = 0.0
+        self._trials = 0  # trial calls let through while half-open
+        self._successes = 0  # successful trial calls
+        DB_BREAKER_STATE.inc(self.state)
+
+    def attach(self, engine: Engine) -> None:
+        """Guard every new connection and every statement of the engine."""
+        event.listen(engine, "do_connect", self._before_connect)
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "handle_error", self._on_error)
+
+    def allow(self) -> bool:
+        """
+        Return:
+            - trial: the call is a half-open trial call
+
+        Raise:
+            - DatabaseUnavailable: breaker is open, or half-open with all
+              its trial calls in flight
+        """
+        if self.state == CircuitBreaker.CLOSED or self.failure_rate <= 0:
+            return False
+
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CircuitBreaker.OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self._reject(self._opened_at + self.open_seconds - now)
+                self._transition(CircuitBreaker.HALF_OPEN)
+                self._opened_at = now
+                self._trials = 0
+                self._successes = 0
+            if self.state != CircuitBreaker.HALF_OPEN:
+                return False
+
+            if self._trials >= self.probes:
+                # trials whose outcome never came get another chance
+                if now - self._opened_at < self.open_seconds:
+                    self._reject(self.open_seconds)
+                self._opened_at = now
+                self._trials = 0
+            self._trials += 1
+            return True
+
+    def record_success(self) -> None:
+        # successes are only counted while the window holds a failure, so
+        # healthy traffic never takes the lock
+        if self.state == CircuitBreaker.CLOSED and not self._buckets:
+            return
+
+        with self._lock:
+            if self.state == CircuitBreaker.HALF_OPEN:
+                self._successes += 1
+                if self._successes >= self.probes:
+                    self._transition(CircuitBreaker.CLOSED)
+                    self._buckets.clear()
+            elif self.state == CircuitBreaker.CLOSED:
+                _, failures = self._count(failed=False)
+                if not failures:
+                    self._buckets.clear()
+
+    def record_failure(self) -> None:
+        if self.failure_rate <= 0:
+            return
+
+        with self._lock:
+            if self.state == CircuitBreaker.HALF_OPEN:
+                self._open()
+            elif self.state == CircuitBreaker.CLOSED:
+                calls, failures = self._count(failed=True)
+                if (
+                    calls >= self.min_calls
+                    and failures / calls >= self.failure_rate
+                ):
+                    self._open()
+
+    def _count(self, failed: bool) -> Tuple[int, int]:
+        """Add a call to the window, return its calls and failures."""
+        second = int(time.monotonic())
+        buckets = self._buckets
+        if not buckets or buckets[-1][0] != second:
+            buckets.append([second, 0, 0])
+        while buckets[0][0] <= second - self.window:
+            buckets.popleft()
+
+        buckets[-1][1] += 1
+        buckets[-1][2] += failed
+        calls = sum(bucket[1] for bucket in buckets)
+        failures = sum(bucket[2] for bucket in buckets)
+        return calls, failures
+
+    def _open(self) -> None:
+        self._transition(CircuitBreaker.OPEN)
+        self._opened_at = time.monotonic()
+        self._buckets.clear()
+        logger.error(
+            f"Database circuit breaker open for {self.open_seconds}s",
+            key="db.breaker",
+        )
+
+    def _transition(self, state: str) -> None:
+        DB_BREAKER_STATE.dec(self.state)
+        DB_BREAKER_STATE.inc(state)
+        DB_BREAKER_TRANSITIONS.inc(self.state, state)
+        self.state = state
+
+    def _reject(self, retry_after: float) -> None:
+        DB_BREAKER_REJECTED.inc()
+        raise DatabaseUnavailable(
+            ResponseMsg.DB_UNAVAILABLE.value, retry_after=retry_after
+        )
+
+    # engine hooks
+
+    def _before_connect(
+        self, dialect: Any, record: ConnectionPoolEntry, *args: Any
+    ) -> None:
+        # before the DBAPI connect: no connect timeout to wait for. The
+        # first statement on the connection is the rest of this call
+        if self.allow():
+            record.info[CircuitBreaker.TRIAL] = True
+        else:
+            record.info.pop(CircuitBreaker.TRIAL, None)
+
+    def _before_execute(self, conn: Connection, *args: Any) -> None:
+        if not conn.info.pop(CircuitBreaker.TRIAL, False):
+            self.allow()
+
+    def _after_execute(self, *args: Any) -> None:
+        self.record_success()
+
+    def _on_error(self, context: ExceptionContext) -> None:
+        if context.is_pre_ping or isinstance(
+            context.original_exception, DatabaseUnavailable
+        ):
+            return
+        # no connection: the connect itself failed
+        if context.is_disconnect or context.connection is None:
+            self.record_failure()
+        elif isinstance(context.sqlalchemy_exception, DBAPIError):
+            self.record_success()
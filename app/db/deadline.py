@@ -0,0 +1,89 @@
+import math
+from typing import Any, Final
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import Connection, ExceptionContext
+from sqlalchemy.exc import OperationalError
+
+from app.core.constants import ResponseMsg
+from app.helpers.exceptions import DeadlineExceeded
+from app.helpers.metrics import DEADLINE_EXCEEDED
+from app.helpers.tracing import RequestContext
+
+
+class StatementDeadline:
+    """
+    Bound the statements of a request by the time left before its
+    deadline (see RequestContext.set_deadline):
+
+    - postgresql: every transaction starts with `SET LOCAL
+      statement_timeout` to the remaining milliseconds
+    - sqlite: a progress handler interrupts the running statement once
+      the deadline passed
+
+    A statement started after the deadline, or cancelled by it, raises
+    DeadlineExceeded instead of the driver error. Statements run outside
+    of a request (no deadline) are never bounded.
+    """
+
+    STAGE: Final = "db"
+    # sqlite VM instructions between two deadline checks
+    PROGRESS_STEPS: Final = 1000
+
+    def attach(self, engine: Engine) -> None:
+        """
+        Must be attached before the circuit breaker, so a cancelled
+        statement never counts as a database failure.
+        """
+        if engine.dialect.name == "postgresql":
+            event.listen(engine, "begin", self._on_begin)
+        elif engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "handle_error", self._on_error)
+
+    def _on_begin(self, conn: Connection) -> None:
+        remaining = RequestContext.remaining()
+        if remaining is None:
+            return
+
+        # raw cursor: the transaction is being opened, no event may run
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(
+                "SET LOCAL statement_timeout = %d"
+                % max(math.ceil(remaining * 1000), 1)
+            )
+        finally:
+            cursor.close()
+
+    def _on_connect(self, dbapi_conn: Any, record: Any) -> None:
+        dbapi_conn.set_progress_handler(
+            self._progress, StatementDeadline.PROGRESS_STEPS
+        )
+
+    @staticmethod
+    def _progress() -> int:
+        # non zero interrupts the statement
+        remaining = RequestContext.remaining()
+        return remaining is not None and remaining <= 0
+
+    def _before_execute(self, *args: Any) -> None:
+        remaining = RequestContext.remaining()
+        if remaining is not None and remaining <= 0:
+            self._exceeded()
+
+    def _on_error(self, context: ExceptionContext) -> None:
+        if isinstance(context.original_exception, DeadlineExceeded):
+            return
+        remaining = RequestContext.remaining()
+        if (
+            remaining is not None
+            and remaining <= 0
+            and isinstance(context.sqlalchemy_exception, OperationalError)
+        ):
+            self._exceeded()
+
+    def _exceeded(self) -> None:
+        DEADLINE_EXCEEDED.inc(StatementDeadline.STAGE)
+        raise DeadlineExceeded(ResponseMsg.DEADLINE_EXCEEDED.value)
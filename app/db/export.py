@@ -0,0 +1,113 @@
+from datetime import datetime
+from typing import Any, Dict, Final, Iterator, List, Mapping, Sequence
+
+from pydantic_core import to_json
+from sqlalchemy.types import TypeEngine
+
+from app.db.pagination import dump_cursor, load_cursor, load_keys, typed_text
+from app.db.sql import Database
+
+
+class TableExporter:
+    """
+    Stream every row of a query as NDJSON in ascending order of `keys`
+    (the last of them unique), reading `batch_size` rows at a time from
+    a server side cursor (stream_results/yield_per), so memory stays
+    bounded whatever the table size.
+
+    Every line has a `cursor` field: passed back as `after`, the export
+    resumes after that row, e.g. when the client got disconnected.
+    """
+
+    BATCH_SIZE: Final = 1000
+
+    def __init__(
+        self,
+        db: Database,
+        select: str,
+        keys: Sequence[str],
+        date_column: str,
+        active_column: str,
+        types: Mapping[str, TypeEngine] | None = None,
+    ) -> None:
+        """
+        Args:
+            - select: SELECT ... FROM ... of the exported rows
+            - keys: qualified key columns, also present in the result
+              under their unqualified name
+            - date_column: column filtered by the create date range
+            - active_column: column filtered by is_active
+            - types: type of result columns by name, keys included
+        """
+        self.db = db
+        self.select = select
+        self.keys = tuple(keys)
+        self.date_column = date_column
+        self.active_column = active_column
+        self.types = dict(types or {})
+        self._names = tuple(key.rsplit(".", 1)[-1] for key in self.keys)
+
+    def stream(
+        self,
+        is_active: int | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        after: str | None = None,
+        batch_size: int = BATCH_SIZE,
+    ) -> Iterator[bytes]:
+        """
+        NDJSON chunks of `batch_size` lines each.
+
+        Args:
+            - is_active: only rows with this is_active, all when None
+            - created_from: only rows created at or after it
+            - created_to: only rows created before it
+            - after: cursor of the last row received
+        """
+        conditions: List[str] = []
+        params: Dict[str, Any] = {}
+        binds: Dict[str, str] = {}
+        if is_active is not None:
+            conditions.append(f"{self.active_column} = :is_active")
+            params["is_active"] = is_active
+        if created_from is not None:
+            conditions.append(f"{self.date_column} >= :created_from")
+            params["created_from"] = created_from
+        if created_to is not None:
+            conditions.append(f"{self.date_column} < :created_to")
+            params["created_to"] = created_to
+        if after:
+            # decoded before the first chunk, so a bad cursor is a 400
+            last_keys = load_keys(load_cursor(after), len(self.keys))
+            placeholders = [f":_after{i}" for i in range(len(self.keys))]
+            conditions.append(
+                f"({', '.join(self.keys)}) > ({', '.join(placeholders)})"
+            )
+            params.update({
+                f"_after{i}": key for i, key in enumerate(last_keys)
+            })
+            binds = {f"_after{i}": name for i, name in enumerate(self._names)}
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = ", ".join(f"{key} ASC" for key in self.keys)
+        query = typed_text(
+            f"{self.select}{where} ORDER BY {order}", self.types, binds
+        )
+        return self._chunks(query, params, batch_size)
+
+    def _chunks(
+        self, query: Any, params: Dict[str, Any], batch_size: int
+    ) -> Iterator[bytes]:
+        with self.db.engine.connect() as db_conn:
+            result = db_conn.execution_options(
+                stream_results=True, yield_per=batch_size
+            ).execute(query, params)
+            for rows in result.partitions(batch_size):
+                lines = []
+                for row in rows:
+                    record = dict(row._mapping)
+                    record["cursor"] = dump_cursor([
+                        record[name] for name in self._names
+                    ])
+                    lines.append(to_json(record))
+                yield b"\n".join(lines) + b"\n"
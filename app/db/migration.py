@@ -0,0 +1,473 @@
+"""
+Online schema changes for large tables, used from alembic migration
+scripts, so sessions and platform_users stay writable (logins keep
+working) while they run:
+
+    from app.db.migration import OnlineMigration
+
+    def upgrade() -> None:
+        online = OnlineMigration(op)
+        # expand: nullable column, instant on any table size
+        online.add_column("sessions", sa.Column("last_seen", sa.DateTime()))
+        # deploy code writing it, then fill the existing rows
+        online.backfill(
+            "sessions", "last_seen = create_date", "last_seen IS NULL"
+        )
+        online.set_not_null("sessions", "last_seen")
+        online.create_index(
+            "ix_sessions_last_seen", "sessions", ["last_seen"]
+        )
+        # contract, once no deployed code reads the old column
+        online.drop_column("sessions", "old_column")
+
+Every step runs and commits on its own, out of the migration
+transaction, so a migration using these helpers is not atomic: each
+step is written to be rerun safely instead.
+
+With MIGRATION_DRY_RUN=true the steps only log the rows they would
+touch (see `estimate_rows`), env.py rolls the migration back.
+"""
+
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, Final, Iterator, Sequence
+
+import sqlalchemy as sa
+from alembic.operations import Operations
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+
+from app.core.settings import Settings
+
+# child of the alembic logger, printed by the alembic command
+log = logging.getLogger("alembic.online")
+
+# SQLSTATE of lock_timeout expiry on PostgreSQL
+LOCK_NOT_AVAILABLE: Final = "55P03"
+
+
+class IrreversibleMigration(Exception):
+    """Raised by the downgrade of a migration that cannot be undone."""
+
+    def __init__(self, revision: str, reason: str) -> None:
+        self.revision = revision
+        self.reason = reason
+        super().__init__(f"revision {revision} is irreversible: {reason}")
+
+
+def estimate_rows(
+    conn: Connection,
+    table: str,
+    where: str = "",
+    params: Dict[str, Any] | None = None,
+) -> int:
+    """
+    Rows of `table` matching `where`: the planner estimate on
+    PostgreSQL (no scan), an exact COUNT(*) elsewhere.
+
+    Args:
+        - where: SQL condition, may use bound parameters
+        - params: bound parameters of `where`
+    """
+    condition = f" WHERE {where}" if where else ""
+    # table and where come from the migration script, not from input
+    matched = f"SELECT 1 FROM {table}{condition}"  # nosec B608
+    if conn.dialect.name == "postgresql":
+        query = sa.text(f"EXPLAIN (FORMAT JSON) {matched}")
+        plan = conn.execute(query, params or {}).scalar()
+        return int(plan[0]["Plan"]["Plan Rows"]) if plan else 0
+
+    rows = sa.text(matched).columns().subquery("matched")
+    count = sa.select(sa.func.count()).select_from(rows)
+    return int(conn.execute(count, params or {}).scalar() or 0)
+
+
+def is_lock_timeout(exc: OperationalError) -> bool:
+    # psycopg2 exposes pgcode, psycopg 3 sqlstate
+    code = getattr(exc.orig, "pgcode", None)
+    return (code or getattr(exc.orig, "sqlstate", None)) == LOCK_NOT_AVAILABLE
+
+
+class OnlineMigration:
+    """
+    Helpers of an alembic migration for tables too large to be locked
+    or rewritten during the migration:
+
+    - DDL waits at most `lock_timeout_ms` for its table lock, then is
+      retried after a pause (PostgreSQL), instead of blocking every
+      query queued behind it
+    - indexes are built CONCURRENTLY (PostgreSQL)
+    - data changes are applied in batches of `batch_size` rows in key
+      order, each batch its own transaction, `pause` seconds apart
+    - columns change by expand (add nullable, backfill, set not null)
+      and contract (drop once unused), never by a table rewrite
+
+    SQLite has no concurrent DDL, it only avoids the table copy of batch
+    mode where SQLite can alter the table in place.
+    """
+
+    BATCH_SIZE: Final = 1000
+    BATCH_PAUSE: Final = 0.1  # seconds
+    LOCK_RETRIES: Final = 10
+    LOCK_RETRY_PAUSE: Final = 1.0  # seconds
+
+    def __init__(
+        self,
+        operations: Operations,
+        dry_run: bool = Settings.MIGRATION_DRY_RUN,
+        lock_timeout_ms: int = Settings.MIGRATION_LOCK_TIMEOUT_MS,
+    ) -> None:
+        """
+        Args:
+            - operations: the `op` of the migration script
+            - dry_run: log the rows each step would touch, change nothing
+            - lock_timeout_ms: wait for a table lock, 0 waits forever
+        """
+        self.op = operations
+        self.dry_run = dry_run
+        self.lock_timeout_ms = lock_timeout_ms
+
+    @property
+    def dialect(self) -> str:
+        return self.op.get_bind().dialect.name
+
+    def estimate_rows(
+        self,
+        table: str,
+        where: str = "",
+        params: Dict[str, Any] | None = None,
+    ) -> int:
+        """Rows of `table` a step filtered by `where` would touch."""
+        if self.op.get_context().as_sql:
+            return 0  # offline (--sql) rendering has no rows to count
+        return estimate_rows(self.op.get_bind(), table, where, params)
+
+    def create_index(
+        self,
+        name: str,
+        table: str,
+        columns: Sequence[str | sa.TextClause],
+        unique: bool = False,
+        where: str | None = None,
+    ) -> None:
+        """
+        Build an index without blocking writes (CONCURRENTLY). A failed
+        concurrent build leaves an invalid index behind, it is dropped so
+        the step can be rerun. So is the invalid index of a build that was
+        killed before it could clean up, IF NOT EXISTS would keep it.
+
+        Args:
+            - columns: column names or expressions, e.g. text("lower(x)")
+            - where: condition of a partial index
+        """
+        if self._skip(f"create index {name} on", table):
+            return
+
+        kw: Dict[str, Any] = {}
+        if where is not None:
+            kw[f"{self.dialect}_where"] = sa.text(where)
+        if self.dialect != "postgresql":
+            self.op.create_index(
+                name,
+                table,
+                list(columns),
+                unique=unique,
+                if_not_exists=True,
+                **kw,
+            )
+            return
+
+        with self._autocommit():
+            if self._index_valid(name) is False:
+                log.warning(f"drop invalid index {name} of a failed build")
+                self._ddl(
+                    lambda: self.op.drop_index(
+                        name,
+                        table,
+                        if_exists=True,
+                        postgresql_concurrently=True,
+                    )
+                )
+            try:
+                self._ddl(
+                    lambda: self.op.create_index(
+                        name,
+                        table,
+                        list(columns),
+                        unique=unique,
+                        if_not_exists=True,
+                        postgresql_concurrently=True,
+                        **kw,
+                    )
+                )
+            except Exception:
+                self.op.drop_index(
+                    name,
+                    table,
+                    if_exists=True,
+                    postgresql_concurrently=True,
+                )
+                raise
+
+    def drop_index(self, name: str, table: str) -> None:
+        if self._skip(f"drop index {name} on", table):
+            return
+        if self.dialect != "postgresql":
+            self.op.drop_index(name, table)
+            return
+
+        with self._autocommit():
+            self._ddl(
+                lambda: self.op.drop_index(
+                    name, table, if_exists=True, postgresql_concurrently=True
+                )
+            )
+
+    def add_column(self, table: str, column: sa.Column) -> None:
+        """
+        Expand step: a column that is nullable or has a constant server
+        default is added without rewriting the table. A NOT NULL column
+        without default would need one, add it nullable, `backfill` it
+        and `set_not_null` instead.
+        """
+        if not column.nullable and column.server_default is None:
+            raise ValueError(
+                f"{table}.{column.name}: add it nullable, backfill it, "
+                "then set_not_null"
+            )
+        if self._skip(f"add column {column.name} to", table):
+            return
+
+        with self._autocommit():
+            self._ddl(lambda: self.op.add_column(table, column))
+
+    def backfill(
+        self,
+        table: str,
+        values: str,
+        where: str = "",
+        params: Dict[str, Any] | None = None,
+        key: str = "id",
+        batch_size: int = BATCH_SIZE,
+        pause: float = BATCH_PAUSE,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> int:
+        """
+        `UPDATE table SET values WHERE where`, one range of `batch_size`
+        keys at a time, each batch committed before the next one, so no
+        row stays locked longer than a batch. Return the updated rows.
+
+        Rows of the ranges already done are not read again, the step can
+        be interrupted and rerun when `where` excludes updated rows.
+
+        Args:
+            - values: SET clause, e.g. "last_seen = create_date"
+            - where: rows to update, may use bound parameters
+            - params: bound parameters of `values` and `where`
+            - key: unique indexed column walked in order
+            - pause: seconds between batches, leaving room to the traffic
+            - progress: called with (updated rows, estimated total) after
+              each batch, logged when None
+        """
+        params = dict(params or {})
+        total = self.estimate_rows(table, where, params)
+        if self._skip(f"backfill {values} of", table, total):
+            return 0
+
+        # table, values, key and where are SQL of the migration script,
+        # never request input
+        condition = f" AND ({where})" if where else ""
+        if self.op.get_context().as_sql:
+            # offline (--sql) rendering has no rows to walk
+            where_all = f" WHERE {where}" if where else ""
+            sql = f"UPDATE {table} SET {values}{where_all}"  # nosec B608
+            self.op.execute(sa.text(sql))
+            return 0
+
+        # the first batch has no lower bound, the next ones start after
+        # the last key of the previous one
+        lower = {False: "", True: f"{key} > :_after AND "}
+        batch_end = {
+            bounded: sa.text(
+                f"SELECT MAX({key}) FROM (SELECT {key} FROM {table}"
+                f" WHERE {lower[bounded]}1 = 1{condition}"
+                f" ORDER BY {key} LIMIT :_limit) AS batch"  # nosec B608
+            )
+            for bounded in lower
+        }
+        update = {
+            bounded: sa.text(
+                f"UPDATE {table} SET {values} WHERE"
+                f" {lower[bounded]}{key} <= :_upto{condition}"  # nosec B608
+            )
+            for bounded in lower
+        }
+        report = progress or self._log_progress(table)
+
+        updated = 0
+        after = None
+        with self._autocommit():
+            conn = self.op.get_bind()
+            while True:
+                bounded = after is not None
+                upto = conn.execute(
+                    batch_end[bounded],
+                    {**params, "_after": after, "_limit": batch_size},
+                ).scalar()
+                if upto is None:
+                    break
+
+                result = conn.execute(
+                    update[bounded], {**params, "_after": after, "_upto": upto}
+                )
+                updated += result.rowcount
+                report(updated, total)
+                after = upto
+                if pause > 0:
+                    time.sleep(pause)
+
+        return updated
+
+    def set_not_null(self, table: str, column: str) -> None:
+        """
+        Contract step of a backfilled column. On PostgreSQL a NOT VALID
+        check is validated first (writes go on meanwhile), SET NOT NULL
+        then trusts it instead of scanning the table under lock.
+        """
+        nulls = self.estimate_rows(table, f"{column} IS NULL")
+        if self._skip(f"set not null {column} of", table, nulls):
+            return
+
+        if self.dialect != "postgresql":
+            # SQLite cannot alter a column in place, the table is copied
+            with self.op.batch_alter_table(table, recreate="always") as batch:
+                batch.alter_column(column, nullable=False)
+            return
+
+        check = f"ck_{table}_{column}_not_null"
+        steps = [
+            f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}",
+            f"ALTER TABLE {table} ADD CONSTRAINT {check}"
+            f" CHECK ({column} IS NOT NULL) NOT VALID",
+            f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}",
+            f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL",
+            f"ALTER TABLE {table} DROP CONSTRAINT {check}",
+        ]
+        with self._autocommit():
+            for step in steps:
+                self._ddl(partial(self.op.execute, sa.text(step)))
+
+    def drop_column(self, table: str, column: str) -> None:
+        """Contract step, once no deployed code uses the column."""
+        if self._skip(f"drop column {column} of", table):
+            return
+
+        if self.dialect == "sqlite" and sqlite3.sqlite_version_info < (3, 35):
+            with self.op.batch_alter_table(table) as batch:
+                batch.drop_column(column)
+            return
+
+        with self._autocommit():
+            self._ddl(lambda: self.op.drop_column(table, column))
+
+    def execute(self, table: str, *statements: str) -> None:
+        """
+        Statements on `table` run in one short transaction of their own
+        (e.g. a column swap, a trigger), retried as a whole while one of
+        their locks is not granted.
+        """
+        if self._skip(f"{len(statements)} statements on", table):
+            return
+
+        if self.dialect != "postgresql":
+            for statement in statements:
+                self.op.execute(sa.text(statement))
+            return
+
+        with self._autocommit():
+            self._ddl(partial(self._in_transaction, statements))
+
+    def _in_transaction(self, statements: Sequence[str]) -> None:
+        # the connection autocommits, the transaction is opened explicitly
+        self.op.execute(sa.text("BEGIN"))
+        try:
+            for statement in statements:
+                self.op.execute(sa.text(statement))
+        except Exception:
+            self.op.execute(sa.text("ROLLBACK"))
+            raise
+        self.op.execute(sa.text("COMMIT"))
+
+    def _index_valid(self, name: str) -> bool | None:
+        """
+        pg_index.indisvalid of the index, None when it does not exist or
+        offline (--sql) rendering cannot read the catalog.
+        """
+        if self.op.get_context().as_sql:
+            return None
+        query = sa.text(
+            "SELECT indisvalid FROM pg_index"
+            " WHERE indexrelid = to_regclass(:name)"
+        )
+        return self.op.get_bind().execute(query, {"name": name}).scalar()
+
+    def _skip(self, step: str, table: str, rows: int | None = None) -> bool:
+        """Log the step, True when it must not run (dry run)."""
+        if rows is None:
+            rows = self.estimate_rows(table)
+        prefix = "[dry run] " if self.dry_run else ""
+        log.info(f"{prefix}{step} {table}: ~{rows} rows")
+        return self.dry_run
+
+    def _log_progress(self, table: str) -> Callable[[int, int], None]:
+        started = time.monotonic()
+
+        def report(updated: int, total: int) -> None:
+            elapsed = time.monotonic() - started
+            rate = updated / elapsed if elapsed > 0 else 0.0
+            left = max(total - updated, 0)
+            eta = f", eta {left / rate:.0f}s" if rate > 0 else ""
+            percent = f" ({updated / total:.0%})" if total else ""
+            log.info(
+                f"backfill {table}: {updated}/{total} rows{percent}, "
+                f"{rate:.0f} rows/s{eta}"
+            )
+
+        return report
+
+    @contextmanager
+    def _autocommit(self) -> Iterator[None]:
+        """Every statement commits on its own, lock_timeout applied."""
+        with self.op.get_context().autocommit_block():
+            if self.dialect != "postgresql" or self.op.get_context().as_sql:
+                yield
+                return
+
+            self.op.execute(
+                sa.text(f"SET lock_timeout = {int(self.lock_timeout_ms)}")
+            )
+            try:
+                yield
+            finally:
+                self.op.execute(sa.text("RESET lock_timeout"))
+
+    def _ddl(self, step: Callable[[], None]) -> None:
+        """Run a DDL step, retried while its table lock is not granted."""
+        for attempt in range(1, OnlineMigration.LOCK_RETRIES + 1):
+            try:
+                step()
+                return
+            except OperationalError as exc:
+                if (
+                    not is_lock_timeout(exc)
+                    or attempt == OnlineMigration.LOCK_RETRIES
+                ):
+                    raise
+                log.warning(
+                    f"lock not granted in {self.lock_timeout_ms}ms, "
+                    f"retry {attempt}/{OnlineMigration.LOCK_RETRIES}"
+                )
+                time.sleep(OnlineMigration.LOCK_RETRY_PAUSE * attempt)
@@ -1,13 +1,29 @@
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    func,
+)
+from sqlalchemy.types import TypeEngine
 
+from app.core.settings import Settings
+from app.db.ids import USER_KEY, CompactId
 from app.db.models.base import Base
 from app.db.models.util import ModelsUtil
 
+# type of the platform_users column referenced by sessions
+USER_KEY_TYPE: TypeEngine = String(256)
+if Settings.COMPACT_IDS:
+    USER_KEY_TYPE = Integer()
+
 
 class Platform_Users(Base):
     id = Column(Integer, primary_key=True, index=True)
     hash_id = Column(
-        String(256),
+        CompactId() if Settings.COMPACT_IDS else String(256),
         nullable=False,
         default=ModelsUtil.generate_hash,
         unique=True,
@@ -15,16 +31,41 @@ class Platform_Users(Base):
     username = Column(String(128), nullable=False, unique=True)
     email = Column(String(128), nullable=False, unique=True)
     pass_hash = Column(String(128), nullable=False)
+    # bumped to revoke every access token issued to the user
+    token_version = Column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+
+
+# case insensitive username lookups (LOWER(username) = LOWER(:name)) use
+# this index instead of scanning the table
+Index("ix_platform_users_username_lower", func.lower(Platform_Users.username))
 
 
 class Sessions(Base):
     id = Column(
-        String(64),
+        CompactId() if Settings.COMPACT_IDS else String(64),
         primary_key=True,
         nullable=False,
         index=True,
         default=ModelsUtil.generate_hash,
     )
+    # the integer user id with COMPACT_IDS, the user hash id otherwise
     platform_user_id = Column(
-        String(256), ForeignKey("platform_users.hash_id"), nullable=False
+        USER_KEY_TYPE,
+        ForeignKey(f"platform_users.{USER_KEY}"),
+        nullable=False,
     )
+    # sha256 of the current refresh token secret, rotated on every use
+    refresh_hash = Column(String(64), nullable=True)
+    # hash it replaced: only a replay of this spent secret revokes the
+    # session, any other mismatch may be a guess at the public session id
+    previous_refresh_hash = Column(String(64), nullable=True)
+    # last authenticated use, written behind by the activity buffer
+    last_seen = Column(DateTime, nullable=True)
+
+
+# keyset pagination of sessions, newest first (see KeysetPaginator)
+Index("ix_sessions_create_date_id", Sessions.create_date, Sessions.id)
+# sessions of a user (login, revocation) without scanning the table
+Index("ix_sessions_platform_user_id", Sessions.platform_user_id)
@@ -0,0 +1,188 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Final, List
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import Connection
+
+from app.helpers.logger import logger
+from app.helpers.metrics import DB_STATEMENT_LATENCY, DB_SLOW_QUERIES
+from app.helpers.tracing import RequestContext
+
+# plan lines reading a whole table instead of using an index
+FULL_SCAN_PATTERNS: Final = (
+    re.compile(r"^SCAN (\w+)(?!.*\bUSING\b)"),  # sqlite
+    re.compile(r"Seq Scan on (\w+)"),  # postgresql
+)
+EXPLAIN_PREFIX: Final = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+EXPLAINABLE: Final = ("select", "update", "delete")
+# dialects where a failed statement aborts the whole transaction, the
+# EXPLAIN runs in a savepoint so the request transaction survives it
+EXPLAIN_SAVEPOINT: Final = {"postgresql": "query_monitor_explain"}
+
+
+class QueryMonitor:
+    """
+    Cursor execution hooks on an engine: every statement latency goes to
+    the `db_statement_duration_seconds` histogram and statements slower
+    than `threshold` are logged with their parameter shape (names and
+    types, never values) and the EXPLAIN plan of the dialect, cached per
+    statement. Plans reading a whole table are flagged as full scans.
+
+    Statements and pool checkouts are also counted per request in the
+    request context.
+    """
+
+    PLAN_CACHE_SIZE: Final = 256
+    START_KEY: Final = "query_start"
+    STATEMENTS: Final = "db_statements"
+    CHECKOUTS: Final = "db_checkouts"
+
+    def __init__(self, threshold: float, explain: bool = True) -> None:
+        self.threshold = threshold
+        self.explain = explain
+        self._plans: OrderedDict[str, List[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "checkout", self._on_checkout)
+
+    def _on_checkout(self, dbapi_conn: Any, record: Any, proxy: Any) -> None:
+        RequestContext.add_count(QueryMonitor.CHECKOUTS)
+
+    def _before_execute(
+        self,
+        conn: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        conn.info.setdefault(QueryMonitor.START_KEY, []).append(
+            time.perf_counter()
+        )
+
+    def _after_execute(
+        self,
+        conn: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        starts = conn.info.get(QueryMonitor.START_KEY)
+        if not starts:
+            return
+
+        duration = time.perf_counter() - starts.pop()
+        RequestContext.add_count(QueryMonitor.STATEMENTS)
+        operation = statement_operation(statement)
+        DB_STATEMENT_LATENCY.observe(duration, operation)
+        if duration < self.threshold:
+            return
+
+        plan: List[str] = []
+        if self.explain and operation in EXPLAINABLE and not executemany:
+            plan = self.plan(conn, statement, parameters)
+        tables = full_scan_tables(plan)
+        DB_SLOW_QUERIES.inc(str(bool(tables)).lower())
+
+        query = " ".join(statement.split())
+        scan = f" FULL SCAN of {', '.join(tables)};" if tables else ""
+        logger.error(
+            f"Slow query {duration * 1000:.1f}ms;{scan} {query}; "
+            f"params={parameter_shape(parameters, executemany)}; "
+            f"plan={plan}",
+            key=f"slow_query.{hash(query)}",
+        )
+
+    def plan(
+        self, conn: Connection, statement: str, parameters: Any
+    ) -> List[str]:
+        """EXPLAIN output of the statement, cached by statement text."""
+        with self._lock:
+            if statement in self._plans:
+                self._plans.move_to_end(statement)
+                return self._plans[statement]
+
+        prefix = EXPLAIN_PREFIX.get(conn.dialect.name)
+        if prefix is None:
+            return []
+
+        # raw DBAPI cursor, so this query is not seen by the hooks again;
+        # it runs on the request connection, inside its transaction
+        savepoint = EXPLAIN_SAVEPOINT.get(conn.dialect.name)
+        if savepoint and not conn.in_transaction():
+            savepoint = None
+        cursor = conn.connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute(f"SAVEPOINT {savepoint}")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = [_plan_line(row) for row in cursor.fetchall()]
+            except Exception:
+                if savepoint:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                    cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+                raise
+            if savepoint:
+                cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+        except Exception as exc:
+            logger.error(f"Fail to explain query: {exc}", key="slow_query")
+            return []
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self._plans[statement] = plan
+            if len(self._plans) > QueryMonitor.PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return plan
+
+
+def _plan_line(row: Any) -> str:
+    # sqlite rows are (id, parent, notused, detail), postgresql (line,)
+    return str(row[-1])
+
+
+def statement_operation(statement: str) -> str:
+    words = statement.split(None, 1)
+    keyword = words[0].lower() if words else ""
+    if keyword in ("select", "insert", "update", "delete"):
+        return keyword
+    return "other"
+
+
+def full_scan_tables(plan: List[str]) -> List[str]:
+    tables = []
+    for line in plan:
+        for pattern in FULL_SCAN_PATTERNS:
+            match = pattern.search(line.strip())
+            if match:
+                tables.append(match.group(1))
+    return tables
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> str:
+    """Parameter names and types, values are never logged."""
+    if executemany and parameters:
+        return f"{len(parameters)}x{parameter_shape(parameters[0])}"
+    if isinstance(parameters, dict):
+        items = ", ".join(
+            f"{name}: {type(value).__name__}"
+            for name, value in parameters.items()
+        )
+        return "{" + items + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return type(parameters).__name__
@@ -0,0 +1,236 @@
+import base64
+import binascii
+import json
+import math
+from enum import Enum
+from typing import Any, Dict, Final, List, Mapping, Sequence, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import (
+    bindparam,
+    func,
+    literal_column,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.sql import Executable
+from sqlalchemy.types import TypeEngine
+
+from app.db.sql import Database
+from app.helpers.exceptions import BadClientReqeust
+
+
+class TotalMode(Enum):
+    NONE = "none"
+    ESTIMATE = "estimate"  # from table statistics, no scan
+    EXACT = "exact"  # COUNT(*), slow on large tables
+
+
+class Page(BaseModel):
+    rows: List[Dict[str, Any]]
+    current_page: int
+    total_page: int | None
+    limit: int
+    next_cursor: str | None
+
+
+INVALID_CURSOR: Final = "Invalid cursor"
+
+
+def dump_cursor(payload: Any) -> str:
+    """Opaque url safe cursor of a JSON payload, dates as str."""
+    dumped = json.dumps(payload, default=str)
+    return base64.urlsafe_b64encode(dumped.encode()).decode().rstrip("=")
+
+
+def load_cursor(cursor: str) -> Any:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError, binascii.Error):
+        raise BadClientReqeust(INVALID_CURSOR)
+
+
+def load_keys(keys: Any, key_count: int) -> List[Any]:
+    """Key values of a cursor, checked before being bound to a query."""
+    if not isinstance(keys, list) or len(keys) != key_count:
+        raise BadClientReqeust(INVALID_CURSOR)
+    if not all(isinstance(key, (str, int, float)) for key in keys):
+        raise BadClientReqeust(INVALID_CURSOR)
+    return keys
+
+
+def typed_text(
+    sql: str, types: Mapping[str, TypeEngine], binds: Mapping[str, str]
+) -> Any:
+    """
+    Textual query with its result columns named in `types` typed, and
+    its bound parameters `binds` (parameter: column name) typed as their
+    column, e.g. cursor keys compared to an id column.
+    """
+    query = text(sql).bindparams(
+        *(
+            bindparam(param, type_=types[name])
+            for param, name in binds.items()
+            if name in types
+        )
+    )
+    return query.columns(**types) if types else query
+
+
+def encode_cursor(page: int, keys: Sequence[Any]) -> str:
+    """Opaque cursor of the page after the row with given key values."""
+    return dump_cursor([page, list(keys)])
+
+
+def decode_cursor(cursor: str, key_count: int) -> Tuple[int, List[Any]]:
+    payload = load_cursor(cursor)
+    if not isinstance(payload, list) or len(payload) != 2:
+        raise BadClientReqeust(INVALID_CURSOR)
+    page, keys = payload
+    if not isinstance(page, int) or page < 2:
+        raise BadClientReqeust(INVALID_CURSOR)
+
+    return page, load_keys(keys, key_count)
+
+
+class KeysetPaginator:
+    """
+    Pages of a query in descending order of `keys`, the last of them
+    unique (e.g. create_date, id). The next page starts after the last
+    row seen, `(keys) < (last row keys)`, so every page costs the same
+    index range scan whatever its depth, unlike OFFSET. The position is
+    carried in an opaque cursor.
+
+    An index on `keys` (in this order) is needed for that, the total is
+    only counted when asked.
+    """
+
+    MAX_LIMIT: Final = 500
+
+    def __init__(
+        self,
+        db: Database,
+        select: str,
+        table: str,
+        keys: Sequence[str],
+        where: str = "",
+        types: Mapping[str, TypeEngine] | None = None,
+    ) -> None:
+        """
+        Args:
+            - select: SELECT ... FROM ... (joins included) of the rows
+            - table: table holding the keys, for the estimated total
+            - keys: qualified key columns, also present in the result
+              under their unqualified name
+            - where: filter of the rows, may use bound parameters
+            - types: type of result columns by name, keys included
+        """
+        self.db = db
+        self.select = select
+        self.table = table
+        self.keys = tuple(keys)
+        self.where = where
+        self.types = dict(types or {})
+        self._names = tuple(key.rsplit(".", 1)[-1] for key in self.keys)
+
+    def page(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        total: TotalMode = TotalMode.NONE,
+        params: Dict[str, Any] | None = None,
+    ) -> Page:
+        """
+        Rows of the page after `cursor` (first page without it).
+
+        Args:
+            - limit: rows per page, capped to MAX_LIMIT
+            - cursor: next_cursor of the previous page
+            - total: how total_page is computed, none leaves it None
+            - params: bound parameters of `where`
+        """
+        limit = max(1, min(limit, KeysetPaginator.MAX_LIMIT))
+        params = dict(params or {})
+        conditions = [self.where] if self.where else []
+        current_page = 1
+        binds: Dict[str, str] = {}
+        if cursor:
+            current_page, last_keys = decode_cursor(cursor, len(self.keys))
+            after = ", ".join(f":_after{i}" for i in range(len(self.keys)))
+            conditions.append(f"({', '.join(self.keys)}) < ({after})")
+            params.update({
+                f"_after{i}": key for i, key in enumerate(last_keys)
+            })
+            binds = {f"_after{i}": name for i, name in enumerate(self._names)}
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = ", ".join(f"{key} DESC" for key in self.keys)
+        query = typed_text(
+            f"{self.select}{where} ORDER BY {order} LIMIT :_limit",
+            self.types,
+            binds,
+        )
+        # one extra row tells whether a next page exists
+        with self.db.engine.connect() as db_conn:
+            result = db_conn.execute(query, {**params, "_limit": limit + 1})
+            rows = [dict(row._mapping) for row in result]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(
+                current_page + 1, [last[name] for name in self._names]
+            )
+
+        total_rows = self.count(total, params)
+        return Page(
+            rows=rows,
+            current_page=current_page,
+            total_page=(
+                None if total_rows is None else math.ceil(total_rows / limit)
+            ),
+            limit=limit,
+            next_cursor=next_cursor,
+        )
+
+    def count(self, total: TotalMode, params: Dict[str, Any]) -> int | None:
+        if total is TotalMode.NONE:
+            return None
+        if total is TotalMode.ESTIMATE:
+            return self.estimate()
+
+        where = f" WHERE {self.where}" if self.where else ""
+        rows = text(f"{self.select}{where}").columns().subquery("page_rows")
+        query = select(func.count()).select_from(rows)
+        params = {k: v for k, v in params.items() if not k.startswith("_")}
+        with self.db.engine.connect() as db_conn:
+            return db_conn.execute(query, params).scalar() or 0
+
+    def estimate(self) -> int:
+        """
+        Row count of the whole table from the planner statistics (rows
+        filtered out by `where` included), without scanning it.
+        """
+        dialect = self.db.engine.dialect.name
+        params = {}
+        query: Executable
+        if dialect == "postgresql":
+            query = text(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = :table"
+            )
+            params["table"] = self.table
+        elif dialect == "sqlite":
+            # rowids are assigned in increasing order, max is a b-tree seek
+            query = select(func.max(literal_column("rowid"))).select_from(
+                table(self.table)
+            )
+        else:
+            query = select(func.count()).select_from(table(self.table))
+
+        with self.db.engine.connect() as db_conn:
+            estimate = db_conn.execute(query, params).scalar()
+
+        return max(int(estimate or 0), 0)
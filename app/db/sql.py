@@ -1,18 +1,92 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+import threading
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.settings import Settings
+from app.db.breaker import CircuitBreaker
+from app.db.deadline import StatementDeadline
+from app.db.monitor import QueryMonitor
 
 
 class Database:
+    """
+    Engine and session factory, created on first use so importing the
+    application does not open any database resource.
+    """
+
     def __init__(self) -> None:
+        self._engine: Engine | None = None
+        self._session: sessionmaker[Session] | None = None
+        self._lock = threading.Lock()
+        self.monitor = QueryMonitor(
+            threshold=Settings.SLOW_QUERY_MS / 1000,
+            explain=Settings.SLOW_QUERY_EXPLAIN,
+        )
+        self.deadline = StatementDeadline()
+        self.breaker = CircuitBreaker(
+            failure_rate=Settings.DB_BREAKER_FAILURE_RATE,
+            min_calls=Settings.DB_BREAKER_MIN_CALLS,
+            window=Settings.DB_BREAKER_WINDOW,
+            open_seconds=Settings.DB_BREAKER_OPEN_SECONDS,
+            probes=Settings.DB_BREAKER_PROBES,
+        )
+        # pooled connections must never be shared with a forked worker
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._create_engine()
+        return self._engine
+
+    @property
+    def session(self) -> sessionmaker[Session]:
+        if self._session is None:
+            self._session = sessionmaker(
+                autocommit=False, autoflush=True, bind=self.engine
+            )
+        return self._session
+
+    def _create_engine(self) -> Engine:
         if Settings.DB_DIALECT == "sqlite":
-            self.engine = create_engine(
+            engine = create_engine(
                 url=Settings.DB_URL,
                 connect_args={"check_same_thread": False},  # sqlite only
             )
         else:
-            self.engine = create_engine(url=Settings.DB_URL)
-        self.session = sessionmaker(
-            autocommit=False, autoflush=True, bind=self.engine
-        )
+            engine = create_engine(url=Settings.DB_URL)
+
+        self.monitor.attach(engine)
+        # first, a statement cancelled at its deadline is not a failure
+        self.deadline.attach(engine)
+        self.breaker.attach(engine)
+        return engine
+
+    def warmup(self, connections: int) -> None:
+        """
+        Open pool connections up front, so first requests do not pay for
+        the connection handshake.
+
+        Args:
+            - connections: number of connections to open
+        """
+        opened = []
+        try:
+            for _ in range(connections):
+                opened.append(self.engine.connect())
+        finally:
+            for conn in opened:
+                conn.close()  # returned to the pool, kept open
+
+    def _after_fork(self) -> None:
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+
+    def dispose(self) -> None:
+        """Close all pooled connections."""
+        if self._engine is not None:
+            self._engine.dispose()
@@ -0,0 +1,112 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Final, List, Tuple
+
+from app.core.constants import ResponseMsg
+from app.helpers.exceptions import DeadlineExceeded, ServiceOverloaded
+from app.helpers.metrics import (
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_SHED,
+    DEADLINE_EXCEEDED,
+)
+
+
+class AdmissionGate:
+    """
+    Concurrency limit with a bounded priority wait queue for one class of
+    routes. Requests over `limit` wait at most `queue_timeout` seconds in
+    a queue of at most `queue_size` entries, otherwise they are shed.
+    Waiters with lower priority value are admitted first.
+
+    State is bound to the event loop of the worker, no locking needed.
+    """
+
+    QUEUE_FULL: Final = "queue_full"
+    QUEUE_TIMEOUT: Final = "queue_timeout"
+    DEADLINE_STAGE: Final = "admission"
+
+    def __init__(
+        self, name: str, limit: int, queue_size: int, queue_timeout: float
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._seq = itertools.count()
+        self._waiters: List[Tuple[int, int, asyncio.Future[None]]] = []
+
+    @asynccontextmanager
+    async def admit(
+        self, priority: int = 0, deadline: float | None = None
+    ) -> AsyncIterator[None]:
+        """Hold one slot of the gate for the enclosed block."""
+        await self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: int, deadline: float | None) -> None:
+        """
+        Take one slot of the gate, to be given back with `release`.
+
+        Args:
+            - priority: queue priority, lower value is admitted first
+            - deadline: seconds left to the request, bounds its queue wait
+
+        Raise:
+            - ServiceOverloaded: queue is full or wait exceeded its deadline
+            - DeadlineExceeded: request deadline passed while queued
+        """
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return
+
+        if self.queued >= self.queue_size:
+            self._shed(AdmissionGate.QUEUE_FULL)
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        self.queued += 1
+        timeout = self.queue_timeout
+        if deadline is not None and deadline < timeout:
+            timeout = max(deadline, 0)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except asyncio.CancelledError:
+            # client went away while queued, give back a handed over slot
+            if waiter.done():
+                self.release()
+            waiter.cancel()
+            raise
+        finally:
+            self.queued -= 1
+
+        ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start, self.name)
+        if not waiter.done():
+            waiter.cancel()  # skipped by release
+            if timeout < self.queue_timeout:
+                DEADLINE_EXCEEDED.inc(AdmissionGate.DEADLINE_STAGE)
+                raise DeadlineExceeded(ResponseMsg.DEADLINE_EXCEEDED.value)
+            self._shed(AdmissionGate.QUEUE_TIMEOUT)
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)  # slot goes to the waiter
+                return
+
+        self.active -= 1
+
+    def _shed(self, reason: str) -> None:
+        ADMISSION_SHED.inc(self.name, reason)
+        raise ServiceOverloaded(
+            ResponseMsg.OVERLOADED.value, retry_after=self.queue_timeout
+        )
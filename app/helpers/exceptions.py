@@ -16,6 +16,39 @@ class UnauthorizedClientRequest(Exception):
         super().__init__(message)
 
 
+class ForbiddenClientRequest(Exception):
+    def __init__(self, message: str) -> None:
+        self.message = message
+        super().__init__(message)
+
+
+class TooManyClientRequest(Exception):
+    def __init__(self, message: str, retry_after: float) -> None:
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class ServiceOverloaded(Exception):
+    def __init__(self, message: str, retry_after: float) -> None:
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class DatabaseUnavailable(Exception):
+    def __init__(self, message: str, retry_after: float) -> None:
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, message: str) -> None:
+        self.message = message
+        super().__init__(message)
+
+
 class InternalServerError(Exception):
     def __init__(self) -> None:
         self.message = "Internal error"
@@ -1,10 +1,62 @@
 import logging
-import uuid
+import threading
+import time
+from collections import OrderedDict
 from logging.handlers import RotatingFileHandler
-from typing import Final
+from typing import Final, Tuple
 
 from app.core.constants import LogMsg
 from app.core.settings import Settings
+from app.helpers.tracing import RequestContext
+
+
+class LogRateLimiter:
+    """
+    Per message key limiter: the first `burst` messages of a key in every
+    `window` seconds are logged, afterwards only 1 of `sample_rate`.
+    Everything else is counted and reported once the next window opens.
+    """
+
+    def __init__(
+        self, burst: int, window: float, sample_rate: int, max_keys: int
+    ) -> None:
+        self.burst = burst
+        self.window = window
+        self.sample_rate = sample_rate
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key: [window start, messages in window, suppressed in window]
+        self._keys: OrderedDict[str, list] = OrderedDict()
+
+    def acquire(self, key: str) -> Tuple[bool, int]:
+        """
+        Decide whether message of given key should be written.
+
+        Return:
+            - is_allowed: True if message should be written
+            - suppressed: amount suppressed in the previous window, to be
+                reported before this message (0 if nothing to report)
+        """
+        now = time.monotonic()
+        suppressed = 0
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is not None:
+                    suppressed = state[2]
+                state = [now, 0, 0]
+                self._keys[key] = state
+                if len(self._keys) > self.max_keys:
+                    self._keys.popitem(last=False)
+            self._keys.move_to_end(key)
+
+            state[1] += 1
+            over_burst = state[1] - self.burst
+            is_allowed = over_burst <= 0 or over_burst % self.sample_rate == 0
+            if not is_allowed:
+                state[2] += 1
+
+        return is_allowed, suppressed
 
 
 class CustomLogger:
@@ -13,8 +65,19 @@ class CustomLogger:
     MAX_SIZE: Final = 10_000_000  # 10 MB
     BACKUP_COUNT: Final = 5
 
+    # rate limit of keyed debug/error messages
+    LIMIT_BURST: Final = 10  # messages per key per window
+    LIMIT_WINDOW: Final = 60.0  # seconds
+    LIMIT_SAMPLE_RATE: Final = 100  # 1 of N is logged beyond the burst
+    LIMIT_MAX_KEYS: Final = 1024
+
     def __init__(self) -> None:
-        self.uuid: str | None = None
+        self._limiter = LogRateLimiter(
+            burst=CustomLogger.LIMIT_BURST,
+            window=CustomLogger.LIMIT_WINDOW,
+            sample_rate=CustomLogger.LIMIT_SAMPLE_RATE,
+            max_keys=CustomLogger.LIMIT_MAX_KEYS,
+        )
         self._setup_log()
 
     def _setup_log(self) -> None:
@@ -30,6 +93,7 @@ class CustomLogger:
             filename=Settings.DEBUG_LOG_FILE,
             maxBytes=CustomLogger.MAX_SIZE,
             backupCount=CustomLogger.BACKUP_COUNT,
+            delay=True,  # file is opened on first record, not on import
         )
         debug_file_handler.setFormatter(formatter)
         self._debug_logger.addHandler(debug_file_handler)
@@ -41,6 +105,7 @@ class CustomLogger:
             filename=Settings.INFO_LOG_FILE,
             maxBytes=CustomLogger.MAX_SIZE,
             backupCount=CustomLogger.BACKUP_COUNT,
+            delay=True,  # file is opened on first record, not on import
         )
         info_file_handler.setFormatter(formatter)
         self._info_logger.addHandler(info_file_handler)
@@ -52,15 +117,11 @@ class CustomLogger:
             filename=Settings.ERR_LOG_FILE,
             maxBytes=CustomLogger.MAX_SIZE,
             backupCount=CustomLogger.BACKUP_COUNT,
+            delay=True,  # file is opened on first record, not on import
         )
         err_file_handler.setFormatter(formatter)
         self._err_logger.addHandler(err_file_handler)
 
-    @staticmethod
-    def _generate_uuid() -> str:
-        """UUID as per request identifier."""
-        return str(uuid.uuid4())
-
     def accept(
         self,
         url: str,
@@ -77,10 +138,9 @@ class CustomLogger:
             - query_param: query within the url if any
             - payload: body request if any
         """
-        self.uuid = self._generate_uuid()
         accept_log = {
             "message": LogMsg.ACCEPT_REQ.value,
-            "req_id": self.uuid,
+            "req_id": RequestContext.req_id(),
             "url": url,
             "header": header,
             "method": method,
@@ -96,7 +156,16 @@ class CustomLogger:
             - result
             - time: time needed from accepting request until process finish
         """
-        complete_log = {"message": result, "req_id": self.uuid, "time": time}
+        complete_log = {
+            "message": result,
+            "req_id": RequestContext.req_id(),
+            "time": time,
+            "phases_ms": {
+                name: round(dur * 1000, 3)
+                for name, dur in RequestContext.phases().items()
+            },
+            "counts": RequestContext.counts(),
+        }
         self._info_logger.info(complete_log)
 
     def _free_text_log(self, msg: str) -> str:
@@ -105,23 +174,58 @@ class CustomLogger:
         Args:
             - msg: free text log message
         """
-        return f"[{self.uuid}] {msg}"
+        return f"[{RequestContext.req_id()}] {msg}"
 
-    def debug(self, msg: str) -> None:
+    def _is_allowed(self, logger: logging.Logger, key: str | None) -> bool:
+        """
+        Apply rate limit of given message key, writing the summary of
+        suppressed messages when a new window opens.
+
+        Args:
+            - logger: logger the message is written to
+            - key: message key, None means the message is never limited
+        """
+        if key is None:
+            return True
+
+        is_allowed, suppressed = self._limiter.acquire(key)
+        if suppressed:
+            logger.log(
+                logger.level,
+                f"[{key}] {suppressed} similar messages suppressed",
+            )
+
+        return is_allowed
+
+    def debug(self, msg: str, key: str | None = None) -> None:
         """Record log in debug level
 
         Args:
             - msg: free text log message
+            - key: identify similar messages to be rate limited together
+        """
+        if self._is_allowed(self._debug_logger, key):
+            self._debug_logger.debug(self._free_text_log(msg))
+
+    def info(self, msg: str, key: str | None = None) -> None:
+        """Record log in info level
+
+        Args:
+            - msg: free text log message
+            - key: identify similar messages to be rate limited together
         """
-        self._debug_logger.debug(self._free_text_log(msg))
+        if self._is_allowed(self._info_logger, key):
+            self._info_logger.info(self._free_text_log(msg))
 
-    def error(self, msg: str) -> None:
+    def error(self, msg: str, key: str | None = None) -> None:
         """Record log in error level
 
         Args:
             - msg: free text log message
+            - key: identify similar messages to be rate limited together
         """
-        self._err_logger.error(self._free_text_log(msg))
+        if self._is_allowed(self._err_logger, key):
+            self._err_logger.error(self._free_text_log(msg))
 
 
 logger = CustomLogger()
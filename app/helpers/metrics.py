@@ -0,0 +1,433 @@
+import atexit
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Final, List, Sequence, Tuple, TypeVar
+
+from app.core.settings import Settings
+from app.helpers.tracing import add_span_listener
+
+LabelValues = Tuple[str, ...]
+M = TypeVar("M", bound="_Metric")
+
+
+class _Metric(ABC):
+    TYPE: str = ""
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        doc: str,
+        labels: Sequence[str] = (),
+    ) -> None:
+        self.registry = registry
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, Any] = {}
+
+    def _key(self, values: Sequence[str]) -> LabelValues:
+        if len(values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}")
+        return tuple(str(value) for value in values)
+
+    @abstractmethod
+    def snapshot(self) -> Dict[LabelValues, List[float]]:
+        """Samples per label values, copied under the registry lock."""
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        doc: str,
+        labels: Sequence[str] = (),
+    ) -> None:
+        super().__init__(registry, name, doc, labels)
+        self._values: Dict[LabelValues, float]
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self.registry.lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        self.registry.touch()
+
+    def snapshot(self) -> Dict[LabelValues, List[float]]:
+        with self.registry.lock:
+            return {key: [value] for key, value in self._values.items()}
+
+
+class Gauge(Counter):
+    """Current value, summed across live workers in multiprocess mode."""
+
+    TYPE = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+    DEFAULT_BUCKETS: Final = (
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    )
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        doc: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket ..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]]
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self.registry.lock:
+            sample = self._values.get(key)
+            if sample is None:
+                sample = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = sample
+
+            idx = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    idx = i
+                    break
+            sample[idx] += 1
+            sample[-1] += value
+        self.registry.touch()
+
+    def snapshot(self) -> Dict[LabelValues, List[float]]:
+        with self.registry.lock:
+            return {key: list(value) for key, value in self._values.items()}
+
+
+class MetricsRegistry:
+    """
+    In-process metrics registry rendered in Prometheus text format.
+
+    With `multiproc_dir` every worker dumps its samples to
+    `<dir>/metrics_<pid>.json` and rendering merges all dumps, so any
+    worker answering `/metrics` reports the values of the whole server.
+    Gauges of workers that are no longer alive are left out.
+
+    Dumps are written by a background thread every `flush_interval`
+    seconds once a sample changed (a quiet worker is never left stale),
+    by the worker answering a scrape and at exit.
+    """
+
+    FLUSH_INTERVAL: Final = 1.0  # seconds
+
+    def __init__(
+        self, multiproc_dir: str = "", flush_interval: float = FLUSH_INTERVAL
+    ) -> None:
+        self.lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.metrics: Dict[str, _Metric] = {}
+        self.multiproc_dir = Path(multiproc_dir) if multiproc_dir else None
+        self.flush_interval = flush_interval
+        self._dirty = threading.Event()
+        self._flusher_pid = 0  # process the flusher thread runs in
+        self._owns_dump = False
+        if self.multiproc_dir:
+            atexit.register(self.flush)
+        # forked worker must not report samples recorded by its parent
+        os.register_at_fork(after_in_child=self.reset)
+
+    def counter(
+        self, name: str, doc: str, labels: Sequence[str] = ()
+    ) -> Counter:
+        return self._register(Counter(self, name, doc, labels))
+
+    def gauge(self, name: str, doc: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, doc, labels))
+
+    def histogram(
+        self,
+        name: str,
+        doc: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(
+            Histogram(self, name, doc, labels, buckets=buckets)
+        )
+
+    def reset(self) -> None:
+        """Drop all recorded samples, registered metrics are kept."""
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.clear()
+        self._dirty.clear()
+        self._owns_dump = False
+
+    def _register(self, metric: M) -> M:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def touch(self) -> None:
+        """Mark samples changed, to be flushed by the flusher thread."""
+        if not self.multiproc_dir:
+            return
+
+        self._dirty.set()
+        # threads do not survive fork, every worker starts its own
+        if self._flusher_pid != os.getpid():
+            self._flusher_pid = os.getpid()
+            threading.Thread(
+                target=self._flush_loop, name="metrics-flush", daemon=True
+            ).start()
+
+    def _flush_loop(self) -> None:
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            self._dirty.wait()
+            time.sleep(self.flush_interval)  # batch the updates meanwhile
+            self._dirty.clear()
+            try:
+                self.flush()
+            except OSError:
+                # dir removed or full, retried on the next update
+                self._dirty.set()
+
+    def flush(self) -> None:
+        """Atomically write samples of current process to multiproc dir."""
+        if not self.multiproc_dir:
+            return
+
+        with self._flush_lock:
+            dump = {
+                name: [[list(key), val] for key, val in m.snapshot().items()]
+                for name, m in self.metrics.items()
+            }
+            pid = os.getpid()
+            self.multiproc_dir.mkdir(parents=True, exist_ok=True)
+            target = self.multiproc_dir / f"metrics_{pid}.json"
+            if not self._owns_dump and target.exists():
+                # left by a dead worker with a recycled pid, keep its counts
+                target.rename(
+                    self.multiproc_dir
+                    / f"archived_{pid}_{time.time_ns()}.json"
+                )
+            tmp = target.with_suffix(".tmp")
+            tmp.write_text(json.dumps(dump))
+            os.replace(tmp, target)
+            self._owns_dump = True
+
+    def collect(self) -> Dict[str, Dict[LabelValues, List[float]]]:
+        """Samples per metric, merged across workers in multiprocess mode."""
+        if not self.multiproc_dir:
+            return {name: m.snapshot() for name, m in self.metrics.items()}
+
+        self.flush()
+        merged: Dict[str, Dict[LabelValues, List[float]]] = {
+            name: {} for name in self.metrics
+        }
+        for path in self.multiproc_dir.glob("*.json"):
+            kind, _, pid = path.stem.partition("_")
+            try:
+                dump = json.loads(path.read_text())
+                is_alive = kind == "metrics" and _is_process_alive(int(pid))
+            except (ValueError, OSError):
+                continue
+
+            for name, samples in dump.items():
+                metric = self.metrics.get(name)
+                if not metric or (metric.TYPE == "gauge" and not is_alive):
+                    continue
+
+                for key, value in samples:
+                    current = merged[name].setdefault(
+                        tuple(key), [0.0] * len(value)
+                    )
+                    for i, v in enumerate(value):
+                        current[i] += v
+
+        return merged
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for name, samples in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.doc}")
+            lines.append(f"# TYPE {name} {metric.TYPE}")
+            for key, value in sorted(samples.items()):
+                labels = list(zip(metric.labels, key))
+                if isinstance(metric, Histogram):
+                    lines.extend(_render_histogram(metric, labels, value))
+                else:
+                    lines.append(f"{name}{_fmt_labels(labels)} {value[0]}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(
+    metric: Histogram, labels: List[Tuple[str, str]], value: List[float]
+) -> List[str]:
+    lines = []
+    cumulative = 0.0
+    for bound, count in zip(metric.buckets, value):
+        cumulative += count
+        bucket_labels = _fmt_labels(labels + [("le", str(bound))])
+        lines.append(f"{metric.name}_bucket{bucket_labels} {cumulative}")
+
+    cumulative += value[len(metric.buckets)]
+    inf_labels = _fmt_labels(labels + [("le", "+Inf")])
+    lines.append(f"{metric.name}_bucket{inf_labels} {cumulative}")
+    lines.append(f"{metric.name}_sum{_fmt_labels(labels)} {value[-1]}")
+    lines.append(f"{metric.name}_count{_fmt_labels(labels)} {cumulative}")
+    return lines
+
+
+def _fmt_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+
+    escaped = (
+        (key, val.replace("\\", "\\\\").replace('"', '\\"').replace("\n", ""))
+        for key, val in labels
+    )
+    return "{" + ",".join(f'{key}="{val}"' for key, val in escaped) + "}"
+
+
+def _is_process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = MetricsRegistry(multiproc_dir=Settings.METRICS_DIR)
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status",
+    labels=("route", "method", "status"),
+)
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed"
+)
+AUTH_OUTCOMES = registry.counter(
+    "auth_outcomes_total",
+    "Authentication outcomes, failures keyed by LoginErrorMsg",
+    labels=("outcome",),
+)
+DB_QUERY_LATENCY = registry.histogram(
+    "db_query_duration_seconds",
+    "Repository query latency by repository method",
+    labels=("method",),
+)
+DB_STATEMENT_LATENCY = registry.histogram(
+    "db_statement_duration_seconds",
+    "SQL statement latency by operation (select, insert, ...)",
+    labels=("operation",),
+)
+DB_SLOW_QUERIES = registry.counter(
+    "db_slow_queries_total",
+    "Statements slower than SLOW_QUERY_MS, by full table scan in plan",
+    labels=("full_scan",),
+)
+DB_STATEMENTS_PER_REQUEST = registry.histogram(
+    "db_statements_per_request",
+    "SQL statements executed per request by route template",
+    labels=("route",),
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 32),
+)
+DB_CHECKOUTS_PER_REQUEST = registry.histogram(
+    "db_checkouts_per_request",
+    "Pool connection checkouts per request by route template",
+    labels=("route",),
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 32),
+)
+ARGON2_LATENCY = registry.histogram(
+    "argon2_duration_seconds",
+    "Time spent on argon2 password hashing",
+    labels=("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+USERNAME_CHECKS = registry.counter(
+    "username_checks_total",
+    "Username availability checks by result: filter miss (no query), "
+    "taken, or filter false positive",
+    ("result",),
+)
+ADMISSION_SHED = registry.counter(
+    "admission_shed_total",
+    "Requests rejected by admission control by route class and reason",
+    labels=("route_class", "reason"),
+)
+ADMISSION_QUEUE_WAIT = registry.histogram(
+    "admission_queue_wait_seconds",
+    "Time spent waiting for an admission slot by route class",
+    labels=("route_class",),
+)
+DB_BREAKER_STATE = registry.gauge(
+    "db_circuit_breaker_state",
+    "Workers whose database circuit breaker is in given state",
+    labels=("state",),
+)
+DB_BREAKER_TRANSITIONS = registry.counter(
+    "db_circuit_breaker_transitions_total",
+    "Database circuit breaker state changes",
+    labels=("from_state", "to_state"),
+)
+DB_BREAKER_REJECTED = registry.counter(
+    "db_circuit_breaker_rejected_total",
+    "Database calls rejected at once while the circuit breaker is open",
+)
+DEADLINE_EXCEEDED = registry.counter(
+    "request_deadline_exceeded_total",
+    "Requests stopped at their deadline by stage (admission, db)",
+    labels=("stage",),
+)
+
+# span name -> operation label, no secret despite the key names
+ARGON2_SPANS: Final = {
+    "auth.hash_password": "hash",  # nosec B105
+    "auth.verify_password": "verify",  # nosec B105
+}
+
+
+def _observe_span(name: str, duration: float) -> None:
+    if name.startswith("db."):
+        DB_QUERY_LATENCY.observe(duration, name.removeprefix("db."))
+    elif name in ARGON2_SPANS:
+        ARGON2_LATENCY.observe(duration, ARGON2_SPANS[name])
+
+
+add_span_listener(_observe_span)
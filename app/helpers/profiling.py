@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import hmac
+import secrets
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from contextvars import Context
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, Final
+
+from app.helpers.logger import logger
+from app.helpers.tracing import RequestContext
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler: a background thread records the stack
+    of every registered thread each `interval` seconds. Threads register
+    while they work for the profiled request (see `tracing.span`), so
+    work offloaded to the threadpool is sampled too.
+
+    An event loop thread is shared by every request it serves, so it is
+    only sampled while one of the request's own tasks runs on it: the
+    task that started the sampler and the tasks spawned from it (see
+    `track_request_tasks`).
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._threads: Counter[int] = Counter()
+        self._loops: Dict[int, asyncio.AbstractEventLoop] = {}
+        self._tasks: weakref.WeakSet[asyncio.Task[Any]] = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def add_thread(self) -> None:
+        ident = threading.get_ident()
+        task = _current_task()
+        with self._lock:
+            self._threads[ident] += 1
+            if task is not None:
+                self._loops[ident] = task.get_loop()
+                self._tasks.add(task)
+
+    def add_task(self, task: "asyncio.Task[Any]") -> None:
+        """Attribute `task`, spawned by the profiled request, to it."""
+        with self._lock:
+            self._tasks.add(task)
+
+    def remove_thread(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+                self._loops.pop(ident, None)
+
+    def start(self) -> None:
+        task = _current_task()
+        if task is not None:
+            track_request_tasks(task.get_loop())
+        self.add_thread()
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        """Stop sampling and return sample count per collapsed stack."""
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                idents = list(self._threads)
+                loops = dict(self._loops)
+            before = _running_tasks(loops)
+            frames = sys._current_frames()
+            # a task switch between both reads makes the frame ambiguous
+            after = _running_tasks(loops)
+            for ident in idents:
+                if ident in loops:
+                    task = after[ident]
+                    if task is None or task is not before[ident]:
+                        continue
+                    with self._lock:
+                        if task not in self._tasks:
+                            continue
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[collapse_stack(frame)] += 1
+
+
+def _current_task() -> "asyncio.Task[Any] | None":
+    try:
+        return asyncio.current_task()
+    except RuntimeError:  # no running event loop in this thread
+        return None
+
+
+def _running_tasks(
+    loops: Dict[int, asyncio.AbstractEventLoop],
+) -> "Dict[int, asyncio.Task[Any] | None]":
+    return {ident: asyncio.current_task(loop) for ident, loop in loops.items()}
+
+
+def track_request_tasks(loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Install a task factory on `loop` attributing every task created in a
+    profiled request context (e.g. the one running the endpoint behind
+    `call_next`) to the request sampler. Installed once per loop.
+
+    Args:
+        - loop: event loop serving the requests
+    """
+    previous = loop.get_task_factory()
+    if getattr(previous, "tracks_requests", False):
+        return
+
+    def factory(
+        loop: asyncio.AbstractEventLoop,
+        coro: Any,
+        **kwargs: Any,
+    ) -> "asyncio.Future[Any]":
+        # `create_task(context=...)` passes the context the task runs in
+        context: Context | None = kwargs.get("context")
+        if context is None:
+            sampler = RequestContext.sampler()
+        else:
+            sampler = context.run(RequestContext.sampler)
+
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        if isinstance(sampler, StackSampler) and isinstance(
+            task, asyncio.Task
+        ):
+            sampler.add_task(task)
+        return task
+
+    factory.tracks_requests = True  # type: ignore[attr-defined]
+    loop.set_task_factory(factory)
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    """Stack as `root;...;leaf` line of the collapsed-stack format."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = "/".join(Path(code.co_filename).parts[-2:])
+        names.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sign_profile_header(secret: str, issued: int | None = None) -> str:
+    """
+    Value of the profile request header: `<unix time>.<hmac sha256>`.
+
+    Args:
+        - secret: shared profiling secret (PROFILE_SECRET)
+        - issued: unix time of the signature, default now
+    """
+    timestamp = str(int(time.time()) if issued is None else issued)
+    digest = hmac.new(
+        secret.encode(), timestamp.encode(), hashlib.sha256
+    ).hexdigest()
+    return f"{timestamp}.{digest}"
+
+
+class RequestProfiler:
+    """
+    Decide which requests to profile and store their profiles as
+    collapsed-stack files (`<dir>/<time>_<req id>.collapsed`, ready for
+    flamegraph.pl or speedscope), keeping the dir under `max_bytes`.
+    """
+
+    HEADER: Final = "X-Profile"
+    SIGNATURE_TTL: Final = 300  # seconds
+    SUFFIX: Final = ".collapsed"
+
+    def __init__(
+        self,
+        directory: str,
+        secret: str,
+        sample_rate: float,
+        interval: float,
+        max_bytes: int,
+    ) -> None:
+        self.directory = Path(directory)
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_bytes = max_bytes
+
+    def wants(self, header: str) -> bool:
+        """
+        Profile the request if it has a valid signed header, otherwise
+        pick it at the sample rate.
+
+        Args:
+            - header: value of the X-Profile request header
+        """
+        if header and self._is_signed(header):
+            return True
+        if self.sample_rate <= 0:
+            return False
+        return secrets.randbelow(1_000_000) < self.sample_rate * 1_000_000
+
+    def _is_signed(self, header: str) -> bool:
+        if not self.secret:
+            return False
+
+        timestamp, _, _ = header.partition(".")
+        try:
+            issued = int(timestamp)
+        except ValueError:
+            return False
+        if abs(time.time() - issued) > RequestProfiler.SIGNATURE_TTL:
+            return False
+
+        expected = sign_profile_header(self.secret, issued)
+        return hmac.compare_digest(expected, header)
+
+    def start(self) -> StackSampler:
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        return sampler
+
+    def finish(self, sampler: StackSampler, req_id: str) -> Path | None:
+        """
+        Stop sampling and write the profile of the request.
+
+        Return:
+            - path: written file, None if nothing was sampled or writing
+              failed
+        """
+        stacks = sampler.stop()
+        if not stacks:
+            return None
+
+        path = self.directory / f"{time.time_ns()}_{req_id}{self.SUFFIX}"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path.write_text(
+                "".join(f"{stack} {n}\n" for stack, n in stacks.items())
+            )
+            self._enforce_cap()
+        except OSError as exc:
+            logger.error(f"Fail to write profile: {exc}", key="profile")
+            return None
+
+        return path
+
+    def _enforce_cap(self) -> None:
+        """Delete oldest profiles until the dir fits in `max_bytes`."""
+        profiles = sorted(self.directory.glob(f"*{RequestProfiler.SUFFIX}"))
+        sizes = [path.stat().st_size for path in profiles]
+        total = sum(sizes)
+        for path, size in zip(profiles, sizes):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
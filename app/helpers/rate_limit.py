@@ -0,0 +1,328 @@
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import cache
+from typing import Any, Final, List, Tuple
+from urllib.parse import urlparse
+
+from app.core.constants import ResponseMsg
+from app.core.settings import Settings
+from app.helpers.exceptions import TooManyClientRequest
+from app.helpers.logger import logger
+
+
+def refill(
+    tokens: float, updated: float, now: float, capacity: float, rate: float
+) -> float:
+    """Token bucket content after refilling at `rate` tokens/second."""
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage of token buckets, `take` must be atomic per key. Shared
+    backends block on I/O, call them off the event loop.
+    """
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        """
+        Take one token from the bucket of given key.
+
+        Args:
+            - key: bucket identifier
+            - capacity: max tokens (burst)
+            - rate: tokens refilled per second
+
+        Return:
+            - retry_after: 0 if token taken, else seconds until available
+        """
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Drop all buckets."""
+
+
+class MemoryBackend(RateLimitBackend):
+    """Buckets in process memory, limits are per worker."""
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = refill(tokens, updated, now, capacity, rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return retry_after
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class NullBackend(RateLimitBackend):
+    """Never limits, for load tests driving every request from one host."""
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        return 0.0
+
+    def reset(self) -> None:
+        pass
+
+
+class SQLiteBackend(RateLimitBackend):
+    """Buckets in a local SQLite file shared by every worker of a host."""
+
+    CLEANUP_EVERY: Final = 1000  # operations between stale bucket cleanup
+    STALE_AFTER: Final = 3600  # seconds
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._ops = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit "
+                "(key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_limit WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = refill(tokens, updated, now, capacity, rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            self._ops += 1
+            if self._ops % SQLiteBackend.CLEANUP_EVERY == 0:
+                conn.execute(
+                    "DELETE FROM rate_limit WHERE updated < ?",
+                    (now - SQLiteBackend.STALE_AFTER,),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        return retry_after
+
+    def reset(self) -> None:
+        self._connect().execute("DELETE FROM rate_limit")
+
+
+class RedisBackend(RateLimitBackend):
+    """
+    Buckets in Redis (or any server speaking its protocol) shared by all
+    app servers. Each take is a single atomic Lua script using the
+    server clock, spoken over a minimal RESP client.
+    """
+
+    SCRIPT: Final = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry)
+"""
+    PREFIX: Final = "ratelimit:"
+
+    def __init__(
+        self, host: str, port: int, db: int = 0, password: str | None = None
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self._local = threading.local()
+        self._sha: str | None = None
+
+    def _connect(self) -> Tuple[socket.socket, Any]:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=1)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._command("AUTH", self.password)
+            if self.db:
+                self._command("SELECT", str(self.db))
+        return conn
+
+    def _command(self, *args: str) -> Any:
+        sock, reader = self._connect()
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode()
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        try:
+            sock.sendall(b"".join(payload))
+            return self._read_reply(reader)
+        except OSError:
+            self._local.conn = None
+            sock.close()
+            raise
+
+    def _read_reply(self, reader: Any) -> Any:
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RedisError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            return reader.read(size + 2)[:-2].decode()
+        if kind == b"*":
+            size = int(body)
+            if size < 0:
+                return None
+            items: List[Any] = [self._read_reply(reader) for _ in range(size)]
+            return items
+        raise RedisError(f"Unknown reply {line!r}")
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        args = ("1", RedisBackend.PREFIX + key, str(capacity), str(rate))
+        if self._sha is None:
+            self._sha = self._command("SCRIPT", "LOAD", RedisBackend.SCRIPT)
+        try:
+            result = self._command("EVALSHA", str(self._sha), *args)
+        except RedisError as err:
+            if not str(err).startswith("NOSCRIPT"):
+                raise
+            result = self._command("EVAL", RedisBackend.SCRIPT, *args)
+        return float(result)
+
+    def reset(self) -> None:
+        cursor = "0"
+        while True:
+            cursor, keys = self._command(
+                "SCAN", cursor, "MATCH", RedisBackend.PREFIX + "*"
+            )
+            if keys:
+                self._command("DEL", *keys)
+            if cursor == "0":
+                break
+
+
+class RedisError(Exception):
+    pass
+
+
+class RateLimiter:
+    """Token bucket limiter on top of a pluggable backend."""
+
+    def __init__(self, backend: RateLimitBackend) -> None:
+        self.backend = backend
+
+    def hit(self, key: str, capacity: float, per_seconds: float) -> None:
+        """
+        Count one attempt against the bucket of given key.
+
+        Args:
+            - key: bucket identifier, e.g. client ip
+            - capacity: attempts allowed in a burst
+            - per_seconds: seconds to refill the whole capacity
+
+        Raise:
+            - TooManyClientRequest: no attempt left for the key
+        """
+        try:
+            retry_after = self.backend.take(
+                key, capacity, capacity / per_seconds
+            )
+        except Exception as exc:
+            # limiter must never take authentication down with it
+            logger.error(f"Rate limit backend failure: {exc}", key="ratelimit")
+            return
+
+        if retry_after > 0:
+            raise TooManyClientRequest(
+                ResponseMsg.TOO_MANY_REQUESTS.value, retry_after=retry_after
+            )
+
+
+def create_backend(url: str) -> RateLimitBackend:
+    """
+    Backend from URL: `memory://`, `sqlite:///path/to/file.db`,
+    `redis://[:password@]host:port/db` or `none://` to disable limits.
+
+    Raise:
+        - ValueError: unknown scheme or missing path/host, a typo must
+            not quietly replace the shared limits by per worker ones
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "none":
+        return NullBackend()
+    if parsed.scheme == "memory":
+        return MemoryBackend()
+    if parsed.scheme == "sqlite" and parsed.path:
+        return SQLiteBackend(parsed.path)
+    if parsed.scheme == "redis" and parsed.hostname:
+        return RedisBackend(
+            host=parsed.hostname,
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip("/") or 0),
+            password=parsed.password,
+        )
+    raise ValueError(f"Invalid rate limit backend url: {url}")
+
+
+@cache
+def get_rate_limiter() -> RateLimiter:
+    """Limiter shared within the worker, backend built on first use"""
+    return RateLimiter(create_backend(Settings.RATE_LIMIT_BACKEND))
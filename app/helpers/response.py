@@ -1,6 +1,10 @@
-from typing import Dict, List, Union
+import hashlib
+from typing import Any, Dict, List, Mapping, Union
 
+from fastapi import Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from pydantic_core import to_json
 
 from app.core.constants import ResponseStatusMsg
 
@@ -12,8 +16,9 @@ class BaseSuccessResponse(BaseModel):
 class GetSuccessResponse(BaseSuccessResponse):
     data: List[Dict]
     current_page: int
-    total_page: int
+    total_page: int | None  # None when the total was not counted
     limit: int
+    next_cursor: str | None = None  # keyset cursor of the next page
 
 
 class PostSuccessResponse(BaseSuccessResponse):
@@ -23,3 +28,94 @@ class PostSuccessResponse(BaseSuccessResponse):
 class BaseFailResponse(BaseModel):
     status: str = ResponseStatusMsg.FAIL.value
     detail: str | None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded by pydantic-core serializer instead of stdlib
+    json. Pydantic models can be passed as content without model_dump().
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+class FailResponseBody:
+    """Rendered fail response bodies of constant error details."""
+
+    _bodies: Dict[str | None, bytes] = {}
+
+    @classmethod
+    def prerender(cls, *details: str) -> None:
+        """Render body of each constant detail once, e.g. on startup."""
+        for detail in details:
+            cls._bodies[detail] = to_json(BaseFailResponse(detail=detail))
+
+    @classmethod
+    def get(cls, detail: str | None) -> bytes:
+        """Rendered body, details not prerendered are rendered per call."""
+        body = cls._bodies.get(detail)
+        if body is None:
+            body = to_json(BaseFailResponse(detail=detail))
+        return body
+
+
+def fail_response(
+    detail: str | None,
+    status_code: int,
+    headers: Mapping[str, str] | None = None,
+) -> Response:
+    """
+    Fail response with BaseFailResponse body.
+
+    Args:
+        - detail: error detail shown to client
+        - status_code: HTTP status code
+        - headers: additional response headers
+    """
+    return Response(
+        content=FailResponseBody.get(detail),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def etag_of(body: bytes) -> str:
+    """Strong ETag of a response body."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check, with weak comparison as RFC 9110 requires."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def conditional_response(
+    content: Any,
+    if_none_match: str | None,
+    headers: Mapping[str, str] | None = None,
+) -> Response:
+    """
+    JSON response with a strong ETag, or an empty 304 when the client
+    already has this representation.
+
+    Args:
+        - content: response body, pydantic models allowed
+        - if_none_match: If-None-Match header of the request
+        - headers: additional response headers, e.g. Cache-Control
+    """
+    body = to_json(content)
+    etag = etag_of(body)
+    response_headers = {"ETag": etag, **(headers or {})}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=response_headers)
+
+    return Response(
+        content=body,
+        headers=response_headers,
+        media_type="application/json",
+    )
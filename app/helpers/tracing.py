@@ -0,0 +1,183 @@
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    ParamSpec,
+    Protocol,
+    TypeVar,
+)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+SpanListener = Callable[[str, float], None]
+_span_listeners: List[SpanListener] = []
+
+
+class ThreadSampler(Protocol):
+    """Profiler sampling the threads registered as working on a request."""
+
+    def add_thread(self) -> None: ...
+
+    def remove_thread(self) -> None: ...
+
+
+class RequestContext:
+    """
+    Request scoped state (request id, phase durations) kept in context
+    variables, so concurrent requests never overwrite each other's values.
+    """
+
+    _req_id: ContextVar[str | None] = ContextVar("req_id", default=None)
+    _phases: ContextVar[Dict[str, float] | None] = ContextVar(
+        "phases", default=None
+    )
+    _counts: ContextVar[Dict[str, int] | None] = ContextVar(
+        "counts", default=None
+    )
+    _sampler: ContextVar[ThreadSampler | None] = ContextVar(
+        "sampler", default=None
+    )
+    # monotonic deadline, mutable so lifting it reaches every task and
+    # thread the request was handed to
+    _deadline: ContextVar[List[float] | None] = ContextVar(
+        "deadline", default=None
+    )
+
+    @classmethod
+    def start(cls) -> str:
+        """Open a new request context and return its request id."""
+        req_id = str(uuid.uuid4())
+        cls._req_id.set(req_id)
+        cls._phases.set({})
+        cls._counts.set({})
+        cls._sampler.set(None)
+        cls._deadline.set(None)
+        return req_id
+
+    @classmethod
+    def req_id(cls) -> str | None:
+        return cls._req_id.get()
+
+    @classmethod
+    def phases(cls) -> Dict[str, float]:
+        """Accumulated duration (seconds) per phase of current request."""
+        return dict(cls._phases.get() or {})
+
+    @classmethod
+    def add_phase(cls, name: str, duration: float) -> None:
+        """
+        Add duration to a phase, repeated phases are summed up.
+        Outside of a request context this is a no-op.
+        """
+        phases = cls._phases.get()
+        if phases is None:
+            return
+
+        phases[name] = phases.get(name, 0.0) + duration
+
+    @classmethod
+    def counts(cls) -> Dict[str, int]:
+        """Counters (e.g. DB statements) of current request."""
+        return dict(cls._counts.get() or {})
+
+    @classmethod
+    def add_count(cls, name: str, amount: int = 1) -> None:
+        """Increase a counter, outside of a request context a no-op."""
+        counts = cls._counts.get()
+        if counts is None:
+            return
+
+        counts[name] = counts.get(name, 0) + amount
+
+    @classmethod
+    def sampler(cls) -> ThreadSampler | None:
+        """Profiler of current request, None if it is not profiled."""
+        return cls._sampler.get()
+
+    @classmethod
+    def set_sampler(cls, sampler: ThreadSampler | None) -> None:
+        cls._sampler.set(sampler)
+
+    @classmethod
+    def set_deadline(cls, timeout: float) -> None:
+        """Give current request `timeout` seconds from now."""
+        cls._deadline.set([time.monotonic() + timeout])
+
+    @classmethod
+    def clear_deadline(cls) -> None:
+        """Lift the deadline of current request, e.g. once it responded."""
+        deadline = cls._deadline.get()
+        if deadline:
+            deadline.clear()
+
+    @classmethod
+    def remaining(cls) -> float | None:
+        """
+        Seconds left before the deadline of current request, negative once
+        missed and None without deadline.
+        """
+        deadline = cls._deadline.get()
+        if not deadline:
+            return None
+
+        return deadline[0] - time.monotonic()
+
+
+def add_span_listener(listener: SpanListener) -> None:
+    """Register callback receiving every finished span (name, seconds)."""
+    _span_listeners.append(listener)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Measure the enclosed block as phase `name` of current request. When
+    the request is profiled, the current thread is sampled meanwhile.
+    """
+    sampler = RequestContext.sampler()
+    if sampler is not None:
+        sampler.add_thread()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        if sampler is not None:
+            sampler.remove_thread()
+        RequestContext.add_phase(name, duration)
+        for listener in _span_listeners:
+            listener(name, duration)
+
+
+def traced(name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Decorator version of `span` for service and repository methods."""
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def server_timing_header(phases: Dict[str, float], total: float) -> str:
+    """
+    Format phase durations as `Server-Timing` header value.
+
+    Args:
+        - phases: phase name and its duration in seconds
+        - total: whole request duration in seconds
+    """
+    metrics = [f"{name};dur={dur * 1000:.3f}" for name, dur in phases.items()]
+    metrics.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(metrics)
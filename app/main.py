@@ -1,24 +1,94 @@
+import math
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+
 from fastapi import FastAPI, status, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import PlainTextResponse, Response
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
 
+from app.core.constants import ResponseMsg
 from app.core.settings import Settings
-from app.db.sql import Database
+from app.db import db
 from app.helpers.exceptions import (
     BadClientReqeust,
     ConflictClientRequest,
+    DatabaseUnavailable,
+    DeadlineExceeded,
+    ForbiddenClientRequest,
     InternalServerError,
+    TooManyClientRequest,
     UnauthorizedClientRequest,
 )
-from app.helpers.response import BaseFailResponse
-from app.middleware import Middlewares
+from app.helpers.metrics import AUTH_OUTCOMES, registry
+from app.helpers.rate_limit import get_rate_limiter
+from app.helpers.response import (
+    FailResponseBody,
+    FastJSONResponse,
+    fail_response,
+)
+from app.middleware import CompressionMiddleware, Middlewares
 from app.v1 import v1_router
+from app.v1.admin.const import AdminErrorMsg
+from app.v1.auth.const import LOGIN_OUTCOME, LoginErrorMsg, RegisterErrorMsg
+from app.v1.auth.service import get_auth_service
+from app.v1.auth.usernames import get_username_filter
+from app.v1.session.activity import get_activity_buffer
+from app.v1.session.const import SessionErrorMsg
+
+
+def _constants(msg_class: type) -> List[str]:
+    return [
+        value
+        for name, value in vars(msg_class).items()
+        if name.isupper() and isinstance(value, str)
+    ]
+
+
+def prerender_fail_bodies() -> None:
+    """Render fail response bodies of all constant error details once."""
+    FailResponseBody.prerender(
+        *(msg.value for msg in ResponseMsg),
+        InternalServerError().message,
+        *_constants(LoginErrorMsg),
+        *_constants(RegisterErrorMsg),
+        *_constants(SessionErrorMsg),
+        *_constants(AdminErrorMsg),
+    )
 
 
-app = FastAPI(title=Settings.PROJECT_NAME, version=Settings.VERSION)
+def warmup() -> None:
+    """Open pool connections and prime hashing and JWT backends."""
+    db.warmup(Settings.WARMUP_DB_CONNECTIONS)
+    get_auth_service().warmup()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    prerender_fail_bodies()
+    get_rate_limiter()  # an invalid RATE_LIMIT_BACKEND fails startup
+    if Settings.WARMUP:
+        await run_in_threadpool(warmup)
+    # never fails startup, retried on use while the db is unreachable
+    await run_in_threadpool(get_username_filter().update)
+    yield
+    await run_in_threadpool(get_activity_buffer().close)
+    db.dispose()
+    # prefork workers leave with os._exit, atexit handlers never run
+    registry.flush()
+
+
+app = FastAPI(
+    title=Settings.PROJECT_NAME,
+    version=Settings.VERSION,
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 app.add_middleware(Middlewares)
+# outermost, compresses the final body including error responses
+app.add_middleware(CompressionMiddleware)
 app.include_router(v1_router)
 
 
@@ -30,25 +100,39 @@ async def health_check() -> Response:
 @app.get("/health/db", include_in_schema=False)
 async def health_check_db() -> Response:
     try:
-        sess = Database().session()
+        sess = db.session()
         sess.execute(text("SELECT 1"))
     except SQLAlchemyError as err:
         return Response(
             content=f"DB encounter issue: {err}",
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
         )
+    except DatabaseUnavailable as exc:
+        return Response(
+            content=exc.message,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        )
     else:
         return Response(content="DB is working")
     finally:
         sess.close()
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return PlainTextResponse(
+        content=registry.render(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(
     request: Request, exc: Exception
-) -> JSONResponse:
-    return JSONResponse(
-        content=BaseFailResponse(detail="Validation error").model_dump(),
+) -> Response:
+    return fail_response(
+        detail=ResponseMsg.VALIDATION_ERROR.value,
         status_code=status.HTTP_400_BAD_REQUEST,
     )
 
@@ -56,9 +140,9 @@ async def validation_exception_handler(
 @app.exception_handler(BadClientReqeust)
 async def bad_request_handler(
     request: Request, exc: BadClientReqeust
-) -> JSONResponse:
-    return JSONResponse(
-        content=BaseFailResponse(detail=exc.message).model_dump(),
+) -> Response:
+    return fail_response(
+        detail=exc.message,
         status_code=status.HTTP_400_BAD_REQUEST,
     )
 
@@ -66,29 +150,72 @@ async def bad_request_handler(
 @app.exception_handler(UnauthorizedClientRequest)
 async def unauthorized_request_handler(
     request: Request, exc: UnauthorizedClientRequest
-) -> JSONResponse:
-    return JSONResponse(
-        content=BaseFailResponse(detail=exc.message).model_dump(),
+) -> Response:
+    AUTH_OUTCOMES.inc(LOGIN_OUTCOME.get(exc.message, "other"))
+    return fail_response(
+        detail=exc.message,
         status_code=status.HTTP_401_UNAUTHORIZED,
         headers={"WWW-Authenticate": "Bearer"},
     )
 
 
+@app.exception_handler(ForbiddenClientRequest)
+async def forbidden_request_handler(
+    request: Request, exc: ForbiddenClientRequest
+) -> Response:
+    return fail_response(
+        detail=exc.message,
+        status_code=status.HTTP_403_FORBIDDEN,
+    )
+
+
 @app.exception_handler(ConflictClientRequest)
 async def conflict_request_handler(
     request: Request, exc: ConflictClientRequest
-) -> JSONResponse:
-    return JSONResponse(
-        content=BaseFailResponse(detail=exc.message).model_dump(),
+) -> Response:
+    return fail_response(
+        detail=exc.message,
         status_code=status.HTTP_409_CONFLICT,
     )
 
 
+@app.exception_handler(TooManyClientRequest)
+async def too_many_request_handler(
+    request: Request, exc: TooManyClientRequest
+) -> Response:
+    return fail_response(
+        detail=exc.message,
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable_handler(
+    request: Request, exc: DatabaseUnavailable
+) -> Response:
+    return fail_response(
+        detail=exc.message,
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(
+    request: Request, exc: DeadlineExceeded
+) -> Response:
+    return fail_response(
+        detail=exc.message,
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+    )
+
+
 @app.exception_handler(InternalServerError)
 async def internal_server_error_handler(
     request: Request, exc: InternalServerError
-) -> JSONResponse:
-    return JSONResponse(
-        content=BaseFailResponse(detail=exc.message).model_dump(),
+) -> Response:
+    return fail_response(
+        detail=exc.message,
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
     )
@@ -1 +1,2 @@
+from .compression import CompressionMiddleware  # noqa
 from .middleware import Middlewares  # noqa
@@ -0,0 +1,105 @@
+from typing import Final
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.constants import ExcludeAuthMiddlewarePath
+from app.core.settings import Settings
+from app.helpers.admission import AdmissionGate
+
+
+class AdmissionMiddleware:
+    """
+    Route requests to the admission gate of their route class. Health
+    and metrics endpoints bypass admission, authenticated requests are
+    queued ahead of anonymous ones.
+
+    The slot is held until the response body is sent: it is handed over
+    in the scope to the endpoint task of BaseHTTPMiddleware, which only
+    ends once its last body message was taken (see `release_after`).
+    """
+
+    HEAVY: Final = "heavy"
+    DEFAULT: Final = "default"
+    AUTHENTICATED_PRIORITY: Final = 0
+    ANONYMOUS_PRIORITY: Final = 1
+    # scope key of the gate whose slot the request holds
+    SCOPE_KEY: Final = "admission.gate"
+
+    def __init__(self) -> None:
+        self.gates = {
+            AdmissionMiddleware.HEAVY: AdmissionGate(
+                AdmissionMiddleware.HEAVY,
+                limit=Settings.ADMISSION_HEAVY_LIMIT,
+                queue_size=Settings.ADMISSION_HEAVY_QUEUE,
+                queue_timeout=Settings.ADMISSION_HEAVY_TIMEOUT,
+            ),
+            AdmissionMiddleware.DEFAULT: AdmissionGate(
+                AdmissionMiddleware.DEFAULT,
+                limit=Settings.ADMISSION_LIMIT,
+                queue_size=Settings.ADMISSION_QUEUE,
+                queue_timeout=Settings.ADMISSION_TIMEOUT,
+            ),
+        }
+
+    def route_class(self, path: str) -> str | None:
+        """
+        Route class of given path: HEAVY, DEFAULT or None for health and
+        metrics endpoints.
+
+        Args:
+            - path: full url path
+        """
+        if (
+            ExcludeAuthMiddlewarePath.HEALTH_CHECK.value in path
+            or ExcludeAuthMiddlewarePath.METRICS.value in path
+        ):
+            return None
+
+        if (
+            ExcludeAuthMiddlewarePath.LOGIN.value in path
+            or ExcludeAuthMiddlewarePath.REGISTER.value in path
+        ):
+            return AdmissionMiddleware.HEAVY
+
+        return AdmissionMiddleware.DEFAULT
+
+    def gate(self, path: str) -> AdmissionGate | None:
+        """
+        Admission gate of the route class of given path.
+
+        Args:
+            - path: full url path
+
+        Return:
+            - gate: None if the path is never shed
+        """
+        route_class = self.route_class(path)
+        if route_class is None:
+            return None
+
+        return self.gates[route_class]
+
+    def priority(self, authenticated: bool) -> int:
+        if authenticated:
+            return AdmissionMiddleware.AUTHENTICATED_PRIORITY
+        return AdmissionMiddleware.ANONYMOUS_PRIORITY
+
+    def release_after(self, app: ASGIApp) -> ASGIApp:
+        """
+        Wrap the app called by `call_next`: the slot left in the scope
+        is released once the app returned, its whole body being sent,
+        or failed or was cancelled by a client disconnect.
+
+        Args:
+            - app: next app of the middleware stack
+        """
+
+        async def held(scope: Scope, receive: Receive, send: Send) -> None:
+            gate = scope.pop(AdmissionMiddleware.SCOPE_KEY, None)
+            try:
+                await app(scope, receive, send)
+            finally:
+                if gate is not None:
+                    gate.release()
+
+        return held
@@ -0,0 +1,170 @@
+import gzip
+import zlib
+from typing import Final, FrozenSet, List
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.settings import Settings
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether Accept-Encoding allows gzip (explicitly or by `*`)."""
+    allowed = None
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if coding not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        # an explicit gzip entry wins over `*`
+        if coding == "gzip" or allowed is None:
+            allowed = quality > 0
+    return bool(allowed)
+
+
+class CompressionMiddleware:
+    """
+    Gzip responses for clients sending `Accept-Encoding: gzip`, only for
+    allow-listed content types. Bodies smaller than `min_size` are sent
+    as is (small auth responses would not gain from it). Longer streamed
+    bodies are compressed chunk by chunk and flushed with each chunk, so
+    NDJSON lines still reach the client as they are produced.
+
+    A compressed body has another representation: its ETag becomes weak.
+    """
+
+    SKIP_STATUS: Final = frozenset({204, 206, 304})
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        min_size: int = Settings.COMPRESSION_MIN_SIZE,
+        level: int = Settings.COMPRESSION_LEVEL,
+        content_types: FrozenSet[str] = Settings.COMPRESSION_TYPES,
+    ) -> None:
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.content_types = content_types
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        responder = _GzipResponder(send, accepts_gzip(accept_encoding), self)
+        await self.app(scope, receive, responder.send)
+
+
+class _GzipResponder:
+    def __init__(
+        self, send: Send, accepted: bool, config: CompressionMiddleware
+    ) -> None:
+        self._send = send
+        self.accepted = accepted
+        self.config = config
+        self.start: Message | None = None
+        self.compressor: "zlib._Compress | None" = None
+        self.passthrough = False
+        # body parts held until min_size is reached or the body ends
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # held until the body tells whether it is worth compressing
+            self.start = {**message, "headers": list(message["headers"])}
+            return
+        start = self.start
+        if message["type"] != "http.response.body" or start is None:
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            await self._send(message)
+        elif self.compressor is not None:
+            await self._send_compressed(self.compressor, message)
+        elif not self.buffer and not self._wants_compression(start):
+            await self._pass(start, message)
+        else:
+            await self._buffer_body(start, message)
+
+    def _wants_compression(self, start: Message) -> bool:
+        headers = MutableHeaders(raw=start["headers"])
+        if start["status"] in CompressionMiddleware.SKIP_STATUS:
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        media_type = content_type.split(";", 1)[0].strip().lower()
+        if media_type not in self.config.content_types:
+            return False
+
+        headers.add_vary_header("Accept-Encoding")
+        return self.accepted
+
+    async def _buffer_body(self, start: Message, message: Message) -> None:
+        """
+        Whole bodies (also the ones re-streamed by BaseHTTPMiddleware)
+        under min_size go out as is, larger ones are compressed.
+        """
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        self.buffer.append(body)
+        self.buffered += len(body)
+        if more_body and self.buffered < self.config.min_size:
+            return
+
+        body = b"".join(self.buffer)
+        self.buffer = []
+        if not more_body and len(body) < self.config.min_size:
+            await self._pass(start, {**message, "body": body})
+            return
+
+        headers = MutableHeaders(raw=start["headers"])
+        headers["Content-Encoding"] = "gzip"
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if not more_body:
+            compressed = gzip.compress(body, self.config.level, mtime=0)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send(start)
+            await self._send({**message, "body": compressed})
+            return
+
+        del headers["Content-Length"]
+        # wbits 31: gzip container
+        self.compressor = zlib.compressobj(self.config.level, wbits=31)
+        await self._send(start)
+        await self._send_compressed(self.compressor, {**message, "body": body})
+
+    async def _send_compressed(
+        self, compressor: "zlib._Compress", message: Message
+    ) -> None:
+        body = compressor.compress(message.get("body", b""))
+        more_body = message.get("more_body", False)
+        if more_body:
+            body += compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            body += compressor.flush()
+        await self._send({
+            "type": "http.response.body",
+            "body": body,
+            "more_body": more_body,
+        })
+
+    async def _pass(self, start: Message, message: Message) -> None:
+        self.passthrough = True
+        await self._send(start)
+        await self._send(message)
@@ -0,0 +1,67 @@
+import math
+from typing import Final
+
+from fastapi import Request
+
+from app.core.settings import Settings
+from app.helpers.tracing import RequestContext
+from app.middleware.admission import AdmissionMiddleware
+
+
+class DeadlineMiddleware:
+    """
+    Give every request a deadline, the configured one of its route class
+    or the one asked by the client in the X-Request-Timeout header
+    (seconds), capped at REQUEST_DEADLINE_MAX. Health and metrics
+    endpoints have none.
+
+    The deadline bounds the admission queue wait and every database
+    statement (see app.db.deadline); a missed one ends the request with
+    504.
+    """
+
+    HEADER: Final = "X-Request-Timeout"
+
+    def __init__(self) -> None:
+        self.timeouts = {
+            AdmissionMiddleware.HEAVY: Settings.REQUEST_DEADLINE_HEAVY,
+            AdmissionMiddleware.DEFAULT: Settings.REQUEST_DEADLINE,
+        }
+        self.max_timeout = Settings.REQUEST_DEADLINE_MAX
+
+    def start_req(self, request: Request, route_class: str | None) -> None:
+        """
+        Set the deadline of the request in its context.
+
+        Args:
+            - request: request from client-side
+            - route_class: AdmissionMiddleware route class of the request
+        """
+        if route_class is None:
+            return
+
+        timeout = self.timeouts[route_class]
+        asked = self._asked(request.headers.get(DeadlineMiddleware.HEADER))
+        if asked is not None:
+            timeout = min(asked, self.max_timeout)
+        if timeout > 0:
+            RequestContext.set_deadline(timeout)
+
+    def _asked(self, header: str | None) -> float | None:
+        """Valid timeout of the header, None to keep the configured one."""
+        if not header or self.max_timeout <= 0:
+            return None
+        try:
+            timeout = float(header)
+        except ValueError:
+            return None
+        if not math.isfinite(timeout) or timeout <= 0:
+            return None
+        return timeout
+
+    def finish_req(self) -> None:
+        """
+        Lift the deadline once the response started, the body of a
+        streamed response is paced by the client.
+        """
+        RequestContext.clear_deadline()
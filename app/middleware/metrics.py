@@ -0,0 +1,63 @@
+from fastapi import Request, Response
+from starlette.routing import Match
+
+from app.db.monitor import QueryMonitor
+from app.helpers.metrics import (
+    DB_CHECKOUTS_PER_REQUEST,
+    DB_STATEMENTS_PER_REQUEST,
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+)
+from app.helpers.tracing import RequestContext
+
+
+class MetricsMiddleware:
+    UNMATCHED_ROUTE = "unmatched"
+
+    def start_req(self) -> None:
+        """Mark request as in-flight."""
+        REQUESTS_IN_FLIGHT.inc()
+
+    def finish_req(self) -> None:
+        """Mark request as no longer in-flight."""
+        REQUESTS_IN_FLIGHT.dec()
+
+    def record_resp(
+        self, request: Request, response: Response, time: float
+    ) -> None:
+        """
+        Record request latency by route template, method and status, and
+        DB statements and checkouts made by the request.
+
+        Args:
+            - request: request from client-side
+            - response: response object that will be received by client
+            - time: time taken until process is completed
+        """
+        route = self.route_template(request)
+        REQUEST_LATENCY.observe(
+            time, route, request.method, str(response.status_code)
+        )
+        counts = RequestContext.counts()
+        DB_STATEMENTS_PER_REQUEST.observe(
+            counts.get(QueryMonitor.STATEMENTS, 0), route
+        )
+        DB_CHECKOUTS_PER_REQUEST.observe(
+            counts.get(QueryMonitor.CHECKOUTS, 0), route
+        )
+
+    def route_template(self, request: Request) -> str:
+        """
+        Route path template (e.g. `/v1/auth/login`) instead of raw path,
+        keeping label cardinality bounded.
+        """
+        route = request.scope.get("route")
+        if route is None:
+            # rejected before routing (e.g. by authentication)
+            for candidate in request.app.router.routes:
+                match, _ = candidate.matches(request.scope)
+                if match == Match.FULL:
+                    route = candidate
+                    break
+
+        return getattr(route, "path", MetricsMiddleware.UNMATCHED_ROUTE)
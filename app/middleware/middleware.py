@@ -1,26 +1,46 @@
+import math
 import time
 
 from fastapi import Request, Response, status
-from fastapi.responses import JSONResponse
 from starlette.middleware.base import (
     BaseHTTPMiddleware,
     RequestResponseEndpoint,
 )
+from starlette.types import ASGIApp
 
+from app.core.settings import Settings
 from app.helpers.exceptions import (
+    DatabaseUnavailable,
+    DeadlineExceeded,
     InternalServerError,
+    ServiceOverloaded,
     UnauthorizedClientRequest,
 )
 from app.helpers.logger import logger
-from app.helpers.response import BaseFailResponse
+from app.helpers.metrics import AUTH_OUTCOMES
+from app.helpers.response import fail_response
+from app.helpers.tracing import RequestContext, server_timing_header
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.deadline import DeadlineMiddleware
 from app.middleware.logger import LogMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
 from app.middleware.security import SecurityMiddleware
+from app.v1.auth.const import LOGIN_OUTCOME
 
 
 class Middlewares(BaseHTTPMiddleware):
+    ADMISSION = AdmissionMiddleware()
+    DEADLINE = DeadlineMiddleware()
     LOG = LogMiddleware(logger)
+    METRICS = MetricsMiddleware()
+    PROFILING = ProfilingMiddleware()
     SECURITY = SecurityMiddleware()
 
+    def __init__(self, app: ASGIApp) -> None:
+        # the endpoint task releases the admission slot of the request
+        super().__init__(Middlewares.ADMISSION.release_after(app))
+
     async def dispatch(
         self, request: Request, call_next: RequestResponseEndpoint
     ) -> Response:
@@ -31,35 +51,118 @@ class Middlewares(BaseHTTPMiddleware):
             - request: client request detail including url, json body, etc.
             - call_next: to call the endpoint/next process
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
+        RequestContext.start()
+        Middlewares.DEADLINE.start_req(
+            request, Middlewares.ADMISSION.route_class(request.url.path)
+        )
+        Middlewares.METRICS.start_req()
+        sampler = Middlewares.PROFILING.start_req(request)
+        try:
+            response = await self._process(request, call_next)
+        finally:
+            Middlewares.DEADLINE.finish_req()
+            Middlewares.METRICS.finish_req()
+            profile_id = Middlewares.PROFILING.finish_req(sampler)
+
+        total_time = time.perf_counter() - start_time
+        Middlewares.LOG.record_resp(response=response, time=total_time)
+        Middlewares.METRICS.record_resp(
+            request=request, response=response, time=total_time
+        )
+        if profile_id:
+            response.headers["X-Profile-Id"] = profile_id
+        if Settings.SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing_header(
+                RequestContext.phases(), total_time
+            )
+
+        return response
+
+    async def _process(
+        self, request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        """
+        Admit request by the gate of its route class, then authenticate
+        it and pass it to the endpoint. Shed requests never reach the
+        session queries of the authentication.
+        """
         await Middlewares.LOG.record_req(request=request)
 
         auth_header = request.headers.get("Authorization", "")
+        gate = Middlewares.ADMISSION.gate(request.url.path)
+        if gate is None:
+            return await self._authenticate(request, call_next, auth_header)
 
+        try:
+            await gate.acquire(
+                Middlewares.ADMISSION.priority(
+                    Middlewares.SECURITY.has_valid_token(auth_header)
+                ),
+                RequestContext.remaining(),
+            )
+        except ServiceOverloaded as exc:
+            return fail_response(
+                detail=exc.message,
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(exc.retry_after))},
+            )
+        except DeadlineExceeded as exc:
+            return fail_response(
+                detail=exc.message,
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            )
+
+        # taken over by the endpoint task once call_next starts it
+        request.scope[AdmissionMiddleware.SCOPE_KEY] = gate
+        try:
+            return await self._authenticate(request, call_next, auth_header)
+        finally:
+            # still there: the endpoint task was never started
+            if request.scope.pop(AdmissionMiddleware.SCOPE_KEY, None):
+                gate.release()
+
+    async def _authenticate(
+        self,
+        request: Request,
+        call_next: RequestResponseEndpoint,
+        auth_header: str,
+    ) -> Response:
+        """Authenticate request and call the endpoint."""
+        response: Response
         try:
             sub_id, sub, session_id = Middlewares.SECURITY.authenticate_user(
                 auth_header=auth_header, path=request.url.path
             )
         except UnauthorizedClientRequest as exc:
-            return JSONResponse(
-                content=BaseFailResponse(detail=exc.message).model_dump(),
+            AUTH_OUTCOMES.inc(LOGIN_OUTCOME.get(exc.message, "other"))
+            response = fail_response(
+                detail=exc.message,
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 headers={"WWW-Authenticate": "Bearer"},
             )
         except InternalServerError as exc:
-            return JSONResponse(
-                content=BaseFailResponse(detail=exc.message).model_dump(),
+            response = fail_response(
+                detail=exc.message,
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+        except DatabaseUnavailable as exc:
+            response = fail_response(
+                detail=exc.message,
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(exc.retry_after))},
+            )
+        except DeadlineExceeded as exc:
+            response = fail_response(
+                detail=exc.message,
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            )
+        else:
+            if any([sub_id, sub, session_id]):
+                request.state.session_id = session_id
+                request.state.username = sub
+                request.state.user_id = sub_id
 
-        if any([sub_id, sub, session_id]):
-            request.state.session_id = session_id
-            request.state.username = sub
-            request.state.user_id = sub_id
-
-        response = await call_next(request)
-
-        total_time = time.time() - start_time
-        Middlewares.LOG.record_resp(response=response, time=total_time)
+            response = await call_next(request)
 
         return response
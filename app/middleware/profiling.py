@@ -0,0 +1,48 @@
+from fastapi import Request
+
+from app.core.settings import Settings
+from app.helpers.profiling import RequestProfiler, StackSampler
+from app.helpers.tracing import RequestContext
+
+
+class ProfilingMiddleware:
+    def __init__(self) -> None:
+        self.profiler = RequestProfiler(
+            directory=Settings.PROFILE_DIR,
+            secret=Settings.PROFILE_SECRET,
+            sample_rate=Settings.PROFILE_SAMPLE_RATE,
+            interval=Settings.PROFILE_INTERVAL_MS / 1000,
+            max_bytes=Settings.PROFILE_MAX_MB * 1024 * 1024,
+        )
+
+    def start_req(self, request: Request) -> StackSampler | None:
+        """
+        Start profiling the request if it is signed or sampled.
+
+        Args:
+            - request: request from client-side
+        """
+        header = request.headers.get(RequestProfiler.HEADER, "")
+        if not self.profiler.wants(header):
+            return None
+
+        sampler = self.profiler.start()
+        RequestContext.set_sampler(sampler)
+        return sampler
+
+    def finish_req(self, sampler: StackSampler | None) -> str | None:
+        """
+        Write the profile of the request, tagged with the request id.
+
+        Return:
+            - profile_id: request id of the written profile, None if the
+              request was not profiled
+        """
+        if sampler is None:
+            return None
+
+        RequestContext.set_sampler(None)
+        req_id = RequestContext.req_id() or "unknown"
+        if self.profiler.finish(sampler, req_id) is None:
+            return None
+        return req_id
@@ -1,21 +1,20 @@
 from typing import Tuple, Optional
 
 from app.core.constants import ExcludeAuthMiddlewarePath
-from app.db import db
 from app.helpers.logger import logger
-from app.helpers.exceptions import UnauthorizedClientRequest
-from app.v1.auth import AuthRepository, AuthService
+from app.helpers.exceptions import (
+    InternalServerError,
+    UnauthorizedClientRequest,
+)
+from app.v1.auth.service import AuthService, get_auth_service
 from app.v1.auth.const import LoginErrorMsg
 from app.v1.auth.dto import TokenData
-from app.v1.session import SessionRepository, SessionService
 
 
 class SecurityMiddleware:
-    def __init__(self) -> None:
-        self.auth_service = AuthService(
-            auth_repo=AuthRepository(db),
-            sess_service=SessionService(SessionRepository(db)),
-        )
+    @property
+    def auth_service(self) -> AuthService:
+        return get_auth_service()
 
     def authenticate_user(
         self, auth_header: Optional[str], path: str
@@ -35,17 +34,23 @@ class SecurityMiddleware:
         if (
             ExcludeAuthMiddlewarePath.REGISTER.value in path
             or ExcludeAuthMiddlewarePath.LOGIN.value in path
+            or ExcludeAuthMiddlewarePath.REFRESH.value in path
+            or ExcludeAuthMiddlewarePath.USERNAME_AVAILABLE.value in path
             or ExcludeAuthMiddlewarePath.DOCS.value in path
             or ExcludeAuthMiddlewarePath.HEALTH_CHECK.value in path
+            or ExcludeAuthMiddlewarePath.METRICS.value in path
         ):
             return sub_id, sub, session_id
 
         if not auth_header:
-            logger.debug("No authorization header provided")
+            logger.debug(
+                "No authorization header provided", key="auth.no_header"
+            )
             raise UnauthorizedClientRequest(LoginErrorMsg.UNAUTHORIZED_USER)
 
         token = auth_header.replace("Bearer ", "")
         token_detail = self.check_jwt_token(token)
+        self.check_token_version(token_detail)
         self.check_session(token_detail)
 
         sub_id = token_detail.sub_id
@@ -54,12 +59,40 @@ class SecurityMiddleware:
 
         return sub_id, sub, session_id
 
+    def has_valid_token(self, auth_header: Optional[str]) -> bool:
+        """
+        Check the token signature and expiry only, no database query: it
+        decides the admission priority before the request is admitted and
+        fully authenticated.
+
+        Args:
+            - auth_header: Auhtorization header from client request
+        """
+        if not auth_header:
+            return False
+
+        try:
+            self.check_jwt_token(auth_header.replace("Bearer ", ""))
+        except (UnauthorizedClientRequest, InternalServerError):
+            return False
+        return True
+
     def check_jwt_token(self, token: str) -> TokenData:
         """
         Parse JWT token from client request.
         """
         return self.auth_service.verify_token(token=token)
 
+    def check_token_version(self, token: TokenData) -> None:
+        """
+        Ensure the sessions of the user were not revoked after the token
+        was issued.
+
+        Args:
+            - token
+        """
+        self.auth_service.check_token_version(token)
+
     def check_session(self, token: TokenData) -> None:
         """
         Ensure session is exist and active.
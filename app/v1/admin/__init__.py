@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+
+from .repository import AdminRepository  # noqa
+from .service import AdminService  # noqa
+from .view import AdminViews
+
+admin_views = AdminViews()
+admin_r = APIRouter(prefix="/admin", tags=["Admin"])
+
+admin_r.add_api_route(
+    "/export/{table}", endpoint=admin_views.export, methods=["GET"]
+)
+admin_r.add_api_route(
+    "/sessions", endpoint=admin_views.list_sessions, methods=["GET"]
+)
+admin_r.add_api_route(
+    "/sessions/revoke", endpoint=admin_views.revoke_sessions, methods=["POST"]
+)
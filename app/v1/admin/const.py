@@ -0,0 +1,7 @@
+class AdminRule:
+    MAX_REVOKE_USERS = 1000  # usernames per revocation request
+    PAGE_LIMIT = 50  # default rows per page of admin listings
+
+
+class AdminErrorMsg:
+    NOT_ADMIN = "Admin access required"
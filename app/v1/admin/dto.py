@@ -0,0 +1,22 @@
+from enum import Enum
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from app.v1.admin.const import AdminRule
+
+
+class RevokeSessionsRequest(BaseModel):
+    usernames: List[str] = Field(
+        min_length=1, max_length=AdminRule.MAX_REVOKE_USERS
+    )
+
+
+class RevokeSessionsResponse(BaseModel):
+    users: int  # users whose tokens were revoked
+    sessions: int  # active sessions closed
+
+
+class ExportTable(Enum):
+    USERS = "users"
+    SESSIONS = "sessions"
@@ -0,0 +1,141 @@
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import bindparam, text
+
+from app.db import Database
+from app.db.ids import ID_TYPE, USER_KEY
+from app.db.export import TableExporter
+from app.db.pagination import KeysetPaginator, Page, TotalMode
+from app.helpers.tracing import traced
+
+
+class AdminRepository:
+    def __init__(self, db: Database) -> None:
+        self.db = db
+        # USER_KEY is a column name (app.db.ids), no input is interpolated
+        self.sessions = KeysetPaginator(
+            db,
+            select=f"""
+                SELECT
+                    s.id,
+                    p.hash_id AS platform_user_id,
+                    p.username,
+                    s.create_date,
+                    s.last_seen
+                FROM sessions AS s
+                JOIN platform_users AS p ON p.{USER_KEY} = s.platform_user_id
+            """,  # nosec B608
+            table="sessions",
+            keys=("s.create_date", "s.id"),
+            where="s.is_active = 1",
+            types={"id": ID_TYPE, "platform_user_id": ID_TYPE},
+        )
+        self.exports = {
+            "users": TableExporter(
+                db,
+                select="""
+                    SELECT
+                        p.id,
+                        p.hash_id,
+                        p.username,
+                        p.email,
+                        p.is_active,
+                        p.create_date,
+                        p.update_date
+                    FROM platform_users AS p
+                """,
+                keys=("p.id",),
+                date_column="p.create_date",
+                active_column="p.is_active",
+                types={"hash_id": ID_TYPE},
+            ),
+            "sessions": TableExporter(
+                db,
+                # the user hash id, whichever column sessions reference
+                select=f"""
+                    SELECT
+                        s.id,
+                        p.hash_id AS platform_user_id,
+                        s.is_active,
+                        s.create_date,
+                        s.update_date,
+                        s.last_seen
+                    FROM sessions AS s
+                    JOIN platform_users AS p
+                        ON p.{USER_KEY} = s.platform_user_id
+                """,  # nosec B608
+                keys=("s.create_date", "s.id"),
+                date_column="s.create_date",
+                active_column="s.is_active",
+                types={"id": ID_TYPE, "platform_user_id": ID_TYPE},
+            ),
+        }
+
+    @traced("db.list_sessions")
+    def list_sessions(
+        self, limit: int, cursor: str | None, total: TotalMode
+    ) -> Page:
+        """Page of active sessions, newest first"""
+        return self.sessions.page(limit, cursor, total)
+
+    @traced("db.revoke_user_sessions")
+    def revoke_user_sessions(
+        self, usernames: List[str]
+    ) -> Tuple[List[str], int]:
+        """
+        Revoke all sessions of given users in one transaction of two
+        set-based statements: bump token version of the users and close
+        their active sessions.
+
+        Return:
+            - user_ids: hash id of every revoked user
+            - sessions: number of closed sessions
+        """
+        bump_version = (
+            text(
+                """
+                UPDATE platform_users
+                SET token_version = token_version + 1
+                WHERE username IN :names
+                RETURNING hash_id
+                """
+            )
+            .bindparams(bindparam("names", expanding=True))
+            .columns(hash_id=ID_TYPE)
+        )
+        # the usernames are bound, USER_KEY is a column name
+        close_sessions = text(
+            f"""
+            UPDATE sessions
+            SET is_active = 0
+            WHERE is_active = 1
+                AND platform_user_id IN (
+                    SELECT p.{USER_KEY}
+                    FROM platform_users AS p
+                    WHERE p.username IN :names
+                )
+        """  # nosec B608
+        ).bindparams(bindparam("names", expanding=True))
+        with self.db.engine.begin() as db_conn:
+            bumped = db_conn.execute(bump_version, {"names": usernames})
+            user_ids = [str(user_id) for user_id in bumped.scalars()]
+            closed = db_conn.execute(close_sessions, {"names": usernames})
+
+        return user_ids, closed.rowcount
+
+    def export_rows(
+        self,
+        table: str,
+        is_active: int | None,
+        created_from: datetime | None,
+        created_to: datetime | None,
+        after: str | None,
+    ) -> Iterator[bytes]:
+        """
+        NDJSON export of users or sessions read by a server side cursor,
+        secrets (password and refresh hashes) are never exported.
+        """
+        return self.exports[table].stream(
+            is_active, created_from, created_to, after
+        )
@@ -0,0 +1,78 @@
+from datetime import datetime
+from functools import cache
+from typing import Iterator
+
+from app.db import db
+from app.db.pagination import TotalMode
+from app.helpers.logger import logger
+from app.helpers.response import GetSuccessResponse
+from app.helpers.tracing import traced
+from app.v1.admin.dto import (
+    ExportTable,
+    RevokeSessionsRequest,
+    RevokeSessionsResponse,
+)
+from app.v1.admin.repository import AdminRepository
+from app.v1.auth.versions import get_token_versions
+
+
+class AdminService:
+    def __init__(self, admin_repo: AdminRepository) -> None:
+        self.admin_repo = admin_repo
+
+    @traced("admin.list_sessions")
+    def list_sessions(
+        self, limit: int, cursor: str | None, total: TotalMode
+    ) -> GetSuccessResponse:
+        """Active sessions newest first, one page per call"""
+        page = self.admin_repo.list_sessions(limit, cursor, total)
+        return GetSuccessResponse(
+            data=page.rows,
+            current_page=page.current_page,
+            total_page=page.total_page,
+            limit=page.limit,
+            next_cursor=page.next_cursor,
+        )
+
+    def export(
+        self,
+        table: ExportTable,
+        is_active: int | None,
+        created_from: datetime | None,
+        created_to: datetime | None,
+        after: str | None,
+        admin: str,
+    ) -> Iterator[bytes]:
+        """NDJSON chunks of the whole table, filtered"""
+        logger.info(
+            f"{admin} exports {table.value} (is_active={is_active}, "
+            f"created {created_from} - {created_to}, resumed={bool(after)})",
+            key="admin.export",
+        )
+        return self.admin_repo.export_rows(
+            table.value, is_active, created_from, created_to, after
+        )
+
+    @traced("admin.revoke_sessions")
+    def revoke_sessions(
+        self, request: RevokeSessionsRequest, admin: str
+    ) -> RevokeSessionsResponse:
+        """
+        Force logout of given users: every session is closed and every
+        access token already issued stops working.
+        """
+        usernames = sorted(set(request.usernames))
+        user_ids, sessions = self.admin_repo.revoke_user_sessions(usernames)
+        get_token_versions().invalidate(user_ids)
+        logger.info(
+            f"{admin} revoked {sessions} sessions of {len(user_ids)} users",
+            key="admin.revoke",
+        )
+
+        return RevokeSessionsResponse(users=len(user_ids), sessions=sessions)
+
+
+@cache
+def get_admin_service() -> AdminService:
+    """AdminService shared by views, built on first use"""
+    return AdminService(AdminRepository(db))
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from fastapi import Query, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.settings import Settings
+from app.db.pagination import TotalMode
+from app.helpers.exceptions import ForbiddenClientRequest
+from app.helpers.response import FastJSONResponse, PostSuccessResponse
+from app.v1.admin.const import AdminErrorMsg, AdminRule
+from app.v1.admin.dto import ExportTable, RevokeSessionsRequest
+from app.v1.admin.service import get_admin_service
+
+
+class AdminViews:
+    async def list_sessions(
+        self,
+        request: Request,
+        limit: int = AdminRule.PAGE_LIMIT,
+        cursor: str | None = None,
+        total: TotalMode = TotalMode.NONE,
+    ) -> FastJSONResponse:
+        """
+        List active sessions newest first, only for admin users. Pass
+        next_cursor of a page as cursor to get the next one.
+        """
+        self.__require_admin(request)
+        # keyset page and optional COUNT(*) are blocking db work
+        page = await run_in_threadpool(
+            get_admin_service().list_sessions, limit, cursor, total
+        )
+        return FastJSONResponse(content=page, status_code=status.HTTP_200_OK)
+
+    async def export(
+        self,
+        request: Request,
+        table: ExportTable,
+        is_active: int | None = Query(default=None, ge=0, le=1),
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        after: str | None = None,
+    ) -> StreamingResponse:
+        """
+        Stream all users or sessions as NDJSON, only for admin users. Every
+        line has a cursor, pass the last one received as `after` to resume
+        an interrupted export.
+        """
+        admin = self.__require_admin(request)
+        chunks = get_admin_service().export(
+            table, is_active, created_from, created_to, after, admin
+        )
+        return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+    async def revoke_sessions(
+        self, request: Request, body: RevokeSessionsRequest
+    ) -> FastJSONResponse:
+        """
+        Revoke all sessions of given users, only for admin users.
+        """
+        admin = self.__require_admin(request)
+        # set based UPDATEs of sessions and token versions are blocking
+        result = await run_in_threadpool(
+            get_admin_service().revoke_sessions, body, admin
+        )
+        return FastJSONResponse(
+            content=PostSuccessResponse(data=result.model_dump()),
+            status_code=status.HTTP_200_OK,
+        )
+
+    def __require_admin(self, request: Request) -> str:
+        username = getattr(request.state, "username", "")
+        if username not in Settings.ADMIN_USERNAMES:
+            raise ForbiddenClientRequest(AdminErrorMsg.NOT_ADMIN)
+
+        return username
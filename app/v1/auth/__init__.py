@@ -12,3 +12,10 @@ auth_r.add_api_route(
     "/register", endpoint=auth_views.registration, methods=["POST"]
 )  # noqa
 auth_r.add_api_route("/logout", endpoint=auth_views.logout, methods=["POST"])
+auth_r.add_api_route("/me", endpoint=auth_views.me, methods=["GET"])
+auth_r.add_api_route("/refresh", endpoint=auth_views.refresh, methods=["POST"])
+auth_r.add_api_route(
+    "/username-available",
+    endpoint=auth_views.username_available,
+    methods=["GET"],
+)
@@ -1,6 +1,14 @@
 class AuthRule:
     MAX_USERNAME_CHAR = 25
     TOKEN_EXPIRES = 1  # minutes
+    REFRESH_EXPIRES = 60 * 24 * 7  # minutes, max lifetime of a session
+    # login/register attempts: (burst, seconds to refill the burst)
+    ATTEMPTS_PER_IP = (30, 60)
+    ATTEMPTS_PER_USERNAME = (10, 60)
+    # username availability checks, sent while typing a signup form
+    CHECKS_PER_IP = (60, 60)
+    # refresh token uses, a client refreshes once per TOKEN_EXPIRES
+    REFRESHES_PER_IP = (60, 60)
 
 
 class RegisterErrorMsg:
@@ -17,3 +25,14 @@ class LoginErrorMsg:
     OCCUPIED_SESSION = "User already in session"
     EXPIRED_SESSION = "Session has expired"
     INVALID_CREDS = "Could not validate credentials"
+    INVALID_REFRESH = "Invalid refresh token"
+    REVOKED_SESSION = "Session has been revoked"
+
+
+# metric label of each login outcome, keyed by the error message
+LOGIN_OUTCOME = {
+    msg: name.lower()
+    for name, msg in vars(LoginErrorMsg).items()
+    if name.isupper()
+}
+LOGIN_OUTCOME_SUCCESS = "success"
@@ -11,6 +11,11 @@ class LoginResponse(BaseModel):
     access_token: str
     token_type: str
     expires_in: int
+    refresh_token: str | None = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class RegisterRequest(BaseModel):
@@ -24,10 +29,22 @@ class RegisterResponse(BaseModel):
     email: str
 
 
+class MeResponse(BaseModel):
+    user_id: str
+    username: str
+    session_id: str
+
+
+class UsernameAvailableResponse(BaseModel):
+    username: str
+    available: bool
+
+
 class TokenData(BaseModel):
     """JWT standard structure"""
 
     sub: str  # username
     sub_id: str
     session: str
+    ver: int = 0  # token version of the user when issued
     exp: datetime | None = None  # expiry of the token
@@ -1,9 +1,14 @@
-from sqlalchemy import text
+from typing import Iterator
+
+from sqlalchemy import bindparam, text
 from sqlalchemy.engine.row import Row
 
 from app.db import Database
+from app.db.ids import ID_TYPE
 from app.db.models.user_mgmt import Platform_Users
+from app.helpers.exceptions import DatabaseUnavailable, DeadlineExceeded
 from app.helpers.logger import logger
+from app.helpers.tracing import traced
 from app.v1.auth.dto import RegisterRequest
 
 
@@ -11,6 +16,7 @@ class AuthRepository:
     def __init__(self, db: Database) -> None:
         self.db = db
 
+    @traced("db.get_user_by_username")
     def get_user_by_username(self, username: str) -> Row | None:
         """Get user object from given username"""
         user = None
@@ -22,17 +28,19 @@ class AuthRepository:
                 p.hash_id,
                 p.username,
                 p.pass_hash,
-                p.email
+                p.email,
+                p.token_version
             FROM platform_users AS p
             WHERE p.username = :name
                 AND p.is_active = 1
         """
-        )
+        ).columns(hash_id=ID_TYPE)
         with self.db.engine.connect() as db_conn:
             user = db_conn.execute(query, {"name": username}).fetchone()
 
         return user
 
+    @traced("db.get_user_with_similar_username")
     def get_user_with_similar_username(self, username: str) -> str | None:
         """Get platform_users object by given username case insensitive"""
         user = None
@@ -53,6 +61,7 @@ class AuthRepository:
 
         return user
 
+    @traced("db.create_new_user")
     def create_new_user(self, user: RegisterRequest) -> Platform_Users | None:
         """Create new platform_users object"""
         with self.db.session() as db_sess:
@@ -65,9 +74,65 @@ class AuthRepository:
             try:
                 db_sess.commit()
                 db_sess.refresh(new_user)
+            except (DatabaseUnavailable, DeadlineExceeded):
+                raise
             except Exception as err:
                 db_sess.rollback()
                 logger.error(f"Fail to add user {user.username}: {err}")
                 new_user = None
 
         return new_user
+
+    @traced("db.get_token_version")
+    def get_token_version(self, user_id: str) -> int | None:
+        """Get token version of an active user by given hash id"""
+        query = text(
+            """
+            SELECT p.token_version
+            FROM platform_users AS p
+            WHERE p.hash_id = :user_id
+                AND p.is_active = 1
+        """
+        ).bindparams(bindparam("user_id", type_=ID_TYPE))
+        with self.db.engine.connect() as db_conn:
+            version = db_conn.execute(query, {"user_id": user_id}).scalar()
+
+        return version
+
+    @traced("db.count_users")
+    def count_users(self) -> int:
+        """Count active users"""
+        query = text(
+            """
+            SELECT COUNT(*)
+            FROM platform_users
+            WHERE platform_users.is_active = 1
+        """
+        )
+        with self.db.engine.connect() as db_conn:
+            count = db_conn.execute(query).scalar()
+
+        return count or 0
+
+    def iter_usernames(
+        self, after_id: int = 0, batch_size: int = 1000
+    ) -> Iterator[Row]:
+        """
+        Stream id and username of active users with an id over
+        `after_id`, `batch_size` rows in memory at a time (server side
+        cursor where the dialect has one).
+        """
+        query = text(
+            """
+            SELECT platform_users.id, platform_users.username
+            FROM platform_users
+            WHERE platform_users.is_active = 1
+                AND platform_users.id > :after_id
+        """
+        )
+        with self.db.engine.connect() as db_conn:
+            result = db_conn.execution_options(
+                stream_results=True, yield_per=batch_size
+            ).execute(query, {"after_id": after_id})
+            for row in result:
+                yield row
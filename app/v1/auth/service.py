@@ -1,15 +1,20 @@
 from __future__ import annotations
 
 import datetime as dt
+import hashlib
+import secrets
 from datetime import datetime, timedelta
+from functools import cache
+from typing import Tuple
 
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from jose.exceptions import ExpiredSignatureError, JWTError
-from passlib.context import CryptContext
 from sqlalchemy.engine.row import Row
 
+from app.core.security import get_pwd_context
 from app.core.settings import Settings
+from app.db import db
 from app.helpers.exceptions import (
     BadClientReqeust,
     ConflictClientRequest,
@@ -17,16 +22,27 @@ from app.helpers.exceptions import (
     UnauthorizedClientRequest,
 )
 from app.helpers.logger import logger
-from app.v1.auth.const import AuthRule, LoginErrorMsg, RegisterErrorMsg
+from app.helpers.metrics import AUTH_OUTCOMES, USERNAME_CHECKS
+from app.helpers.tracing import traced
+from app.v1.auth.const import (
+    LOGIN_OUTCOME_SUCCESS,
+    AuthRule,
+    LoginErrorMsg,
+    RegisterErrorMsg,
+)
 from app.v1.auth.repository import AuthRepository
+from app.v1.auth.usernames import get_username_filter
+from app.v1.auth.versions import get_token_versions
 from app.v1.auth.dto import (
     LoginRequest,
     LoginResponse,
+    RefreshRequest,
     RegisterRequest,
     RegisterResponse,
     TokenData,
+    UsernameAvailableResponse,
 )
-from app.v1.session import SessionService
+from app.v1.session import SessionRepository, SessionService
 
 
 class AuthService:
@@ -34,7 +50,7 @@ class AuthService:
         self, auth_repo: AuthRepository, sess_service: SessionService
     ) -> None:
         self.oauth_scheme = OAuth2PasswordBearer(tokenUrl="token")
-        self.pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+        self.pwd_context = get_pwd_context()
         self.auth_repo = auth_repo
         self.sess_service = sess_service
 
@@ -43,7 +59,8 @@ class AuthService:
         self.__validate_username(request.username)
         if self.auth_repo.get_user_with_similar_username(request.username):
             logger.error(
-                f"{RegisterErrorMsg.REGISTERED_USERNAME}: {request.username}"
+                f"{RegisterErrorMsg.REGISTERED_USERNAME}: {request.username}",
+                key="register.duplicate",
             )
             raise ConflictClientRequest(RegisterErrorMsg.REGISTERED_USERNAME)
 
@@ -52,24 +69,53 @@ class AuthService:
         new_user = self.auth_repo.create_new_user(request)
         if not new_user:
             raise InternalServerError()
+        get_username_filter().add(str(new_user.username))
 
         return RegisterResponse(
             username=str(new_user.username), email=str(new_user.email)
         )
 
+    @traced("auth.username_available")
+    def username_available(self, username: str) -> UsernameAvailableResponse:
+        """
+        Check whether username can be registered. Answered by the username
+        filter when possible, the db is queried only on a possible hit.
+        """
+        self.__validate_username(username)
+        if not get_username_filter().maybe_taken(username):
+            USERNAME_CHECKS.inc("filter_miss")
+            available = True
+        else:
+            available = not self.auth_repo.get_user_with_similar_username(
+                username
+            )
+            USERNAME_CHECKS.inc("false_positive" if available else "taken")
+
+        return UsernameAvailableResponse(
+            username=username, available=available
+        )
+
     def __validate_username(self, username: str) -> None:
         if not username:
-            logger.error(f"{RegisterErrorMsg.EMPTY_USERNAME}: {username}")
+            logger.error(
+                f"{RegisterErrorMsg.EMPTY_USERNAME}: {username}",
+                key="register.validation",
+            )
             raise BadClientReqeust(RegisterErrorMsg.EMPTY_USERNAME)
 
         if not self.__is_containing_alphabet(username):
             logger.error(
-                f"{RegisterErrorMsg.NO_ALPHABET_USERNAME}: {username}"
+                f"{RegisterErrorMsg.NO_ALPHABET_USERNAME}: {username}",
+                key="register.validation",
             )
             raise BadClientReqeust(RegisterErrorMsg.NO_ALPHABET_USERNAME)
 
         if len(username) > AuthRule.MAX_USERNAME_CHAR:
-            logger.error(f"{RegisterErrorMsg.MAX_CHAR_USENAME}: {username}")
+            logger.error(
+                f"{RegisterErrorMsg.MAX_CHAR_USENAME}: "
+                f"{username[: AuthRule.MAX_USERNAME_CHAR]}...",
+                key="register.validation",
+            )
             raise BadClientReqeust(RegisterErrorMsg.MAX_CHAR_USENAME)
 
     def __is_containing_alphabet(self, username: str) -> bool:
@@ -82,6 +128,7 @@ class AuthService:
 
         return is_contain
 
+    @traced("auth.hash_password")
     def __create_hash_password(self, password: str) -> str:
         """Create hash password"""
         return self.pwd_context.hash(password)
@@ -89,23 +136,82 @@ class AuthService:
     def login(self, request: LoginRequest) -> LoginResponse:
         """Login user"""
         user = self.__validate_creds(request.username, request.password)
-        session_id = self.sess_service.create_session(user.hash_id)
+        refresh_secret, refresh_hash = self.__create_refresh_secret()
+        try:
+            # rejects users already in session, no separate lookup needed
+            session_id = self.sess_service.create_session(
+                user.hash_id, refresh_hash
+            )
+        except ConflictClientRequest:
+            raise UnauthorizedClientRequest(LoginErrorMsg.OCCUPIED_SESSION)
+
         token_data = TokenData(
             sub=str(user.username),
             sub_id=str(user.hash_id),
             session=session_id,
+            ver=user.token_version,
         )
+        get_token_versions().set(token_data.sub_id, token_data.ver)
+        AUTH_OUTCOMES.inc(LOGIN_OUTCOME_SUCCESS)
 
         return LoginResponse(
             access_token=self.__create_access_token(token_data),
-            token_type="bearer",
+            token_type="bearer",  # nosec B106
             expires_in=AuthRule.TOKEN_EXPIRES,
+            refresh_token=f"{session_id}.{refresh_secret}",
         )
 
+    @traced("auth.refresh")
+    def refresh(self, request: RefreshRequest) -> LoginResponse:
+        """
+        Issue new access token from a refresh token `<session id>.<secret>`
+        without password verification. The refresh token is rotated, the
+        given one cannot be used again.
+        """
+        session_id, _, secret = request.refresh_token.partition(".")
+        if not session_id or not secret:
+            raise UnauthorizedClientRequest(LoginErrorMsg.INVALID_REFRESH)
+
+        new_secret, new_hash = self.__create_refresh_secret()
+        user = self.sess_service.rotate_refresh(
+            session_id,
+            old_hash=self.__hash_refresh_secret(secret),
+            new_hash=new_hash,
+            max_age=timedelta(minutes=AuthRule.REFRESH_EXPIRES),
+        )
+        if not user:
+            logger.debug(
+                f"Refresh rejected for session ({session_id})",
+                key="refresh.rejected",
+            )
+            raise UnauthorizedClientRequest(LoginErrorMsg.INVALID_REFRESH)
+
+        token_data = TokenData(
+            sub=str(user.username),
+            sub_id=str(user.hash_id),
+            session=session_id,
+            ver=user.token_version,
+        )
+        get_token_versions().set(token_data.sub_id, token_data.ver)
+        return LoginResponse(
+            access_token=self.__create_access_token(token_data),
+            token_type="bearer",  # nosec B106
+            expires_in=AuthRule.TOKEN_EXPIRES,
+            refresh_token=f"{session_id}.{new_secret}",
+        )
+
+    def __create_refresh_secret(self) -> Tuple[str, str]:
+        """Random refresh secret and its hash stored in the session"""
+        secret = secrets.token_urlsafe(32)
+        return secret, self.__hash_refresh_secret(secret)
+
+    def __hash_refresh_secret(self, secret: str) -> str:
+        # high entropy secret, a fast hash is enough (no argon2 needed)
+        return hashlib.sha256(secret.encode()).hexdigest()
+
     def __validate_creds(self, username: str, password: str) -> Row:
         """
-        Validate whether username exist or password correct
-        or session is occupied.
+        Validate whether username exist or password correct.
         Return user object if pass all validations.
         """
         user = self.auth_repo.get_user_by_username(username)
@@ -115,15 +221,14 @@ class AuthService:
         if not self.__verify_password(password, user.pass_hash):
             raise UnauthorizedClientRequest(LoginErrorMsg.UNAUTHORIZED_USER)
 
-        if self.sess_service.get_user_session(user_id=user.hash_id):
-            raise UnauthorizedClientRequest(LoginErrorMsg.OCCUPIED_SESSION)
-
         return user
 
+    @traced("auth.verify_password")
     def __verify_password(self, plain_pass: str, hashed_pass: str) -> bool:
         """Verify whether given password and password in db is same"""
         return self.pwd_context.verify(plain_pass, hashed_pass)
 
+    @traced("auth.create_token")
     def __create_access_token(
         self,
         data: TokenData,
@@ -138,13 +243,13 @@ class AuthService:
         return encoded_jwt
 
     def logout(self, session_id: str) -> None:
-        """Logout user with active session"""
-        if not self.sess_service.get_user_session(sess_id=session_id):
-            return
-
+        """
+        Logout user with active session, the session was already checked
+        by the security middleware.
+        """
         self.sess_service.blacklist_session(session_id)
-        return
 
+    @traced("auth.verify_token")
     def verify_token(self, token: str) -> TokenData:
         """Parse access token detail"""
         try:
@@ -154,25 +259,90 @@ class AuthService:
         except ExpiredSignatureError as exc:
             # no need to manually check for expiry time
             # this exception means the token already expires
-            logger.debug(f"JWT token ({token}) has expired: {exc}")
+            logger.debug(
+                f"JWT token ({self.__token_ref(token)}) has expired: {exc}",
+                key="jwt.expired",
+            )
             raise UnauthorizedClientRequest(LoginErrorMsg.EXPIRED_SESSION)
         except JWTError:
-            logger.debug(f"JWT token ({token}) is invalid")
+            logger.debug(
+                f"JWT token ({self.__token_ref(token)}) is invalid",
+                key="jwt.invalid",
+            )
             raise UnauthorizedClientRequest(LoginErrorMsg.INVALID_CREDS)
         except Exception as exc:
-            logger.debug(f"Fail to decode JWT token ({token}): {exc}")
+            logger.debug(
+                f"Fail to decode JWT token ({self.__token_ref(token)}): {exc}",
+                key="jwt.error",
+            )
             raise InternalServerError()
 
         token_data = TokenData(**payload)
         return token_data
 
+    def __token_ref(self, token: str) -> str:
+        """Short token reference for logs, never log the whole token"""
+        return f"...{token[-8:]}"
+
+    @traced("auth.check_token_version")
+    def check_token_version(self, token: TokenData) -> None:
+        """
+        Reject tokens issued before the sessions of the user were revoked,
+        the current version comes from the cache when possible.
+        """
+        versions = get_token_versions()
+        version = versions.get(token.sub_id)
+        if version is None:
+            version = self.auth_repo.get_token_version(token.sub_id)
+            if version is not None:
+                versions.set(token.sub_id, version)
+
+        if version != token.ver:
+            logger.debug(
+                f"Token of ({token.session} | {token.sub}) was revoked",
+                key="jwt.revoked",
+            )
+            raise UnauthorizedClientRequest(LoginErrorMsg.REVOKED_SESSION)
+
     def validate_session(self, token: TokenData) -> Row:
-        """Check whether session is exist in db"""
+        """Check whether session is exist in db and not idle"""
         session = self.sess_service.get_user_session(sess_id=token.session)
         if not session:
-            logger.debug(f"Session ({token.session} | {token.sub}) not exist")
+            logger.debug(
+                f"Session ({token.session} | {token.sub}) not exist",
+                key="session.not_exist",
+            )
             raise UnauthorizedClientRequest(LoginErrorMsg.INVALID_CREDS)
+        if self.sess_service.is_idle(session):
+            logger.debug(
+                f"Session ({token.session} | {token.sub}) idle",
+                key="session.idle",
+            )
+            self.sess_service.blacklist_session(token.session)
+            raise UnauthorizedClientRequest(LoginErrorMsg.EXPIRED_SESSION)
 
+        self.sess_service.touch(token.session)
         return session
 
     def forgot_password(self) -> None: ...
+
+    def warmup(self) -> None:
+        """
+        Exercise hashing and JWT once, so lazily loaded backends are ready
+        before the first real request.
+        """
+        hashed_pass = self.__create_hash_password("warmup")
+        self.__verify_password("warmup", hashed_pass)
+        token = self.__create_access_token(
+            TokenData(sub="warmup", sub_id="warmup", session="warmup")
+        )
+        self.verify_token(token)
+
+
+@cache
+def get_auth_service() -> AuthService:
+    """AuthService shared by views and middleware, built on first use"""
+    return AuthService(
+        auth_repo=AuthRepository(db),
+        sess_service=SessionService(SessionRepository(db)),
+    )
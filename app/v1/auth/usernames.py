@@ -0,0 +1,152 @@
+import threading
+import time
+from functools import cache
+from typing import Final, Set
+
+from app.core.settings import Settings
+from app.db import db
+from app.helpers.bloom import BloomFilter
+from app.helpers.logger import logger
+from app.v1.auth.repository import AuthRepository
+
+
+def normalize_username(username: str) -> str:
+    return username.lower()
+
+
+class UsernameFilter:
+    """
+    Bloom filter of the normalized usernames of active users, so most
+    availability checks need no query: a name not in the filter is free,
+    only a possible hit is checked in the db.
+
+    Built from a streamed query at startup (or on first use) and updated
+    on registration in this worker. Every `refresh_interval` seconds the
+    users registered since, through any worker, are read by id, so a name
+    taken elsewhere is reported available at most that long.
+
+    While the filter cannot be built (db unreachable), every name is a
+    possible hit answered by the db, the build is retried every
+    `refresh_interval` seconds.
+    """
+
+    ERROR_RATE: Final = 0.01
+    MIN_CAPACITY: Final = 10_000
+    # ids are allocated before commit, a refresh reads again the last
+    # ones so a registration committed late is not skipped
+    ID_OVERLAP: Final = 100
+
+    def __init__(
+        self,
+        auth_repo: AuthRepository,
+        refresh_interval: float = Settings.USERNAME_FILTER_REFRESH,
+    ) -> None:
+        self.auth_repo = auth_repo
+        self.refresh_interval = refresh_interval
+        self._filter: BloomFilter | None = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # names added while a build streams the table
+        self._added_in_build: Set[str] | None = None
+        self._max_id = 0  # highest user id read
+        self._updated_at = 0.0  # monotonic time of last build or refresh
+
+    def update(self, rebuild: bool = False) -> None:
+        """
+        Build the filter if there is none (or `rebuild`), otherwise read
+        the users registered since the last update once its interval
+        passed. Never raises: the error is logged and the update retried
+        after the interval.
+        """
+        now = time.monotonic()
+        if (
+            not rebuild
+            and self._filter is not None
+            and now - self._updated_at < self.refresh_interval
+        ):
+            return
+        # another thread is updating, the current filter answers meanwhile
+        if not self._build_lock.acquire(blocking=False):
+            return
+
+        try:
+            if not rebuild and now - self._updated_at < self.refresh_interval:
+                return
+            self._updated_at = now
+            if rebuild or self._filter is None:
+                self._build()
+            else:
+                self._refresh()
+        except Exception as exc:
+            logger.error(
+                f"Fail to update username filter: {exc}",
+                key="usernames.update",
+            )
+        finally:
+            self._build_lock.release()
+
+    def _build(self) -> None:
+        """Fill a new filter with every username, sized for growth."""
+        with self._lock:
+            self._added_in_build = set()
+        try:
+            capacity = max(
+                self.auth_repo.count_users() * 2, UsernameFilter.MIN_CAPACITY
+            )
+            bloom = BloomFilter(capacity, UsernameFilter.ERROR_RATE)
+            max_id = 0
+            for user in self.auth_repo.iter_usernames():
+                bloom.add(normalize_username(user.username))
+                max_id = max(max_id, user.id)
+        finally:
+            with self._lock:
+                added, self._added_in_build = self._added_in_build, None
+
+        with self._lock:
+            for username in added or ():
+                bloom.add(username)
+            self._filter = bloom
+            self._max_id = max_id
+        logger.debug(
+            f"Username filter built with {bloom.count} names",
+            key="usernames.build",
+        )
+
+    def _refresh(self) -> None:
+        """Add the usernames registered since the last build or refresh."""
+        after_id = max(self._max_id - UsernameFilter.ID_OVERLAP, 0)
+        for user in self.auth_repo.iter_usernames(after_id):
+            self._add(normalize_username(user.username))
+            self._max_id = max(self._max_id, user.id)
+
+    def add(self, username: str) -> None:
+        if self._add(normalize_username(username)):
+            # over capacity the false positive rate grows, resize
+            self.update(rebuild=True)
+
+    def _add(self, name: str) -> bool:
+        """Add a name once (re-read names are skipped), True when full."""
+        with self._lock:
+            if self._added_in_build is not None:
+                self._added_in_build.add(name)
+            if self._filter is None or name in self._filter:
+                return False
+            self._filter.add(name)
+            return self._filter.count > self._filter.capacity
+
+    def maybe_taken(self, username: str) -> bool:
+        """
+        False if the username is surely not registered, True when it may
+        be or while there is no filter.
+        """
+        self.update()
+        bloom = self._filter
+        if bloom is None:
+            return True
+        return normalize_username(username) in bloom
+
+
+@cache
+def get_username_filter() -> UsernameFilter:
+    """Username filter shared within the worker, built on first use"""
+    return UsernameFilter(AuthRepository(db))
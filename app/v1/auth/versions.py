@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import cache
+from typing import Final, Iterable, Tuple
+
+from app.core.settings import Settings
+
+
+class TokenVersionCache:
+    """
+    Token version per user hash id for the access token check, so most
+    requests do not query it. Entries live `ttl` seconds: a revocation
+    made by this worker is applied at once (see `invalidate`), one made
+    by another worker after at most `ttl`.
+    """
+
+    MAX_ENTRIES: Final = 100_000
+
+    def __init__(self, ttl: float, max_entries: int = MAX_ENTRIES) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._versions: OrderedDict[str, Tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> int | None:
+        with self._lock:
+            entry = self._versions.get(user_id)
+            if entry is None:
+                return None
+            version, expires = entry
+            if expires < time.monotonic():
+                del self._versions[user_id]
+                return None
+            self._versions.move_to_end(user_id)
+            return version
+
+    def set(self, user_id: str, version: int) -> None:
+        with self._lock:
+            self._versions[user_id] = (version, time.monotonic() + self.ttl)
+            self._versions.move_to_end(user_id)
+            if len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+    def invalidate(self, user_ids: Iterable[str]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._versions.pop(user_id, None)
+
+
+@cache
+def get_token_versions() -> TokenVersionCache:
+    """Token version cache shared within the worker"""
+    return TokenVersionCache(Settings.TOKEN_VERSION_TTL)
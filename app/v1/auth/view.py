@@ -1,40 +1,108 @@
+from typing import Tuple
+
 from fastapi import Request, status
-from fastapi.responses import JSONResponse, Response
-
-from app.db import db
-from app.helpers.response import PostSuccessResponse
-from app.v1.auth.repository import AuthRepository
-from app.v1.auth.dto import LoginRequest, RegisterRequest
-from app.v1.auth.service import AuthService
-from app.v1.session import SessionRepository, SessionService
-
-auth_service = AuthService(
-    auth_repo=AuthRepository(db),
-    sess_service=SessionService(SessionRepository(db)),
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from app.helpers.rate_limit import get_rate_limiter
+from app.helpers.response import (
+    FastJSONResponse,
+    PostSuccessResponse,
+    conditional_response,
 )
+from app.v1.auth.const import AuthRule
+from app.v1.auth.dto import (
+    LoginRequest,
+    MeResponse,
+    RefreshRequest,
+    RegisterRequest,
+)
+from app.v1.auth.service import get_auth_service
 
 
 class AuthViews:
-    async def registration(self, user: RegisterRequest) -> JSONResponse:
+    async def registration(
+        self, request: Request, user: RegisterRequest
+    ) -> FastJSONResponse:
         """
         Register new user if related information haven't been in the db.
         """
-        new_user = auth_service.register(user).model_dump()
-        return JSONResponse(
-            content=PostSuccessResponse(data=new_user).model_dump(),
+        await self.__limit_attempts(request, user.username)
+        # argon2 hashing runs off the event loop, see admission gates
+        new_user = await run_in_threadpool(get_auth_service().register, user)
+        return FastJSONResponse(
+            content=PostSuccessResponse(data=new_user.model_dump()),
             status_code=status.HTTP_201_CREATED,
         )
 
-    async def login(self, user: LoginRequest) -> JSONResponse:
+    async def login(
+        self, request: Request, user: LoginRequest
+    ) -> FastJSONResponse:
         """
         Login user if the related information is correct.
         """
-        login_creds = auth_service.login(user).model_dump()
-        return JSONResponse(
-            content=PostSuccessResponse(data=login_creds).model_dump(),
+        await self.__limit_attempts(request, user.username)
+        login_creds = await run_in_threadpool(get_auth_service().login, user)
+        return FastJSONResponse(
+            content=PostSuccessResponse(data=login_creds.model_dump()),
+            status_code=status.HTTP_200_OK,
+        )
+
+    async def username_available(
+        self, request: Request, username: str
+    ) -> FastJSONResponse:
+        """
+        Check whether username is still available, for signup forms.
+        """
+        # limited per ip, the registered usernames cannot be enumerated
+        await self.__hit(
+            f"username:ip:{self.__client_ip(request)}", AuthRule.CHECKS_PER_IP
+        )
+        # filter refresh/rebuild and the db check on a hit are blocking
+        result = await run_in_threadpool(
+            get_auth_service().username_available, username
+        )
+        return FastJSONResponse(
+            content=PostSuccessResponse(data=result.model_dump()),
+            status_code=status.HTTP_200_OK,
+        )
+
+    async def refresh(
+        self, request: Request, body: RefreshRequest
+    ) -> FastJSONResponse:
+        """
+        Issue new access token and rotated refresh token, no password
+        verification needed.
+        """
+        # limited per ip, refresh secrets cannot be guessed at full speed
+        await self.__hit(
+            f"refresh:ip:{self.__client_ip(request)}",
+            AuthRule.REFRESHES_PER_IP,
+        )
+        login_creds = await run_in_threadpool(get_auth_service().refresh, body)
+        return FastJSONResponse(
+            content=PostSuccessResponse(data=login_creds.model_dump()),
             status_code=status.HTTP_200_OK,
         )
 
+    async def me(self, request: Request) -> Response:
+        """
+        Current user from the token claims verified by the middleware, no
+        db access. Polling clients send the ETag back in If-None-Match and
+        get an empty 304 while nothing changed.
+        """
+        me = MeResponse(
+            user_id=request.state.user_id,
+            username=request.state.username,
+            session_id=request.state.session_id,
+        )
+        return conditional_response(
+            PostSuccessResponse(data=me.model_dump()),
+            request.headers.get("if-none-match"),
+            # per token, revalidated by the client on every use
+            headers={"Cache-Control": "private, no-cache"},
+        )
+
     async def logout(
         self,
         request: Request,
@@ -43,5 +111,32 @@ class AuthViews:
         Logout user, blacklist session id.
         """
         session_id = request.state.session_id
-        auth_service.logout(session_id)
+        get_auth_service().logout(session_id)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    async def __limit_attempts(self, request: Request, username: str) -> None:
+        """
+        Count attempt per client ip and per username, rejecting with 429
+        before any password hashing happens.
+        """
+        await self.__hit(
+            f"auth:ip:{self.__client_ip(request)}", AuthRule.ATTEMPTS_PER_IP
+        )
+        await self.__hit(
+            f"auth:user:{username.lower()[:AuthRule.MAX_USERNAME_CHAR]}",
+            AuthRule.ATTEMPTS_PER_USERNAME,
+        )
+
+    async def __hit(self, key: str, rule: Tuple[int, int]) -> None:
+        """
+        Take a token of the bucket, 429 when empty. Shared backends block
+        on I/O, so the bucket is taken off the event loop.
+
+        Args:
+            - key: bucket identifier
+            - rule: (burst, seconds to refill the burst)
+        """
+        await run_in_threadpool(get_rate_limiter().hit, key, *rule)
+
+    def __client_ip(self, request: Request) -> str:
+        return request.client.host if request.client else "unknown"
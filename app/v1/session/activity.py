@@ -0,0 +1,121 @@
+import os
+import threading
+from datetime import datetime
+from functools import cache
+from typing import Dict, Final
+
+from app.db import db
+from app.helpers.logger import logger
+from app.v1.session.repository import SessionRepository
+
+
+class ActivityBuffer:
+    """
+    Write-behind buffer of session last-seen times. Touches are coalesced
+    per session in memory and written in one batched UPDATE every
+    `flush_interval` seconds, once `flush_size` sessions are pending and
+    on shutdown, instead of one UPDATE per authenticated request.
+
+    At most `max_entries` sessions are kept, when flushing keeps failing
+    the oldest entries are dropped.
+    """
+
+    FLUSH_INTERVAL: Final = 5.0  # seconds
+    FLUSH_SIZE: Final = 500
+    MAX_ENTRIES: Final = 50_000
+
+    def __init__(
+        self,
+        sess_repo: SessionRepository,
+        flush_interval: float = FLUSH_INTERVAL,
+        flush_size: int = FLUSH_SIZE,
+        max_entries: int = MAX_ENTRIES,
+    ) -> None:
+        self.sess_repo = sess_repo
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_entries = max_entries
+        self._pending: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # pending times of the parent are not for the forked worker
+        os.register_at_fork(after_in_child=self._reset)
+
+    def touch(self, session_id: str, now: datetime | None = None) -> None:
+        """Record the session as used now."""
+        self._ensure_flusher()
+        with self._lock:
+            self._pending.pop(session_id, None)  # keep insertion = age
+            self._pending[session_id] = now or datetime.now()
+            while len(self._pending) > self.max_entries:
+                self._pending.pop(next(iter(self._pending)))
+            is_full = len(self._pending) >= self.flush_size
+
+        if is_full:
+            self.flush()
+
+    def pending(self, session_id: str) -> datetime | None:
+        """Last-seen time of the session not written to the db yet."""
+        with self._lock:
+            return self._pending.get(session_id)
+
+    def flush(self) -> int:
+        """Write pending last-seen times, return number of sessions."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            try:
+                self.sess_repo.update_last_seen(batch)
+            except Exception as exc:
+                logger.error(
+                    f"Fail to flush session activity: {exc}",
+                    key="activity.flush",
+                )
+                with self._lock:
+                    # newer touches win, failed ones are retried next time
+                    self._pending = {**batch, **self._pending}
+                return 0
+
+        return len(batch)
+
+    def close(self) -> None:
+        """Stop the background flusher and write what is pending."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="activity-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _reset(self) -> None:
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+
+@cache
+def get_activity_buffer() -> ActivityBuffer:
+    """Activity buffer shared within the worker, flusher starts on use"""
+    return ActivityBuffer(SessionRepository(db))
@@ -1,2 +1,6 @@
+class SessionRule:
+    IDLE_TIMEOUT = 30  # minutes without a request before a session expires
+
+
 class SessionErrorMsg:
     EXIST_SESSION = "User has an active session"
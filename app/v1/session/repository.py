@@ -1,43 +1,69 @@
-from sqlalchemy import text
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import DateTime, bindparam, select, text
 from sqlalchemy.engine.row import Row
 
+from app.core.settings import Settings
 from app.db import Database
-from app.db.models.user_mgmt import Sessions
+from app.db.ids import ID_TYPE, USER_KEY, USER_REF
+from app.db.models.user_mgmt import Platform_Users, Sessions
+from app.helpers.exceptions import DatabaseUnavailable, DeadlineExceeded
 from app.helpers.logger import logger
+from app.helpers.tracing import traced
+
+# typed, so the textual queries return datetimes on every dialect and
+# hex session ids whatever the id storage
+SESSION_COLUMNS = {
+    "id": ID_TYPE,
+    "create_date": DateTime(),
+    "last_seen": DateTime(),
+}
 
 
 class SessionRepository:
     def __init__(self, db: Database) -> None:
         self.db = db
 
+    @traced("db.get_session_by_user_id")
     def get_session_by_user_id(self, user_id: str) -> Row | None:
         """Get active session by given user hash id"""
         session = None
 
-        query = text(
-            """
-            SELECT *
-            FROM sessions AS s
-            WHERE s.platform_user_id = :user_id
-                AND s.is_active = 1
-        """
+        # USER_REF is constant SQL matching the bound :user_id
+        query = (
+            text(
+                f"""
+                SELECT *
+                FROM sessions AS s
+                WHERE s.platform_user_id = {USER_REF}
+                    AND s.is_active = 1
+                """  # nosec B608
+            )
+            .bindparams(bindparam("user_id", type_=ID_TYPE))
+            .columns(**SESSION_COLUMNS)
         )
         with self.db.engine.connect() as db_conn:
             session = db_conn.execute(query, {"user_id": user_id}).fetchone()
 
         return session
 
+    @traced("db.get_session_by_session_id")
     def get_session_by_session_id(self, session_id: str) -> Row | None:
         """Get active session by given session id"""
         session = None
 
-        query = text(
-            """
-            SELECT *
-            FROM sessions AS s
-            WHERE s.id = :sess_id
-                AND s.is_active = 1
-        """
+        query = (
+            text(
+                """
+                SELECT *
+                FROM sessions AS s
+                WHERE s.id = :sess_id
+                    AND s.is_active = 1
+                """
+            )
+            .bindparams(bindparam("sess_id", type_=ID_TYPE))
+            .columns(**SESSION_COLUMNS)
         )
         with self.db.engine.connect() as db_conn:
             session = db_conn.execute(
@@ -46,16 +72,30 @@ class SessionRepository:
 
         return session
 
-    def create_new_session(self, user_id: str) -> Sessions | None:
+    @traced("db.create_new_session")
+    def create_new_session(
+        self, user_id: str, refresh_hash: str | None = None
+    ) -> Sessions | None:
         """Create new session for user"""
+        platform_user_id: Any = user_id
+        if Settings.COMPACT_IDS:
+            # resolved by the INSERT itself, no separate lookup
+            platform_user_id = (
+                select(Platform_Users.id)
+                .where(Platform_Users.hash_id == user_id)
+                .scalar_subquery()
+            )
         with self.db.session() as db_sess:
             new_session: Sessions | None = Sessions(**{
-                "platform_user_id": user_id
+                "platform_user_id": platform_user_id,
+                "refresh_hash": refresh_hash,
             })
             db_sess.add(new_session)
             try:
                 db_sess.commit()
                 db_sess.refresh(new_session)
+            except (DatabaseUnavailable, DeadlineExceeded):
+                raise
             except Exception as exc:
                 db_sess.rollback()
                 logger.error(f"Fail to create session {user_id}: {exc}")
@@ -63,6 +103,7 @@ class SessionRepository:
 
         return new_session
 
+    @traced("db.set_as_inactive")
     def set_as_inactive(self, session_id: str) -> bool:
         """Set session is_active to 0"""
         with self.db.session() as db_sess:
@@ -72,6 +113,8 @@ class SessionRepository:
             try:
                 db_sess.commit()
                 is_inactivated = True
+            except (DatabaseUnavailable, DeadlineExceeded):
+                raise
             except Exception as exc:
                 db_sess.rollback()
                 logger.error(
@@ -80,3 +123,110 @@ class SessionRepository:
                 is_inactivated = False
 
         return is_inactivated
+
+    @traced("db.rotate_refresh_hash")
+    def rotate_refresh_hash(
+        self,
+        session_id: str,
+        old_hash: str,
+        new_hash: str,
+        created_after: datetime,
+        seen_after: datetime,
+    ) -> bool:
+        """
+        Replace refresh hash of an active, not idle session only if it
+        still is `old_hash` (compare-and-set), so a refresh token works
+        once.
+        """
+        query = text(
+            """
+            UPDATE sessions
+            SET previous_refresh_hash = refresh_hash,
+                refresh_hash = :new_hash
+            WHERE id = :sess_id
+                AND refresh_hash = :old_hash
+                AND is_active = 1
+                AND create_date > :created_after
+                AND COALESCE(last_seen, create_date) > :seen_after
+        """
+        ).bindparams(bindparam("sess_id", type_=ID_TYPE))
+        with self.db.engine.begin() as db_conn:
+            result = db_conn.execute(
+                query,
+                {
+                    "sess_id": session_id,
+                    "old_hash": old_hash,
+                    "new_hash": new_hash,
+                    "created_after": created_after,
+                    "seen_after": seen_after,
+                },
+            )
+
+        return result.rowcount == 1
+
+    @traced("db.revoke_replayed_refresh")
+    def revoke_replayed_refresh(self, session_id: str, old_hash: str) -> bool:
+        """
+        Set an active session as inactive if `old_hash` is the refresh
+        hash it already rotated away from, i.e. a spent token is replayed.
+        """
+        query = text(
+            """
+            UPDATE sessions
+            SET is_active = 0
+            WHERE id = :sess_id
+                AND previous_refresh_hash = :old_hash
+                AND is_active = 1
+        """
+        ).bindparams(bindparam("sess_id", type_=ID_TYPE))
+        with self.db.engine.begin() as db_conn:
+            result = db_conn.execute(
+                query, {"sess_id": session_id, "old_hash": old_hash}
+            )
+
+        return result.rowcount == 1
+
+    @traced("db.get_session_user")
+    def get_session_user(self, session_id: str) -> Row | None:
+        """Get username, hash id and token version of the session user"""
+        # USER_KEY is a column name (app.db.ids)
+        query = (
+            text(
+                f"""
+                SELECT p.username, p.hash_id, p.token_version
+                FROM sessions AS s
+                JOIN platform_users AS p ON p.{USER_KEY} = s.platform_user_id
+                WHERE s.id = :sess_id
+                """  # nosec B608
+            )
+            .bindparams(bindparam("sess_id", type_=ID_TYPE))
+            .columns(hash_id=ID_TYPE)
+        )
+        with self.db.engine.connect() as db_conn:
+            user = db_conn.execute(query, {"sess_id": session_id}).fetchone()
+
+        return user
+
+    @traced("db.update_last_seen")
+    def update_last_seen(self, last_seen: Dict[str, datetime]) -> None:
+        """
+        Write last-seen time of many sessions in one batched UPDATE. A
+        time older than the stored one (written by another worker) is
+        ignored.
+        """
+        query = text(
+            """
+            UPDATE sessions
+            SET last_seen = :last_seen
+            WHERE id = :sess_id
+                AND (last_seen IS NULL OR last_seen < :last_seen)
+        """
+        ).bindparams(bindparam("sess_id", type_=ID_TYPE))
+        with self.db.engine.begin() as db_conn:
+            db_conn.execute(
+                query,
+                [
+                    {"sess_id": sess_id, "last_seen": seen}
+                    for sess_id, seen in last_seen.items()
+                ],
+            )
@@ -1,7 +1,11 @@
+from datetime import datetime, timedelta
+
 from sqlalchemy.engine.row import Row
 
 from app.helpers.exceptions import ConflictClientRequest, InternalServerError
-from app.v1.session.const import SessionErrorMsg
+from app.helpers.tracing import traced
+from app.v1.session.activity import get_activity_buffer
+from app.v1.session.const import SessionErrorMsg, SessionRule
 from app.v1.session.repository import SessionRepository
 
 
@@ -9,6 +13,7 @@ class SessionService:
     def __init__(self, sess_repo: SessionRepository) -> None:
         self.sess_repo = sess_repo
 
+    @traced("session.get_user_session")
     def get_user_session(
         self, sess_id: str | None = None, user_id: str | None = None
     ) -> Row | None:
@@ -20,17 +25,63 @@ class SessionService:
 
         raise NotImplementedError()
 
-    def create_session(self, user_id: str) -> str:
+    @traced("session.create_session")
+    def create_session(
+        self, user_id: str, refresh_hash: str | None = None
+    ) -> str:
         """Create new session for a user"""
-        if self.sess_repo.get_session_by_user_id(user_id):
+        session = self.sess_repo.get_session_by_user_id(user_id)
+        if session and not self.is_idle(session):
             raise ConflictClientRequest(SessionErrorMsg.EXIST_SESSION)
+        if session:
+            # expired by inactivity, it does not block a new login
+            self.sess_repo.set_as_inactive(session.id)
 
-        session = self.sess_repo.create_new_session(user_id)
-        if not session:
+        new_session = self.sess_repo.create_new_session(user_id, refresh_hash)
+        if not new_session:
             raise InternalServerError()
 
-        return str(session.id)
+        return str(new_session.id)
 
+    @traced("session.blacklist_session")
     def blacklist_session(self, session_id: str) -> bool:
         """Ensure session cannot be used after logout or expires"""
         return self.sess_repo.set_as_inactive(session_id)
+
+    @traced("session.rotate_refresh")
+    def rotate_refresh(
+        self, session_id: str, old_hash: str, new_hash: str, max_age: timedelta
+    ) -> Row | None:
+        """
+        Rotate refresh hash of the session and return its user. Replaying
+        the token it replaced (reused or stolen) revokes the session, any
+        other mismatch is only rejected: the session id is no secret.
+        """
+        now = datetime.now()
+        seen_after = now - timedelta(minutes=SessionRule.IDLE_TIMEOUT)
+        if not self.sess_repo.rotate_refresh_hash(
+            session_id, old_hash, new_hash, now - max_age, seen_after
+        ):
+            self.sess_repo.revoke_replayed_refresh(session_id, old_hash)
+            return None
+
+        self.touch(session_id)
+        return self.sess_repo.get_session_user(session_id)
+
+    def touch(self, session_id: str) -> None:
+        """Mark session as used now, written to db in batches"""
+        get_activity_buffer().touch(session_id)
+
+    def is_idle(self, session: Row) -> bool:
+        """
+        Whether the session was not used for longer than the idle timeout,
+        counting uses not written to db yet.
+
+        Args:
+            - session: session row with create_date and last_seen
+        """
+        seen = [session.create_date, session.last_seen]
+        seen.append(get_activity_buffer().pending(session.id))
+        last_seen = max(time for time in seen if time is not None)
+        idle = datetime.now() - last_seen
+        return idle > timedelta(minutes=SessionRule.IDLE_TIMEOUT)
@@ -0,0 +1,2 @@
+# standalone performance benchmarks, run as modules from the project root
+# example: `python -m benchmarks.startup`
@@ -0,0 +1,433 @@
+"""
+End-to-end load test of the auth flows: virtual users drive a scenario
+for a fixed duration and the run is reported as JSON with RPS, latency
+percentiles (p50/p95/p99), error rate and status counts per operation.
+
+Target is the ASGI app in-process (default), a local `main.py` started
+for the run (--serve) or an already running server (--url). With
+--db-url the in-process app and --serve use that database (SQLite file
+or Postgres), tables are created if missing. Rate limiting is disabled
+unless --rate-limit is given, since every request comes from one host.
+
+Scenarios:
+    - register: every iteration registers a new user
+    - login: login then logout
+    - authenticated: login once, then authenticated requests, expired
+      access tokens are renewed with the refresh token
+    - mixed: 10% register, 30% login, 60% authenticated
+
+Usage: python -m benchmarks.loadtest [--scenario mixed] [--users 16]
+    [--duration 10] [--output run.json] [--baseline baseline.json]
+
+With --baseline the run is compared against a stored result and the
+exit status is 1 when p95, RPS or error rate regressed over --tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+PASSWORD = "loadtest-password"
+# polled like a real client: the ETag of the last answer is sent back,
+# so after the first call this mostly measures authentication and a 304
+AUTHENTICATED_REQ = ("GET", "/v1/auth/me", {200, 304})
+MIX = (("register", 0.1), ("login", 0.3), ("authenticated", 0.6))
+SETUP_RETRY_STATUS = {429, 503}
+
+
+class Recorder:
+    """Latency and status of every request, grouped by operation."""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter[str]] = defaultdict(Counter)
+        self.errors: Counter[str] = Counter()
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        op: str,
+        method: str,
+        url: str,
+        expected: set[int],
+        **kwargs: Any,
+    ) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.latencies[op].append(time.perf_counter() - start)
+            self.statuses[op][type(exc).__name__] += 1
+            self.errors[op] += 1
+            return None
+
+        self.latencies[op].append(time.perf_counter() - start)
+        self.statuses[op][str(response.status_code)] += 1
+        if response.status_code not in expected:
+            self.errors[op] += 1
+        return response
+
+    def report(self, duration: float) -> Dict[str, Any]:
+        ops = {
+            op: summarize(latencies, self.errors[op], duration)
+            for op, latencies in sorted(self.latencies.items())
+        }
+        for op, result in ops.items():
+            result["status"] = dict(self.statuses[op])
+
+        everything = [lat for lats in self.latencies.values() for lat in lats]
+        total = summarize(everything, sum(self.errors.values()), duration)
+        return {"total": total, "operations": ops}
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(
+    latencies: List[float], errors: int, duration: float
+) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "rps": round(count / duration, 2) if duration else 0.0,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+    }
+
+
+class VirtualUser:
+    """One client with its own account, driving a scenario."""
+
+    def __init__(
+        self, client: httpx.AsyncClient, recorder: Recorder, name: str
+    ) -> None:
+        self.client = client
+        self.recorder = recorder
+        self.name = name
+        self.registered = 0
+        self.token = ""
+        self.refresh_token = ""
+        self.etag = ""
+
+    async def setup(self) -> None:
+        """Register the account outside of measurement."""
+        body = self.register_body(self.name)
+        for _ in range(50):
+            response = await self.client.post("/v1/auth/register", json=body)
+            if response.status_code not in SETUP_RETRY_STATUS:
+                return
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"Could not register {self.name}")
+
+    def register_body(self, username: str) -> Dict[str, str]:
+        return {
+            "username": username,
+            "email": f"{username}@loadtest.dev",
+            "password": PASSWORD,
+        }
+
+    async def register(self) -> None:
+        self.registered += 1
+        await self.recorder.request(
+            self.client,
+            "register",
+            "POST",
+            "/v1/auth/register",
+            {201},
+            json=self.register_body(f"{self.name}r{self.registered}"),
+        )
+
+    async def login(self) -> bool:
+        response = await self.recorder.request(
+            self.client,
+            "login",
+            "POST",
+            "/v1/auth/login",
+            {200},
+            json={"username": self.name, "password": PASSWORD},
+        )
+        if response is None or response.status_code != 200:
+            return False
+        data = response.json()["data"]
+        self.token = data["access_token"]
+        self.refresh_token = data.get("refresh_token") or ""
+        return True
+
+    async def refresh(self) -> bool:
+        response = await self.recorder.request(
+            self.client,
+            "refresh",
+            "POST",
+            "/v1/auth/refresh",
+            {200},
+            json={"refresh_token": self.refresh_token},
+        )
+        if response is None or response.status_code != 200:
+            return False
+        data = response.json()["data"]
+        self.token = data["access_token"]
+        self.refresh_token = data["refresh_token"]
+        return True
+
+    async def logout(self) -> None:
+        await self.recorder.request(
+            self.client,
+            "logout",
+            "POST",
+            "/v1/auth/logout",
+            {204},
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+        self.token = ""
+
+    async def authenticated(self) -> None:
+        if not self.token and not await self.login():
+            return
+
+        method, url, expected = AUTHENTICATED_REQ
+        headers = {"Authorization": f"Bearer {self.token}"}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        response = await self.recorder.request(
+            self.client,
+            "authenticated",
+            method,
+            url,
+            expected,
+            headers=headers,
+        )
+        if response is not None and response.status_code == 200:
+            self.etag = response.headers.get("ETag", "")
+        if response is not None and response.status_code == 401:
+            # short lived token expired, renew it or login again
+            if not self.refresh_token or not await self.refresh():
+                self.token = ""
+
+    async def login_logout(self) -> None:
+        if self.token:
+            await self.logout()
+        if await self.login():
+            await self.logout()
+
+    async def run(
+        self, scenario: str, deadline: float, rng: random.Random
+    ) -> None:
+        steps = {
+            "register": self.register,
+            "login": self.login_logout,
+            "authenticated": self.authenticated,
+        }
+        names = [name for name, _ in MIX]
+        weights = [weight for _, weight in MIX]
+        while time.monotonic() < deadline:
+            if scenario == "mixed":
+                step = rng.choices(names, weights)[0]
+            else:
+                step = scenario
+            await steps[step]()
+
+        if self.token:
+            await self.client.post(
+                "/v1/auth/logout",
+                headers={"Authorization": f"Bearer {self.token}"},
+            )
+
+
+def prepare_env(db_url: str | None, rate_limit: bool) -> Dict[str, str]:
+    """
+    Environment of the app under test, set before importing it. Without
+    `db_url` nor DB_DIALECT in the environment a temporary SQLite file
+    is used.
+    """
+    env: Dict[str, str] = {}
+    if not rate_limit:
+        env["RATE_LIMIT_BACKEND"] = "none://"
+    if not db_url and not os.getenv("DB_DIALECT"):
+        db_file = os.path.join(tempfile.mkdtemp(), "loadtest.db")
+        db_url = f"sqlite:///{db_file}"
+    if db_url:
+        dialect = db_url.split(":", 1)[0].split("+", 1)[0]
+        env["DB_DIALECT"] = dialect
+        env[f"DB_{dialect}_URL"] = db_url
+    env.setdefault("ALGORITHM", os.getenv("ALGORITHM") or "HS256")
+    env.setdefault("SECRET_KEY", os.getenv("SECRET_KEY") or "loadtest")
+    os.environ.update(env)
+
+    from app.db import db
+    from app.db.base import Base
+
+    Base.metadata.create_all(db.engine)
+    db.dispose()
+    return env
+
+
+async def drive(
+    base_url: str, transport: httpx.AsyncBaseTransport | None, args: Any
+) -> Tuple[Dict[str, Any], float]:
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    run_id = secrets.token_hex(3)
+    limits = httpx.Limits(max_connections=args.users)
+    async with httpx.AsyncClient(
+        base_url=base_url, transport=transport, limits=limits, timeout=60
+    ) as client:
+        users = [
+            VirtualUser(client, recorder, f"lt{run_id}u{i}")
+            for i in range(args.users)
+        ]
+        setup = asyncio.Semaphore(4)
+
+        async def register(user: VirtualUser) -> None:
+            async with setup:
+                await user.setup()
+
+        await asyncio.gather(*(register(user) for user in users))
+
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(
+            *(
+                user.run(args.scenario, deadline, random.Random(rng.random()))
+                for user in users
+            )
+        )
+        elapsed = time.monotonic() - start
+
+    return recorder.report(elapsed), elapsed
+
+
+def run_served(args: argparse.Namespace, env: Dict[str, str]) -> Any:
+    from benchmarks.workers import wait_ready
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "main.py",
+            "--workers",
+            str(args.workers),
+            "--port",
+            str(args.port),
+        ],
+        env=dict(os.environ, **env),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(wait_ready(base_url))
+        return asyncio.run(drive(base_url, None, args))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def compare(
+    result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Regressions of each operation against the baseline run."""
+    regressions = []
+    current_ops = result["operations"]
+    for op, base in baseline["operations"].items():
+        current = current_ops.get(op)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{op}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms"
+            )
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{op}: rps {base['rps']} -> {current['rps']}")
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(
+                f"{op}: error rate {base['error_rate']} -> "
+                f"{current['error_rate']}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "--scenario",
+        choices=["register", "login", "authenticated", "mixed"],
+        default="mixed",
+    )
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="already running server")
+    parser.add_argument("--serve", action="store_true", help="run main.py")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8798)
+    parser.add_argument("--db-url", help="sqlite:///file or postgresql://…")
+    parser.add_argument("--rate-limit", action="store_true")
+    parser.add_argument("--output", help="write result JSON to file")
+    parser.add_argument("--baseline", help="compare with result JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.url:
+        report, elapsed = asyncio.run(drive(args.url, None, args))
+        target = args.url
+    else:
+        env = prepare_env(args.db_url, args.rate_limit)
+        target = f"{env.get('DB_DIALECT', os.getenv('DB_DIALECT'))}"
+        if args.serve:
+            report, elapsed = run_served(args, env)
+            target = f"main.py x{args.workers} / {target}"
+        else:
+            from app import app
+
+            transport = httpx.ASGITransport(app=app)
+            report, elapsed = asyncio.run(
+                drive("http://loadtest", transport, args)
+            )
+            target = f"asgi / {target}"
+
+    result = {
+        "scenario": args.scenario,
+        "users": args.users,
+        "duration_s": round(elapsed, 3),
+        "target": target,
+        "cpu_count": os.cpu_count(),
+        **report,
+    }
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Microbenchmarks of the auth and session hot paths, each timed in
+isolation against a scratch database: token create/verify, argon2 hash
+and verify, TokenData construction, every repository query, middleware
+authentication and request logging.
+
+Every benchmark is auto-ranged to run at least --min-time per repeat,
+repeated --repeat times with GC disabled; best and median per-call
+times are reported in microseconds with the spread between repeats, so
+noisy results are visible. Output is JSON.
+
+Usage: python -m benchmarks.micro [--filter db.] [--repeat 7]
+    [--db-url sqlite:///file] [--output micro.json]
+    [--baseline micro.json] [--tolerance 0.1]
+
+With --baseline the exit status is 1 when a median regressed over
+--tolerance.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+from datetime import timedelta
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Iterator, List
+
+from benchmarks.loadtest import prepare_env
+
+PASSWORD = "micro-password"
+# loggers of app.helpers.logger, written to a scratch dir while timed
+LOGGERS = ("debug_log", "info_log", "err_log")
+
+
+def measure(
+    func: Callable[[], object], repeat: int, min_time: float
+) -> Dict[str, float]:
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    best, median = min(times), statistics.median(times)
+    return {
+        "number": number,
+        "best_us": round(best * 1_000_000, 3),
+        "median_us": round(median * 1_000_000, 3),
+        "spread_pct": round((max(times) - best) / best * 100, 2),
+    }
+
+
+@contextlib.contextmanager
+def scratch_log_files() -> Iterator[str]:
+    """
+    Swap the file handlers of the app loggers for the same rotating
+    handlers in a temporary dir, so the logging benchmarks keep their
+    cost but never fill the app log files. Restored on exit.
+    """
+    swapped = []
+    with tempfile.TemporaryDirectory(prefix="micro-logs-") as log_dir:
+        try:
+            for name in LOGGERS:
+                log = logging.getLogger(name)
+                for handler in list(log.handlers):
+                    if not isinstance(handler, RotatingFileHandler):
+                        continue
+                    scratch = RotatingFileHandler(
+                        os.path.join(
+                            log_dir, os.path.basename(handler.baseFilename)
+                        ),
+                        maxBytes=handler.maxBytes,
+                        backupCount=handler.backupCount,
+                        delay=True,
+                    )
+                    scratch.setFormatter(handler.formatter)
+                    log.removeHandler(handler)
+                    log.addHandler(scratch)
+                    swapped.append((log, handler, scratch))
+            yield log_dir
+        finally:
+            for log, handler, scratch in swapped:
+                log.removeHandler(scratch)
+                scratch.close()
+                log.addHandler(handler)
+
+
+def build_cases() -> Dict[str, Callable[[], object]]:
+    """Benchmark name and the call to time, state seeded in the db."""
+    from app.helpers.logger import logger
+    from app.helpers.tracing import RequestContext
+    from app.middleware.security import SecurityMiddleware
+    from app.v1.auth.dto import RegisterRequest, TokenData
+    from app.v1.auth.service import get_auth_service
+
+    service = get_auth_service()
+    auth_repo = service.auth_repo
+    sess_repo = service.sess_service.sess_repo
+    security = SecurityMiddleware()
+    hash_password = getattr(service, "_AuthService__create_hash_password")
+    verify_password = getattr(service, "_AuthService__verify_password")
+    create_token = getattr(service, "_AuthService__create_access_token")
+
+    seq = itertools.count()
+    username = f"micro{os.getpid()}"
+    pass_hash = hash_password(PASSWORD)
+    auth_repo.create_new_user(
+        RegisterRequest(
+            username=username,
+            email=f"{username}@micro.dev",
+            password=pass_hash,
+        )
+    )
+    user = auth_repo.get_user_by_username(username)
+    session = sess_repo.create_new_session(user.hash_id)
+    session_id = str(session.id)
+    token_data = TokenData(
+        sub=username, sub_id=str(user.hash_id), session=session_id
+    )
+    # long lived, so it does not expire in the middle of a run
+    token = create_token(token_data.model_copy(), timedelta(hours=1))
+    payload = token_data.model_copy(update={"exp": None}).model_dump()
+    spare_session = str(sess_repo.create_new_session(user.hash_id).id)
+    RequestContext.start()
+
+    def new_user() -> object:
+        name = f"m{os.getpid()}n{next(seq)}"
+        return auth_repo.create_new_user(
+            RegisterRequest(
+                username=name, email=f"{name}@micro.dev", password=pass_hash
+            )
+        )
+
+    return {
+        "auth.verify_token": lambda: service.verify_token(token),
+        "auth.create_access_token": lambda: create_token(
+            token_data.model_copy()
+        ),
+        "auth.hash_password": lambda: hash_password(PASSWORD),
+        "auth.verify_password": lambda: verify_password(PASSWORD, pass_hash),
+        "dto.token_data": lambda: TokenData(
+            sub=username, sub_id=str(user.hash_id), session=session_id
+        ),
+        "dto.token_data_from_payload": lambda: TokenData(**payload),
+        "db.get_user_by_username": lambda: auth_repo.get_user_by_username(
+            username
+        ),
+        "db.get_user_with_similar_username": lambda: (
+            auth_repo.get_user_with_similar_username(username.upper())
+        ),
+        "db.create_new_user": new_user,
+        "db.get_session_by_user_id": lambda: sess_repo.get_session_by_user_id(
+            str(user.hash_id)
+        ),
+        "db.get_session_by_session_id": lambda: (
+            sess_repo.get_session_by_session_id(session_id)
+        ),
+        "db.create_new_session": lambda: sess_repo.create_new_session(
+            str(user.hash_id)
+        ),
+        "db.set_as_inactive": lambda: sess_repo.set_as_inactive(spare_session),
+        "middleware.authenticate_user": lambda: security.authenticate_user(
+            auth_header=f"Bearer {token}", path="/v1/auth/logout"
+        ),
+        "logger.accept": lambda: logger.accept(
+            url="http://micro/v1/auth/login",
+            method="POST",
+            header="{}",
+            payload={"username": username},
+        ),
+        "logger.complete": lambda: logger.complete(
+            result="Success", time=0.001
+        ),
+    }
+
+
+def compare(
+    result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Benchmarks whose median regressed against the baseline run."""
+    regressions = []
+    for name, base in baseline["benchmarks"].items():
+        current = result["benchmarks"].get(name)
+        if current and current["median_us"] > base["median_us"] * (
+            1 + tolerance
+        ):
+            regressions.append(
+                f"{name}: {base['median_us']}us -> {current['median_us']}us"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--filter", default="", help="name prefix")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--db-url", help="sqlite:///file or postgresql://…")
+    parser.add_argument("--output", help="write result JSON to file")
+    parser.add_argument("--baseline", help="compare with result JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    env = prepare_env(args.db_url, rate_limit=False)
+
+    with scratch_log_files():
+        cases = build_cases()
+        benchmarks = {
+            name: measure(func, args.repeat, args.min_time)
+            for name, func in cases.items()
+            if name.startswith(args.filter)
+        }
+    result = {
+        "dialect": env.get("DB_DIALECT", os.getenv("DB_DIALECT")),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "benchmarks": benchmarks,
+    }
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
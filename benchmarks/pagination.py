@@ -0,0 +1,228 @@
+"""
+Pagination benchmark of the admin session listing on a large sessions
+table (1M rows by default, seeded once per --db-url): first and deep
+pages by keyset cursor against the same pages by OFFSET, the exact
+against the estimated total, and session lookups by id and by user.
+
+With --compact-ids the schema stores ids as UUID/16 bytes (COMPACT_IDS),
+compare it with the default on another database; table and index sizes
+are reported with the timings.
+
+Timing works as in benchmarks.micro, per-call times in microseconds.
+
+Usage: python -m benchmarks.pagination [--rows 1000000] [--limit 50]
+    [--db-url sqlite:///file] [--compact-ids] [--output pagination.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict
+
+from benchmarks.loadtest import prepare_env
+from benchmarks.micro import measure
+
+BATCH = 10_000
+USERS = 1000
+
+
+def user_id(i: int) -> str:
+    return uuid.UUID(int=i + 1).hex
+
+
+def session_id(i: int) -> str:
+    return uuid.UUID(int=(1 << 64) + i).hex
+
+
+def seed(rows: int) -> None:
+    """Fill sessions up to `rows` active rows, users created as needed."""
+    from sqlalchemy import bindparam, text
+
+    from app.db import db
+    from app.db.ids import ID_TYPE, USER_REF
+
+    with db.engine.connect() as db_conn:
+        existing = db_conn.execute(text("SELECT COUNT(*) FROM sessions"))
+        count = existing.scalar() or 0
+    if count >= rows:
+        return
+
+    now = datetime.now()
+    if count == 0:
+        users = [
+            {"hash_id": user_id(i), "name": f"bench{i}"} for i in range(USERS)
+        ]
+        with db.engine.begin() as db_conn:
+            db_conn.execute(
+                text(
+                    """
+                    INSERT INTO platform_users
+                        (hash_id, username, email, pass_hash, token_version,
+                        is_active, create_date, update_date)
+                    VALUES
+                        (:hash_id, :name, :name || '@bench.dev', 'x', 0, 1,
+                        :now, :now)
+                """
+                ).bindparams(bindparam("hash_id", type_=ID_TYPE)),
+                [user | {"now": now} for user in users],
+            )
+
+    insert = text(
+        f"""
+        INSERT INTO sessions
+            (id, platform_user_id, is_active, create_date, update_date)
+        VALUES (:id, {USER_REF}, 1, :created, :created)
+    """
+    ).bindparams(
+        bindparam("id", type_=ID_TYPE), bindparam("user_id", type_=ID_TYPE)
+    )
+    for start in range(count, rows, BATCH):
+        with db.engine.begin() as db_conn:
+            db_conn.execute(
+                insert,
+                [
+                    {
+                        "id": session_id(i),
+                        "user_id": user_id(i % USERS),
+                        "created": now - timedelta(seconds=rows - i),
+                    }
+                    for i in range(start, min(start + BATCH, rows))
+                ],
+            )
+
+
+def build_cases(rows: int, limit: int) -> Dict[str, Callable[[], object]]:
+    from app.db import db
+    from app.db.pagination import TotalMode, encode_cursor, typed_text
+    from app.v1.admin.repository import AdminRepository
+    from app.v1.session.repository import SessionRepository
+
+    repo = AdminRepository(db)
+    sess_repo = SessionRepository(db)
+    paginator = repo.sessions
+    middle = rows // 2
+    offset_query = typed_text(
+        f"{paginator.select} WHERE {paginator.where}"
+        " ORDER BY s.create_date DESC, s.id DESC"
+        " LIMIT :limit OFFSET :offset",
+        paginator.types,
+        {},
+    )
+    with db.engine.connect() as db_conn:
+        last = db_conn.execute(
+            offset_query, {"limit": 1, "offset": middle - 1}
+        ).one()
+    deep_cursor = encode_cursor(2, [last.create_date, last.id])
+
+    def offset_page(offset: int) -> object:
+        with db.engine.connect() as db_conn:
+            return db_conn.execute(
+                offset_query, {"limit": limit, "offset": offset}
+            ).fetchall()
+
+    return {
+        "keyset.first_page": lambda: repo.list_sessions(
+            limit, None, TotalMode.NONE
+        ),
+        "keyset.deep_page": lambda: repo.list_sessions(
+            limit, deep_cursor, TotalMode.NONE
+        ),
+        "offset.first_page": lambda: offset_page(0),
+        "offset.deep_page": lambda: offset_page(middle),
+        "total.estimate": lambda: paginator.count(TotalMode.ESTIMATE, {}),
+        "total.exact": lambda: paginator.count(TotalMode.EXACT, {}),
+        "session.by_id": lambda: sess_repo.get_session_by_session_id(
+            session_id(middle)
+        ),
+        "session.by_user": lambda: sess_repo.get_session_by_user_id(
+            user_id(middle % USERS)
+        ),
+    }
+
+
+def storage_bytes() -> Dict[str, int]:
+    """Size of every table and index of the benchmark tables."""
+    from sqlalchemy import text
+
+    from app.db import db
+
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        query = text(
+            """
+            SELECT c.relname, pg_relation_size(c.oid)
+            FROM pg_class AS c
+            JOIN pg_namespace AS n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema()
+                AND c.relkind IN ('r', 'i')
+                AND (c.relname LIKE '%sessions%'
+                    OR c.relname LIKE '%platform_users%')
+        """
+        )
+    elif dialect == "sqlite":
+        query = text(
+            """
+            SELECT d.name, SUM(d.pgsize)
+            FROM dbstat AS d
+            JOIN sqlite_schema AS m ON m.name = d.name
+            WHERE m.tbl_name IN ('sessions', 'platform_users')
+            GROUP BY d.name
+        """
+        )
+    else:
+        return {}
+
+    with db.engine.connect() as db_conn:
+        return {name: int(size) for name, size in db_conn.execute(query)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--db-url", help="sqlite:///file or postgresql://…")
+    parser.add_argument(
+        "--compact-ids",
+        action="store_true",
+        help="UUID/16 bytes ids and integer session FK (COMPACT_IDS)",
+    )
+    parser.add_argument("--output", help="write result JSON to file")
+    args = parser.parse_args()
+
+    if args.compact_ids:
+        os.environ["COMPACT_IDS"] = "true"
+    env = prepare_env(args.db_url, rate_limit=False)
+    started = time.perf_counter()
+    seed(args.rows)
+    seed_seconds = time.perf_counter() - started
+    cases = build_cases(args.rows, args.limit)
+    result = {
+        "dialect": env.get("DB_DIALECT", os.getenv("DB_DIALECT")),
+        "python": sys.version.split()[0],
+        "rows": args.rows,
+        "limit": args.limit,
+        "compact_ids": args.compact_ids,
+        "seed_seconds": round(seed_seconds, 1),
+        "storage_bytes": storage_bytes(),
+        "benchmarks": {
+            name: measure(func, args.repeat, args.min_time)
+            for name, func in cases.items()
+        },
+    }
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Response rendering benchmark: legacy `JSONResponse(model.model_dump())`
+against pre-rendered fail bodies and FastJSONResponse, plus the whole
+unauthorized path (request without Authorization header) via the app.
+
+Usage: python -m benchmarks.responses [--number 20000]
+"""
+
+import argparse
+import json
+import timeit
+from typing import Callable, Dict
+
+from fastapi import Response, status
+from fastapi.responses import JSONResponse
+
+from app.helpers.response import (
+    BaseFailResponse,
+    FastJSONResponse,
+    PostSuccessResponse,
+    fail_response,
+)
+from app.v1.auth.const import LoginErrorMsg
+
+DETAIL = LoginErrorMsg.UNAUTHORIZED_USER
+HEADERS = {"WWW-Authenticate": "Bearer"}
+LOGIN_DATA = {
+    "access_token": "x" * 180,
+    "token_type": "bearer",
+    "expires_in": 1,
+}
+
+
+def legacy_unauthorized() -> JSONResponse:
+    return JSONResponse(
+        content=BaseFailResponse(detail=DETAIL).model_dump(),
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        headers=HEADERS,
+    )
+
+
+def prerendered_unauthorized() -> Response:
+    return fail_response(
+        detail=DETAIL,
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        headers=HEADERS,
+    )
+
+
+def legacy_success() -> JSONResponse:
+    return JSONResponse(
+        content=PostSuccessResponse(data=LOGIN_DATA).model_dump()
+    )
+
+
+def fast_success() -> FastJSONResponse:
+    return FastJSONResponse(content=PostSuccessResponse(data=LOGIN_DATA))
+
+
+def per_call_us(func: Callable[[], object], number: int) -> float:
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    return round(best / number * 1_000_000, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    from app import app
+    from app.main import prerender_fail_bodies
+
+    prerender_fail_bodies()
+    client = TestClient(app)
+
+    def unauthorized_request() -> object:
+        return client.post("/v1/auth/logout")
+
+    assert legacy_unauthorized().body == prerendered_unauthorized().body
+
+    results: Dict[str, float] = {
+        "legacy_unauthorized_us": per_call_us(
+            legacy_unauthorized, args.number
+        ),
+        "prerendered_unauthorized_us": per_call_us(
+            prerendered_unauthorized, args.number
+        ),
+        "legacy_success_us": per_call_us(legacy_success, args.number),
+        "fast_success_us": per_call_us(fast_success, args.number),
+        "unauthorized_request_us": per_call_us(
+            unauthorized_request, max(args.number // 100, 10)
+        ),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
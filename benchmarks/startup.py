@@ -0,0 +1,72 @@
+"""
+Startup-time benchmark: import time of `app` and time-to-first-request
+(import + lifespan startup + first authenticated-path request), each
+measured in a fresh interpreter so nothing is cached between runs.
+
+Usage: python -m benchmarks.startup [--runs 5] [--warmup]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    started = time.perf_counter()
+    client.post("/v1/auth/login", json={"username": "-", "password": "-"})
+    first = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "lifespan_s": started - imported,
+    "first_request_s": first - started,
+    "time_to_first_request_s": first - start,
+}))
+"""
+
+
+def run_once(warmup: bool) -> Dict[str, float]:
+    env = dict(os.environ, WARMUP="true" if warmup else "false")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true")
+    args = parser.parse_args()
+
+    samples: List[Dict[str, float]] = [
+        run_once(args.warmup) for _ in range(args.runs)
+    ]
+    report = {
+        "runs": args.runs,
+        "warmup": args.warmup,
+        "median": {
+            key: round(statistics.median(s[key] for s in samples), 6)
+            for key in samples[0]
+        },
+        "max": {
+            key: round(max(s[key] for s in samples), 6) for key in samples[0]
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
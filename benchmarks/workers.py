@@ -0,0 +1,115 @@
+"""
+Worker scaling report: starts `main.py` with each worker count, drives
+an argon2-bound login mix for a fixed duration and reports throughput
+plus per-worker RSS/PSS (PSS shows how much memory is really private
+after copy-on-write sharing with the master).
+
+Usage: python -m benchmarks.workers [--workers 1 2 4] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from app.core.server import process_memory
+
+LOGIN = {"username": "superuser", "password": "wrongpassword"}
+
+
+def worker_pids(master_pid: int) -> List[int]:
+    path = f"/proc/{master_pid}/task/{master_pid}/children"
+    try:
+        with open(path) as children:
+            return [int(pid) for pid in children.read().split()]
+    except OSError:
+        return []
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/health/server")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+async def drive(base_url: str, concurrency: int, duration: float) -> int:
+    done = 0
+    deadline = time.monotonic() + duration
+
+    async def user(client: httpx.AsyncClient) -> None:
+        nonlocal done
+        while time.monotonic() < deadline:
+            await client.post("/v1/auth/login", json=LOGIN)
+            done += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        await asyncio.gather(*(user(client) for _ in range(concurrency)))
+    return done
+
+
+def measure(
+    workers: int, port: int, args: argparse.Namespace
+) -> Dict[str, Any]:
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "main.py",
+            "--workers",
+            str(workers),
+            "--port",
+            str(port),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(wait_ready(base_url))
+        requests = asyncio.run(
+            drive(base_url, args.concurrency, args.duration)
+        )
+        memory = {pid: process_memory(pid) for pid in worker_pids(server.pid)}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    return {
+        "workers": workers,
+        "rps": round(requests / args.duration, 2),
+        "per_worker_memory_kb": list(memory.values()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    results = [measure(n, args.port, args) for n in args.workers]
+    base_rps = results[0]["rps"] or 1
+    for result in results:
+        result["scaling"] = round(result["rps"] / base_rps, 2)
+    print(json.dumps({"cpu_count": os.cpu_count(), "runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
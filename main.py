@@ -1 +1,75 @@
-from app import app  # noqa
+"""
+Production entry point: `python main.py` pre-forks workers from the
+preloaded `app`. `uvicorn main:app` keeps working for development.
+"""
+
+import argparse
+import os
+
+from app import app  # noqa: preloaded in master, shared with workers
+from app.core.server import PreforkServer, setup_logging
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("PORT", "8000"))
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=int(os.getenv("MAX_REQUESTS", "0")),
+        help="recycle worker after N requests, 0 = never",
+    )
+    parser.add_argument(
+        "--max-requests-jitter",
+        type=int,
+        default=int(os.getenv("MAX_REQUESTS_JITTER", "0")),
+    )
+    parser.add_argument(
+        "--max-rss-mb",
+        type=int,
+        default=int(os.getenv("MAX_RSS_MB", "0")),
+        help="recycle worker when its RSS passes N MB, 0 = never",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=int,
+        default=int(os.getenv("REPORT_INTERVAL", "60")),
+        help="seconds between per-worker memory reports",
+    )
+    parser.add_argument(
+        "--forwarded-allow-ips",
+        default=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        help="comma separated proxy ips trusted for X-Forwarded-For, "
+        "only the reverse proxy (never *, clients could spoof their ip)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging()
+    PreforkServer(
+        app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        max_rss_mb=args.max_rss_mb,
+        graceful_timeout=args.graceful_timeout,
+        report_interval=args.report_interval,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+    ).run()
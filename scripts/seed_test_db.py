@@ -0,0 +1,37 @@
+"""
+Create the schema of the configured database (DB_DIALECT, DB_<dialect>_URL,
+COMPACT_IDS) from the models and insert the user the tests log in with.
+
+Usage: python -m scripts.seed_test_db
+"""
+
+from sqlalchemy import insert
+
+from app.core.security import get_pwd_context
+from app.db import db
+from app.db.base import Base
+from app.db.models.user_mgmt import Platform_Users
+
+SUPERUSER = {
+    "id": 1,
+    "hash_id": "4f0fa05a8ff04892833fe56e7316ce30",
+    "username": "superuser",
+    "email": "super@user.com",
+}
+SUPERUSER_PASSWORD = "superpassword"
+
+
+def main() -> None:
+    Base.metadata.create_all(db.engine)  # type: ignore[attr-defined]
+    with db.engine.begin() as db_conn:
+        db_conn.execute(
+            insert(Platform_Users).values(
+                **SUPERUSER,
+                pass_hash=get_pwd_context().hash(SUPERUSER_PASSWORD),
+            )
+        )
+    db.dispose()
+
+
+if __name__ == "__main__":
+    main()
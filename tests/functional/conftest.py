@@ -3,11 +3,18 @@ Define fixture and other configuration options that are
 shared across multiple test files.
 """
 
+from collections import Counter
+from contextlib import contextmanager
+
 import pytest
 
 from fastapi.testclient import TestClient
 
 from app import app
+from app.db.monitor import QueryMonitor
+from app.helpers.rate_limit import get_rate_limiter
+from app.helpers.tracing import RequestContext
+from app.middleware import Middlewares
 
 
 @pytest.fixture(scope="module")
@@ -21,3 +28,48 @@ def login_jwt():
         return jwt_token
 
     yield _login_jwt
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limit():
+    get_rate_limiter().backend.reset()
+    yield
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Assert the requests of the enclosed block run at most `statements`
+    SQL statements (and `checkouts` pool checkouts when given), as counted
+    per request by the QueryMonitor of the application.
+
+        with query_budget(statements=2):
+            client.post(url="/v1/auth/logout", headers=headers)
+    """
+    metrics = Middlewares.METRICS
+    record_resp = metrics.record_resp
+
+    @contextmanager
+    def _query_budget(statements, checkouts=None):
+        counts = Counter()
+
+        def record(**kwargs):
+            # called by the middleware in the context of each request
+            counts["requests"] += 1
+            counts.update(RequestContext.counts())
+            record_resp(**kwargs)
+
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(metrics, "record_resp", record)
+            yield counts
+
+        ran = counts[QueryMonitor.STATEMENTS]
+        checked_out = counts[QueryMonitor.CHECKOUTS]
+        assert counts["requests"], "no request in the budget block"
+        assert ran <= statements, f"{ran} statements, budget {statements}"
+        if checkouts is not None:
+            assert (
+                checked_out <= checkouts
+            ), f"{checked_out} checkouts, budget {checkouts}"
+
+    yield _query_budget
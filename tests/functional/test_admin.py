@@ -0,0 +1,126 @@
+import json
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app import app
+from app.core.settings import Settings
+
+client = TestClient(app)
+
+
+def login(username, password):
+    response = client.post(
+        url="/v1/auth/login",
+        json={"username": username, "password": password},
+    )
+    return {
+        "Authorization": f"Bearer {response.json()['data']['access_token']}"
+    }
+
+
+class TestAdminRoutes:
+    @pytest.fixture
+    def member(self):
+        json_body = {
+            "username": "revoked member",
+            "email": "revoked@member.com",
+            "password": "memberpassword",
+        }
+        client.post(url="/v1/auth/register", json=json_body)
+        yield json_body["username"], json_body["password"]
+
+    @pytest.fixture
+    def admin(self, monkeypatch):
+        monkeypatch.setattr(Settings, "ADMIN_USERNAMES", {"superuser"})
+        headers = login("superuser", "superpassword")
+        yield headers
+        client.post(url="/v1/auth/logout", headers=headers)
+
+    def test_revoke_sessions(self, admin, member):
+        member_headers = login(*member)
+
+        response = client.post(
+            url="/v1/admin/sessions/revoke",
+            json={"usernames": [member[0], "unknown user"]},
+            headers=admin,
+        )
+        revoked = client.post(url="/v1/auth/logout", headers=member_headers)
+        relogin_headers = login(*member)
+        relogout = client.post(url="/v1/auth/logout", headers=relogin_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"] == {"users": 1, "sessions": 1}
+        assert revoked.status_code == status.HTTP_401_UNAUTHORIZED
+        assert revoked.json()["detail"] == "Session has been revoked"
+        assert relogout.status_code == status.HTTP_204_NO_CONTENT
+
+    def test_revoke_sessions_not_admin(self, member):
+        member_headers = login(*member)
+
+        response = client.post(
+            url="/v1/admin/sessions/revoke",
+            json={"usernames": [member[0]]},
+            headers=member_headers,
+        )
+        client.post(url="/v1/auth/logout", headers=member_headers)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert response.json()["detail"] == "Admin access required"
+
+    def test_list_sessions(self, admin, member):
+        member_headers = login(*member)
+
+        first = client.get(
+            url="/v1/admin/sessions",
+            params={"limit": 1, "total": "exact"},
+            headers=admin,
+        ).json()
+        second = client.get(
+            url="/v1/admin/sessions",
+            params={"limit": 1, "cursor": first["next_cursor"]},
+            headers=admin,
+        ).json()
+        invalid = client.get(
+            url="/v1/admin/sessions",
+            params={"cursor": "invalid"},
+            headers=admin,
+        )
+        client.post(url="/v1/auth/logout", headers=member_headers)
+
+        assert first["data"][0]["username"] == member[0]
+        assert first["current_page"] == 1
+        assert first["total_page"] == 2
+        assert second["data"][0]["username"] == "superuser"
+        assert second["current_page"] == 2
+        assert second["next_cursor"] is None
+        assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_users(self, admin, member):
+        response = client.get(url="/v1/admin/export/users", headers=admin)
+        users = [json.loads(line) for line in response.text.splitlines()]
+        resumed = client.get(
+            url="/v1/admin/export/users",
+            params={"after": users[0]["cursor"], "is_active": 1},
+            headers=admin,
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert users[0]["username"] == "superuser"
+        assert member[0] in [user["username"] for user in users]
+        assert all("pass_hash" not in user for user in users)
+        assert len(resumed.text.splitlines()) == len(users) - 1
+
+    def test_export_sessions_filtered(self, admin):
+        response = client.get(
+            url="/v1/admin/export/sessions",
+            params={"created_from": "2999-01-01T00:00:00"},
+            headers=admin,
+        )
+        unknown = client.get(url="/v1/admin/export/secrets", headers=admin)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.text == ""
+        assert unknown.status_code == status.HTTP_400_BAD_REQUEST
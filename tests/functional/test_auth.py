@@ -1,10 +1,20 @@
+from datetime import datetime, timedelta
+
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
 from sqlalchemy import text
 
 from app import app
+from app.core.settings import Settings
+from app.db import db as app_db
+from app.db.ids import USER_KEY
+from app.db.breaker import CircuitBreaker
 from app.db.sql import Database
+from app.helpers.profiling import sign_profile_header
+from app.middleware import Middlewares
+from app.middleware.admission import AdmissionMiddleware
+from app.v1.auth.const import AuthRule
 
 client = TestClient(app)
 db = Database()
@@ -122,10 +132,10 @@ class TestAuthRoutes:
 
         with db.engine.connect() as db_conn:
             query = text(
-                """
+                f"""
                 DELETE FROM sessions
                 WHERE sessions.platform_user_id = (
-                    SELECT p.hash_id
+                    SELECT p.{USER_KEY}
                     FROM platform_users AS p
                     WHERE p.username = :username
                 )
@@ -161,3 +171,287 @@ class TestAuthRoutes:
 
         response = client.post(url="/v1/auth/logout", headers=headers)
         assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    def test_server_timing_header(self, monkeypatch):
+        monkeypatch.setattr(Settings, "SERVER_TIMING", True)
+        json_body = {"username": "user", "password": "superpassword"}
+        response = client.post(url="/v1/auth/login", json=json_body)
+
+        server_timing = response.headers.get("Server-Timing", "")
+
+        assert "db.get_user_by_username;dur=" in server_timing
+        assert "total;dur=" in server_timing
+
+    def test_metrics_endpoint(self):
+        json_body = {"username": "user", "password": "superpassword"}
+        client.post(url="/v1/auth/login", json=json_body)
+        response = client.get(url="/metrics")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert (
+            'auth_outcomes_total{outcome="unauthorized_user"}' in response.text
+        )
+        assert 'route="/v1/auth/login"' in response.text
+
+    def test_login_rate_limited(self):
+        json_body = {"username": "bruteforced", "password": "password"}
+        for _ in range(AuthRule.ATTEMPTS_PER_USERNAME[0]):
+            client.post(url="/v1/auth/login", json=json_body)
+        response = client.post(url="/v1/auth/login", json=json_body)
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers.get("Retry-After", 0)) >= 1
+
+    def test_login_shed_when_overloaded(self, monkeypatch):
+        gate = Middlewares.ADMISSION.gates[AdmissionMiddleware.HEAVY]
+        monkeypatch.setattr(gate, "limit", 0)
+        monkeypatch.setattr(gate, "queue_size", 0)
+        json_body = {"username": "superuser", "password": "superpassword"}
+        response = client.post(url="/v1/auth/login", json=json_body)
+        health = client.get(url="/health/server")
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers.get("Retry-After") is not None
+        assert health.status_code == status.HTTP_200_OK
+
+    def test_fail_fast_when_database_unavailable(self, monkeypatch):
+        json_body = {"username": "superuser", "password": "superpassword"}
+        token = client.post(url="/v1/auth/login", json=json_body).json()[
+            "data"
+        ]["access_token"]
+        circuit = app_db.breaker
+        monkeypatch.setattr(circuit, "state", CircuitBreaker.OPEN)
+        monkeypatch.setattr(circuit, "_opened_at", circuit._opened_at + 1e9)
+        login = client.post(url="/v1/auth/login", json=json_body)
+        logout = client.post(
+            url="/v1/auth/logout",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        health = client.get(url="/health/db")
+
+        for response in (login, logout, health):
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert int(response.headers.get("Retry-After", 0)) >= 1
+        monkeypatch.undo()
+        client.post(
+            url="/v1/auth/logout",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    def test_request_deadline_exceeded(self):
+        json_body = {"username": "superuser", "password": "superpassword"}
+        response = client.post(
+            url="/v1/auth/login",
+            json=json_body,
+            headers={"X-Request-Timeout": "0.000001"},
+        )
+
+        assert response.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+        assert response.json()["detail"] == "Request took too long"
+
+    def test_profiled_request(self, monkeypatch, tmp_path):
+        profiler = Middlewares.PROFILING.profiler
+        monkeypatch.setattr(profiler, "secret", "secret")
+        monkeypatch.setattr(profiler, "directory", tmp_path)
+        json_body = {"username": "superuser", "password": "password"}
+        response = client.post(
+            url="/v1/auth/login",
+            json=json_body,
+            headers={"X-Profile": sign_profile_header("secret")},
+        )
+        profile_id = response.headers.get("X-Profile-Id")
+
+        assert profile_id
+        assert list(tmp_path.glob(f"*_{profile_id}.collapsed"))
+
+    def test_login_logout_query_budget(self, query_budget):
+        json_body = {"username": "superuser", "password": "superpassword"}
+        # user, occupied session check, insert session, refresh session
+        with query_budget(statements=4, checkouts=4):
+            response = client.post(url="/v1/auth/login", json=json_body)
+        token = response.json()["data"]["access_token"]
+
+        # middleware session check, deactivate session
+        with query_budget(statements=2, checkouts=2):
+            response = client.post(
+                url="/v1/auth/logout",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    def test_refresh_rotates_token(self):
+        json_body = {"username": "superuser", "password": "superpassword"}
+        login = client.post(url="/v1/auth/login", json=json_body).json()
+        refresh_token = login["data"]["refresh_token"]
+
+        response = client.post(
+            url="/v1/auth/refresh", json={"refresh_token": refresh_token}
+        )
+        data = response.json()["data"]
+        logout = client.post(
+            url="/v1/auth/logout",
+            headers={"Authorization": f"Bearer {data['access_token']}"},
+        )
+        after_logout = client.post(
+            url="/v1/auth/refresh",
+            json={"refresh_token": data["refresh_token"]},
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert data["refresh_token"] != refresh_token
+        assert logout.status_code == status.HTTP_204_NO_CONTENT
+        assert after_logout.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_refresh_reuse_revokes_session(self):
+        json_body = {"username": "superuser", "password": "superpassword"}
+        login = client.post(url="/v1/auth/login", json=json_body).json()
+        refresh_token = login["data"]["refresh_token"]
+        client.post(
+            url="/v1/auth/refresh", json={"refresh_token": refresh_token}
+        )
+
+        reused = client.post(
+            url="/v1/auth/refresh", json={"refresh_token": refresh_token}
+        )
+        revoked = client.post(
+            url="/v1/auth/logout",
+            headers={
+                "Authorization": f"Bearer {login['data']['access_token']}"
+            },
+        )
+
+        assert reused.status_code == status.HTTP_401_UNAUTHORIZED
+        assert reused.json()["detail"] == "Invalid refresh token"
+        assert revoked.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_refresh_guess_does_not_revoke_session(self):
+        json_body = {"username": "superuser", "password": "superpassword"}
+        login = client.post(url="/v1/auth/login", json=json_body).json()
+        refresh_token = login["data"]["refresh_token"]
+        session_id = refresh_token.partition(".")[0]
+
+        guessed = client.post(
+            url="/v1/auth/refresh",
+            json={"refresh_token": f"{session_id}.garbage"},
+        )
+        refreshed = client.post(
+            url="/v1/auth/refresh", json={"refresh_token": refresh_token}
+        )
+        access_token = refreshed.json()["data"]["access_token"]
+        client.post(
+            url="/v1/auth/logout",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+
+        assert guessed.status_code == status.HTTP_401_UNAUTHORIZED
+        assert refreshed.status_code == status.HTTP_200_OK
+
+    def test_idle_session_expires(self):
+        json_body = {"username": "superuser", "password": "superpassword"}
+        login = client.post(url="/v1/auth/login", json=json_body).json()
+        access_token = login["data"]["access_token"]
+        with db.engine.begin() as db_conn:
+            db_conn.execute(
+                text(
+                    f"""
+                    UPDATE sessions
+                    SET create_date = :long_ago, last_seen = NULL
+                    WHERE platform_user_id = (
+                        SELECT {USER_KEY} FROM platform_users
+                        WHERE username = :username
+                    ) AND is_active = 1
+                """
+                ),
+                {
+                    "username": "superuser",
+                    "long_ago": datetime.now() - timedelta(days=1),
+                },
+            )
+
+        expired = client.post(
+            url="/v1/auth/logout",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        relogin = client.post(url="/v1/auth/login", json=json_body)
+
+        assert expired.status_code == status.HTTP_401_UNAUTHORIZED
+        assert expired.json()["detail"] == "Session has expired"
+        assert relogin.status_code == status.HTTP_200_OK
+        client.post(
+            url="/v1/auth/logout",
+            headers={
+                "Authorization": (
+                    f"Bearer {relogin.json()['data']['access_token']}"
+                )
+            },
+        )
+
+    def test_username_available(self, query_budget):
+        url = "/v1/auth/username-available"
+        # first check builds the username filter
+        client.get(url=url, params={"username": "warm up"})
+
+        with query_budget(statements=0):
+            free = client.get(url=url, params={"username": "free name"})
+        taken = client.get(url=url, params={"username": "SuperUser"})
+        client.post(
+            url="/v1/auth/register",
+            json={
+                "username": "free name",
+                "email": "free@name.com",
+                "password": "freepassword",
+            },
+        )
+        registered = client.get(url=url, params={"username": "free name"})
+
+        assert free.status_code == status.HTTP_200_OK
+        assert free.json()["data"] == {
+            "username": "free name",
+            "available": True,
+        }
+        assert taken.json()["data"]["available"] is False
+        assert registered.json()["data"]["available"] is False
+
+    def test_refresh_rate_limited(self, monkeypatch):
+        monkeypatch.setattr(AuthRule, "REFRESHES_PER_IP", (2, 60))
+        json_body = {"refresh_token": "1.guessed"}
+        for _ in range(2):
+            client.post(url="/v1/auth/refresh", json=json_body)
+        response = client.post(url="/v1/auth/refresh", json=json_body)
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers.get("Retry-After", 0)) >= 1
+
+    def test_username_available_rate_limited(self, monkeypatch):
+        monkeypatch.setattr(AuthRule, "CHECKS_PER_IP", (2, 60))
+        url = "/v1/auth/username-available"
+        for _ in range(2):
+            client.get(url=url, params={"username": "enumerated"})
+        response = client.get(url=url, params={"username": "enumerated"})
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers.get("Retry-After", 0)) >= 1
+
+    def test_me_conditional(self, query_budget):
+        json_body = {"username": "superuser", "password": "superpassword"}
+        login = client.post(url="/v1/auth/login", json=json_body).json()
+        headers = {"Authorization": f"Bearer {login['data']['access_token']}"}
+
+        # only the session check of the middleware reads the db
+        with query_budget(statements=1):
+            me = client.get(url="/v1/auth/me", headers=headers)
+        etag = me.headers["ETag"]
+        not_modified = client.get(
+            url="/v1/auth/me", headers={**headers, "If-None-Match": etag}
+        )
+        anonymous = client.get(url="/v1/auth/me")
+        client.post(url="/v1/auth/logout", headers=headers)
+
+        assert me.status_code == status.HTTP_200_OK
+        assert me.json()["data"]["username"] == "superuser"
+        assert me.json()["data"]["session_id"]
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not_modified.content == b""
+        assert not_modified.headers["ETag"] == etag
+        assert anonymous.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,44 @@
+"""
+Minimal ASGI app answering its worker pid, served by PreforkServer in a
+subprocess: python -m tests.unit.core.prefork_app <port> <workers>
+<max requests>
+"""
+
+import asyncio
+import os
+import sys
+
+from app.core.server import PreforkServer, setup_logging
+
+SLOW_SECONDS = 1.0
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            await send({"type": message["type"] + ".complete"})
+            if message["type"] == "lifespan.shutdown":
+                return
+
+    if scope["path"] == "/slow":
+        await asyncio.sleep(SLOW_SECONDS)
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/plain")],
+    })
+    await send({"type": "http.response.body", "body": b"%d" % os.getpid()})
+
+
+if __name__ == "__main__":
+    port, workers, max_requests = map(int, sys.argv[1:4])
+    setup_logging()
+    PreforkServer(
+        app,
+        host="127.0.0.1",
+        port=port,
+        workers=workers,
+        max_requests=max_requests,
+        graceful_timeout=5,
+    ).run()
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app import app
+from app.core.server import PreforkServer
+from app.helpers.rate_limit import RateLimitBackend, get_rate_limiter
+
+NGINX_IP = "172.28.0.10"
+
+
+class RecordingBackend(RateLimitBackend):
+    """Reject every attempt, so no request reaches the db."""
+
+    def __init__(self) -> None:
+        self.keys = []
+
+    def take(self, key, capacity, rate):
+        self.keys.append(key)
+        return 1.0
+
+    def reset(self):
+        self.keys.clear()
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = RecordingBackend()
+    monkeypatch.setattr(get_rate_limiter(), "backend", backend)
+    yield backend
+
+
+def login_from(peer, forwarded_for):
+    config = PreforkServer(
+        app, "127.0.0.1", 0, workers=1, forwarded_allow_ips=NGINX_IP
+    ).worker_config()
+    config.load()
+    transport = httpx.ASGITransport(
+        app=config.loaded_app, client=(peer, 40000)
+    )
+
+    async def post():
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.post(
+                "/v1/auth/login",
+                json={"username": "spoofer", "password": "password"},
+                headers={"X-Forwarded-For": forwarded_for},
+            )
+
+    return asyncio.run(post())
+
+
+class TestWorkerConfig:
+    def test_client_ip_forwarded_by_nginx(self, backend):
+        response = login_from(NGINX_IP, "198.51.100.1")
+
+        assert response.status_code == 429
+        assert backend.keys[0] == "auth:ip:198.51.100.1"
+
+    def test_spoofed_forwarded_for_keeps_limiter_key(self, backend):
+        # sent straight to a worker, the header is not trusted
+        login_from("203.0.113.7", "198.51.100.1")
+        # appended to by a proxy, only the address it saw is trusted
+        login_from(NGINX_IP, "198.51.100.99, 203.0.113.7")
+
+        assert backend.keys[0] == "auth:ip:203.0.113.7"
+        assert backend.keys[1] == "auth:ip:203.0.113.7"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(check, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = check()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise AssertionError("condition not met in time")
+
+
+def replaced(master, workers, gone):
+    """Current workers once there are `workers` of them, none of `gone`."""
+    pids = children(master.pid)
+    if len(pids) == workers and not pids & gone:
+        return pids
+    return None
+
+
+def children(pid):
+    path = Path(f"/proc/{pid}/task/{pid}/children")
+    return {int(child) for child in path.read_text().split()}
+
+
+@pytest.mark.skipif(
+    not Path(f"/proc/{os.getpid()}/task/{os.getpid()}/children").exists(),
+    reason="needs fork and /proc children",
+)
+class TestPreforkServer:
+    @pytest.fixture
+    def start(self):
+        started = []
+
+        def _start(workers, max_requests=0):
+            port = free_port()
+            master = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "tests.unit.core.prefork_app",
+                    str(port),
+                    str(workers),
+                    str(max_requests),
+                ],
+                cwd=Path(__file__).parents[3],
+                stderr=subprocess.DEVNULL,
+            )
+            started.append(master)
+            server = (master, f"http://127.0.0.1:{port}")
+            wait_until(lambda: len(children(master.pid)) == workers)
+            wait_until(lambda: get(server))
+            return server
+
+        yield _start
+        for master in started:
+            pids = children(master.pid) if master.poll() is None else set()
+            for pid in pids | {master.pid}:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            master.wait()
+
+    def test_respawns_exited_worker(self, start):
+        master, _ = server = start(workers=2)
+        killed = get(server)
+        os.kill(killed, signal.SIGKILL)
+
+        workers = wait_until(lambda: replaced(master, 2, {killed}))
+        assert get(server) in workers
+
+    def test_recycles_after_max_requests(self, start):
+        server = start(workers=1, max_requests=2)
+        served = []
+        for _ in range(6):
+            served.append(wait_until(lambda: get(server)))
+            time.sleep(0.2)  # the limit is checked on every 0.1s tick
+
+        assert len(set(served)) >= 2
+
+    def test_sighup_replaces_every_worker(self, start):
+        master, _ = server = start(workers=2)
+        before = children(master.pid)
+        master.send_signal(signal.SIGHUP)
+
+        after = wait_until(lambda: replaced(master, 2, before))
+        assert get(server) in after
+
+    def test_graceful_shutdown_drains_requests(self, start):
+        master, _ = server = start(workers=1)
+        worker = get(server)
+        slow = {}
+        request = threading.Thread(
+            target=lambda: slow.update(pid=get(server, "/slow"))
+        )
+        request.start()
+        time.sleep(0.3)  # in flight
+        master.send_signal(signal.SIGTERM)
+        request.join(timeout=10)
+
+        assert slow["pid"] == worker
+        assert master.wait(timeout=10) == 0
+        with pytest.raises(ProcessLookupError):
+            os.kill(worker, 0)
+
+
+def get(server, path="/"):
+    """pid of the worker answering, None while nothing answers."""
+    _, url = server
+    try:
+        with urllib.request.urlopen(url + path, timeout=5) as response:
+            return int(response.read())
+    except OSError:
+        return None
@@ -0,0 +1,175 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.pool import NullPool
+
+from app.db import breaker
+from app.db.breaker import CircuitBreaker
+from app.helpers.exceptions import DatabaseUnavailable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker.time, "monotonic", clock)
+    yield clock
+
+
+@pytest.fixture
+def circuit(clock):
+    yield CircuitBreaker(
+        failure_rate=0.5, min_calls=4, window=10, open_seconds=5, probes=2
+    )
+
+
+def fail(circuit, calls):
+    for _ in range(calls):
+        circuit.allow()
+        circuit.record_failure()
+
+
+class TestCircuitBreaker:
+    def test_opens_on_failure_rate(self, circuit):
+        circuit.record_success()
+        fail(circuit, 3)
+        assert circuit.state == CircuitBreaker.CLOSED
+
+        fail(circuit, 1)
+        assert circuit.state == CircuitBreaker.OPEN
+        with pytest.raises(DatabaseUnavailable) as exc:
+            circuit.allow()
+        assert exc.value.retry_after == 5
+
+    def test_successes_keep_it_closed(self, circuit):
+        fail(circuit, 1)
+        for _ in range(10):
+            circuit.allow()
+            circuit.record_success()
+        fail(circuit, 3)
+
+        assert circuit.state == CircuitBreaker.CLOSED
+
+    def test_old_failures_leave_window(self, circuit, clock):
+        fail(circuit, 3)
+        clock.now += 10
+        fail(circuit, 1)
+
+        assert circuit.state == CircuitBreaker.CLOSED
+
+    def test_half_open_probes_close_it(self, circuit, clock):
+        fail(circuit, 4)
+        clock.now += 5
+        circuit.allow()
+        circuit.allow()
+        assert circuit.state == CircuitBreaker.HALF_OPEN
+        # every trial call is in flight
+        with pytest.raises(DatabaseUnavailable):
+            circuit.allow()
+
+        circuit.record_success()
+        circuit.record_success()
+        assert circuit.state == CircuitBreaker.CLOSED
+        circuit.allow()
+
+    def test_half_open_failure_reopens_it(self, circuit, clock):
+        fail(circuit, 4)
+        clock.now += 5
+        circuit.allow()
+        circuit.record_failure()
+
+        assert circuit.state == CircuitBreaker.OPEN
+        with pytest.raises(DatabaseUnavailable):
+            circuit.allow()
+
+    def test_disabled(self, clock):
+        circuit = CircuitBreaker(
+            failure_rate=0, min_calls=1, window=10, open_seconds=5, probes=1
+        )
+        fail(circuit, 10)
+
+        assert circuit.state == CircuitBreaker.CLOSED
+
+
+class TestEngineHooks:
+    def test_unreachable_database_fails_fast(self, circuit, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path}/missing/db.sqlite")
+        circuit.attach(engine)
+        for _ in range(4):
+            with pytest.raises(OperationalError):
+                engine.connect()
+
+        # rejected before the DBAPI connect is even tried
+        with pytest.raises(DatabaseUnavailable):
+            engine.connect()
+        engine.dispose()
+
+    def test_statement_errors_do_not_count(self, circuit):
+        engine = create_engine("sqlite://")
+        circuit.attach(engine)
+        with engine.connect() as conn:
+            conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+            for _ in range(4):
+                with pytest.raises(IntegrityError):
+                    conn.execute(text("INSERT INTO t VALUES (1)"))
+
+        assert circuit.state == CircuitBreaker.CLOSED
+        engine.dispose()
+
+    def test_open_rejects_statements(self, circuit):
+        engine = create_engine("sqlite://")
+        circuit.attach(engine)
+        with engine.connect() as conn:
+            fail(circuit, 4)
+            with pytest.raises(DatabaseUnavailable):
+                conn.execute(text("SELECT 1"))
+        engine.dispose()
+
+    def test_locked_database_does_not_count(self, circuit, tmp_path):
+        path = f"{tmp_path}/db.sqlite"
+        engine = create_engine(
+            f"sqlite:///{path}", connect_args={"timeout": 0}
+        )
+        circuit.attach(engine)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE t (id INTEGER)"))
+        locker = sqlite3.connect(path)
+        locker.execute("BEGIN IMMEDIATE")
+        try:
+            with engine.connect() as conn:
+                for _ in range(4):
+                    with pytest.raises(OperationalError, match="locked"):
+                        conn.execute(text("INSERT INTO t VALUES (1)"))
+        finally:
+            locker.close()
+
+        assert circuit.state == CircuitBreaker.CLOSED
+        engine.dispose()
+
+    def test_half_open_call_is_one_trial(self, circuit, clock, tmp_path):
+        # every call opens a new connection: connect and statement
+        engine = create_engine(
+            f"sqlite:///{tmp_path}/db.sqlite", poolclass=NullPool
+        )
+        circuit.attach(engine)
+        fail(circuit, 4)
+        clock.now += 5
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+        # one success out of the two probes, the other trial still free
+        assert circuit.state == CircuitBreaker.HALF_OPEN
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert circuit.state == CircuitBreaker.CLOSED
+        engine.dispose()
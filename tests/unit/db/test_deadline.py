@@ -0,0 +1,83 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db.breaker import CircuitBreaker
+from app.db.deadline import StatementDeadline
+from app.helpers.exceptions import DeadlineExceeded
+from app.helpers.tracing import RequestContext
+
+ENDLESS = """
+    WITH RECURSIVE counter(x) AS (
+        SELECT 1 UNION ALL SELECT x + 1 FROM counter
+    )
+    SELECT COUNT(*) FROM counter
+"""
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    StatementDeadline().attach(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def clear_deadline():
+    yield
+    RequestContext.clear_deadline()
+
+
+class TestStatementDeadline:
+    def test_statement_interrupted_at_deadline(self, engine, clear_deadline):
+        RequestContext.set_deadline(0.1)
+        start = time.monotonic()
+        with engine.connect() as conn:
+            with pytest.raises(DeadlineExceeded):
+                conn.execute(text(ENDLESS))
+
+        assert time.monotonic() - start < 1
+
+    def test_statement_after_deadline_not_run(self, engine, clear_deadline):
+        RequestContext.set_deadline(0)
+        with engine.connect() as conn:
+            with pytest.raises(DeadlineExceeded):
+                conn.execute(text("SELECT 1"))
+
+    def test_no_deadline_outside_request(self, engine, clear_deadline):
+        RequestContext.set_deadline(0)
+        RequestContext.clear_deadline()
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    def test_not_a_breaker_failure(self, engine, clear_deadline):
+        circuit = CircuitBreaker(
+            failure_rate=0.5, min_calls=1, window=10, open_seconds=5, probes=1
+        )
+        circuit.attach(engine)
+        RequestContext.set_deadline(0.05)
+        with engine.connect() as conn:
+            with pytest.raises(DeadlineExceeded):
+                conn.execute(text(ENDLESS))
+
+        assert circuit.state == CircuitBreaker.CLOSED
+
+    def test_postgresql_statement_timeout(self, clear_deadline):
+        executed = []
+
+        class Cursor:
+            def execute(self, statement):
+                executed.append(statement)
+
+            def close(self):
+                pass
+
+        conn = SimpleNamespace(connection=SimpleNamespace(cursor=Cursor))
+        StatementDeadline()._on_begin(conn)
+        RequestContext.set_deadline(2)
+        StatementDeadline()._on_begin(conn)
+
+        assert executed == ["SET LOCAL statement_timeout = 2000"]
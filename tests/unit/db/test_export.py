@@ -0,0 +1,87 @@
+import json
+
+import pytest
+from sqlalchemy import bindparam, text
+
+from app.db import db
+from app.db.ids import ID_TYPE, USER_KEY, USER_REF
+from app.db.export import TableExporter
+from app.helpers.exceptions import BadClientReqeust
+from app.v1.session import SessionRepository
+
+USER_ID = "4f0fa05a8ff04892833fe56e7316ce30"
+
+
+def delete_sessions():
+    with db.engine.begin() as db_conn:
+        db_conn.execute(
+            text(
+                f"DELETE FROM sessions WHERE platform_user_id = {USER_REF}"
+            ).bindparams(bindparam("user_id", type_=ID_TYPE)),
+            {"user_id": USER_ID},
+        )
+
+
+def read_lines(chunks):
+    return [
+        json.loads(line) for chunk in chunks for line in chunk.splitlines()
+    ]
+
+
+class TestTableExporter:
+    @pytest.fixture
+    def session_ids(self):
+        delete_sessions()
+        repo = SessionRepository(db)
+        session_ids = [
+            str(repo.create_new_session(USER_ID).id) for _ in range(5)
+        ]
+        repo.set_as_inactive(session_ids[0])
+        yield session_ids
+        delete_sessions()
+
+    @pytest.fixture
+    def exporter(self):
+        yield TableExporter(
+            db,
+            # only the sessions of this test, USER_ID is the superuser
+            select=f"""
+                SELECT s.id, s.create_date, s.is_active
+                FROM (
+                    SELECT * FROM sessions WHERE platform_user_id = (
+                        SELECT p.{USER_KEY} FROM platform_users AS p
+                        WHERE p.username = 'superuser'
+                    )
+                ) AS s
+            """,
+            keys=("s.create_date", "s.id"),
+            date_column="s.create_date",
+            active_column="s.is_active",
+            types={"id": ID_TYPE},
+        )
+
+    def test_stream_in_batches(self, exporter, session_ids):
+        chunks = list(exporter.stream(batch_size=2))
+        rows = read_lines(chunks)
+
+        assert len(chunks) == 3
+        assert [row["id"] for row in rows] == session_ids
+
+    def test_filters(self, exporter, session_ids):
+        active = read_lines(exporter.stream(is_active=1))
+        created = read_lines(
+            exporter.stream(created_from=active[0]["create_date"])
+        )
+
+        assert [row["id"] for row in active] == session_ids[1:]
+        assert [row["id"] for row in created] == session_ids[1:]
+
+    def test_resume(self, exporter, session_ids):
+        first = read_lines(exporter.stream())[1]
+        rest = read_lines(exporter.stream(after=first["cursor"]))
+
+        assert [row["id"] for row in rest] == session_ids[2:]
+
+    def test_invalid_cursor(self, exporter):
+        with pytest.raises(BadClientReqeust):
+            exporter.stream(after="invalid")
@@ -0,0 +1,63 @@
+import uuid
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.db.ids import CompactId
+
+HEX_ID = "4f0fa05a8ff04892833fe56e7316ce30"
+
+
+class TestCompactId:
+    @pytest.fixture
+    def table(self):
+        engine = sa.create_engine("sqlite://")
+        table = sa.Table(
+            "items",
+            sa.MetaData(),
+            sa.Column("id", CompactId(), primary_key=True),
+        )
+        table.metadata.create_all(engine)
+        with engine.begin() as db_conn:
+            db_conn.execute(table.insert(), {"id": HEX_ID})
+        yield engine, table
+        engine.dispose()
+
+    def test_stored_as_16_bytes(self, table):
+        engine, table = table
+        with engine.connect() as db_conn:
+            stored = db_conn.execute(
+                sa.text("SELECT id, LENGTH(id) AS size FROM items")
+            ).one()
+            loaded = db_conn.execute(sa.select(table.c.id)).scalar()
+
+        assert stored.size == 16
+        assert stored.id == bytes.fromhex(HEX_ID)
+        assert loaded == HEX_ID
+
+    def test_textual_bind(self, table):
+        engine, _ = table
+        query = (
+            sa.text("SELECT id FROM items WHERE id = :id")
+            .bindparams(sa.bindparam("id", type_=CompactId()))
+            .columns(id=CompactId())
+        )
+        with engine.connect() as db_conn:
+            found = db_conn.execute(query, {"id": HEX_ID}).scalar()
+            # not a hex id: matches nothing instead of failing
+            missing = db_conn.execute(query, {"id": "not-an-id"}).scalar()
+
+        assert found == HEX_ID
+        assert missing is None
+
+    def test_postgresql_uuid(self):
+        compact = CompactId()
+        dialect = postgresql.dialect()
+
+        assert isinstance(compact.load_dialect_impl(dialect), postgresql.UUID)
+        assert compact.process_bind_param(HEX_ID, dialect) == uuid.UUID(HEX_ID)
+        assert (
+            compact.process_result_value(uuid.UUID(HEX_ID), dialect) == HEX_ID
+        )
+        assert compact.process_bind_param(None, sqlite.dialect()) is None
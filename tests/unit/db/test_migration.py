@@ -0,0 +1,281 @@
+import io
+
+import pytest
+import sqlalchemy as sa
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy.exc import OperationalError
+
+from app.db import migration as migration_module
+from app.db.migration import (
+    LOCK_NOT_AVAILABLE,
+    OnlineMigration,
+    estimate_rows,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    with engine.begin() as db_conn:
+        db_conn.execute(
+            sa.text(
+                "CREATE TABLE items (id VARCHAR(8) PRIMARY KEY, "
+                "size INTEGER NOT NULL, label VARCHAR(16))"
+            )
+        )
+        db_conn.execute(
+            sa.text("INSERT INTO items (id, size) VALUES (:id, :size)"),
+            [{"id": f"i{i:03d}", "size": i} for i in range(25)],
+        )
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def conn(engine):
+    with engine.connect() as db_conn:
+        yield db_conn
+
+
+@pytest.fixture
+def context(conn):
+    # steps run within the transaction of their migration, as with
+    # transaction_per_migration in alembic/env.py
+    context = MigrationContext.configure(conn)
+    with context.begin_transaction(_per_migration=True):
+        yield context
+
+
+def online(context, dry_run=False):
+    return OnlineMigration(Operations(context), dry_run=dry_run)
+
+
+class LockNotAvailable(Exception):
+    pgcode = LOCK_NOT_AVAILABLE
+
+
+class PostgresScript(io.StringIO):
+    """
+    Output of offline (--sql) PostgreSQL rendering, standing for the
+    server: the first `refusals` statements containing `locked` fail as
+    if their table lock was not granted in time.
+    """
+
+    def __init__(self, locked="", refusals=0):
+        super().__init__()
+        self.locked = locked
+        self.refusals = refusals
+
+    def write(self, sql):
+        if self.locked and self.locked in sql and self.refusals:
+            self.refusals -= 1
+            raise OperationalError(sql, {}, LockNotAvailable())
+        return super().write(sql)
+
+    def statements(self):
+        return [
+            " ".join(statement.split())
+            for statement in self.getvalue().split(";")
+            if statement.strip()
+        ]
+
+
+def postgres(script):
+    context = MigrationContext.configure(
+        dialect_name="postgresql",
+        opts={"as_sql": True, "output_buffer": script},
+    )
+    return OnlineMigration(Operations(context), dry_run=False)
+
+
+@pytest.fixture
+def pauses(monkeypatch):
+    pauses = []
+    monkeypatch.setattr(migration_module.time, "sleep", pauses.append)
+    yield pauses
+
+
+def labels(engine):
+    with engine.connect() as db_conn:
+        rows = db_conn.execute(sa.text("SELECT id, label FROM items"))
+        return dict(rows.all())
+
+
+def columns(engine):
+    return {
+        column["name"]: column
+        for column in sa.inspect(engine).get_columns("items")
+    }
+
+
+class TestEstimateRows:
+    def test_count(self, conn):
+        assert estimate_rows(conn, "items") == 25
+        assert estimate_rows(conn, "items", "size < :size", {"size": 5}) == 5
+
+
+class TestBackfill:
+    def test_batches(self, engine, context):
+        progress = []
+        updated = online(context).backfill(
+            "items",
+            "label = 'size ' || size",
+            "label IS NULL",
+            batch_size=10,
+            pause=0,
+            progress=lambda done, total: progress.append((done, total)),
+        )
+
+        assert updated == 25
+        assert progress == [(10, 25), (20, 25), (25, 25)]
+        assert labels(engine)["i024"] == "size 24"
+
+    def test_batch_committed(self, engine, context):
+        committed = []
+        online(context).backfill(
+            "items",
+            "label = 'x'",
+            batch_size=10,
+            pause=0,
+            # read from another connection while the backfill runs
+            progress=lambda done, total: committed.append(
+                sum(label == "x" for label in labels(engine).values())
+            ),
+        )
+
+        assert committed == [10, 20, 25]
+
+    def test_filtered_rows_only(self, engine, context):
+        with engine.begin() as db_conn:
+            db_conn.execute(
+                sa.text("UPDATE items SET label = 'kept' WHERE size < 5")
+            )
+
+        updated = online(context).backfill(
+            "items", "label = 'new'", "label IS NULL", batch_size=7, pause=0
+        )
+
+        assert updated == 20
+        assert list(labels(engine).values()).count("kept") == 5
+
+    def test_dry_run(self, engine, context):
+        updated = online(context, dry_run=True).backfill(
+            "items", "label = 'x'"
+        )
+
+        assert updated == 0
+        assert set(labels(engine).values()) == {None}
+
+
+class TestColumns:
+    def test_expand_contract(self, engine, context):
+        migration = online(context)
+        migration.add_column("items", sa.Column("weight", sa.Integer()))
+        migration.backfill("items", "weight = size * 2", pause=0)
+        migration.set_not_null("items", "weight")
+        migration.drop_column("items", "label")
+
+        found = columns(engine)
+        assert found["weight"]["nullable"] is False
+        assert "label" not in found
+        with engine.connect() as db_conn:
+            assert db_conn.execute(
+                sa.text("SELECT SUM(weight) FROM items")
+            ).scalar() == sum(i * 2 for i in range(25))
+
+    def test_not_null_needs_backfill(self, context):
+        with pytest.raises(ValueError):
+            online(context).add_column(
+                "items", sa.Column("weight", sa.Integer(), nullable=False)
+            )
+
+    def test_dry_run(self, engine, context):
+        migration = online(context, dry_run=True)
+        migration.add_column("items", sa.Column("weight", sa.Integer()))
+        migration.drop_column("items", "label")
+
+        assert set(columns(engine)) == {"id", "size", "label"}
+
+
+class TestIndex:
+    def test_create_drop(self, engine, context):
+        migration = online(context)
+        migration.create_index("ix_items_size", "items", ["size"])
+        # rerun safe
+        migration.create_index("ix_items_size", "items", ["size"])
+
+        indexes = sa.inspect(engine).get_indexes("items")
+        assert [index["name"] for index in indexes] == ["ix_items_size"]
+
+        migration.drop_index("ix_items_size", "items")
+        assert sa.inspect(engine).get_indexes("items") == []
+
+
+class TestPostgresRendering:
+    def test_create_index_concurrently(self):
+        script = PostgresScript()
+        postgres(script).create_index(
+            "ix_items_size", "items", ["size"], where="size > 0"
+        )
+
+        # CONCURRENTLY cannot run in the migration transaction
+        assert script.statements() == [
+            "COMMIT",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_size"
+            " ON items (size) WHERE size > 0",
+            "BEGIN",
+        ]
+
+    def test_invalid_index_rebuilt(self, monkeypatch):
+        script = PostgresScript()
+        migration = postgres(script)
+        # left INVALID by a killed concurrent build
+        monkeypatch.setattr(migration, "_index_valid", lambda name: False)
+        migration.create_index("ix_items_size", "items", ["size"])
+
+        assert script.statements()[1:3] == [
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_items_size",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_items_size"
+            " ON items (size)",
+        ]
+
+    def test_lock_timeout_retried(self, pauses):
+        script = PostgresScript(locked="CREATE INDEX", refusals=2)
+        postgres(script).create_index("ix_items_size", "items", ["size"])
+
+        created = [s for s in script.statements() if "CREATE INDEX" in s]
+        assert len(created) == 1
+        assert pauses == [
+            OnlineMigration.LOCK_RETRY_PAUSE,
+            2 * OnlineMigration.LOCK_RETRY_PAUSE,
+        ]
+
+    def test_failed_build_dropped(self, pauses):
+        script = PostgresScript(
+            locked="CREATE INDEX", refusals=OnlineMigration.LOCK_RETRIES
+        )
+        with pytest.raises(OperationalError):
+            postgres(script).create_index("ix_items_size", "items", ["size"])
+
+        assert len(pauses) == OnlineMigration.LOCK_RETRIES - 1
+        assert script.statements()[-2:] == [
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_items_size",
+            "BEGIN",
+        ]
+
+    def test_set_not_null_validates_check_first(self):
+        script = PostgresScript()
+        postgres(script).set_not_null("items", "label")
+
+        check = "ck_items_label_not_null"
+        assert script.statements() == [
+            "COMMIT",
+            f"ALTER TABLE items DROP CONSTRAINT IF EXISTS {check}",
+            f"ALTER TABLE items ADD CONSTRAINT {check}"
+            " CHECK (label IS NOT NULL) NOT VALID",
+            f"ALTER TABLE items VALIDATE CONSTRAINT {check}",
+            "ALTER TABLE items ALTER COLUMN label SET NOT NULL",
+            f"ALTER TABLE items DROP CONSTRAINT {check}",
+            "BEGIN",
+        ]
@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db import monitor
+from app.db.monitor import (
+    QueryMonitor,
+    full_scan_tables,
+    parameter_shape,
+    statement_operation,
+)
+from app.helpers.logger import logger
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER, name TEXT)"))
+        conn.execute(text("CREATE INDEX ix_users_id ON users (id)"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def errors(monkeypatch):
+    messages = []
+    monkeypatch.setattr(
+        logger, "error", lambda msg, key=None: messages.append(msg)
+    )
+    yield messages
+
+
+class TestQueryMonitor:
+    def test_slow_query_logged_with_full_scan(self, engine, errors):
+        QueryMonitor(threshold=0.0).attach(engine)
+        with engine.connect() as conn:
+            conn.execute(
+                text("SELECT * FROM users WHERE name = :name"), {"name": "x"}
+            )
+
+        assert len(errors) == 1
+        assert "FULL SCAN of users" in errors[0]
+        assert "params=(str)" in errors[0]
+        assert "'x'" not in errors[0]
+
+    def test_indexed_query_is_not_full_scan(self, engine, errors):
+        QueryMonitor(threshold=0.0).attach(engine)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT * FROM users WHERE id = :id"), {"id": 1})
+
+        assert "FULL SCAN" not in errors[0]
+        assert "ix_users_id" in errors[0]
+
+    def test_plan_cached(self, engine, errors, monkeypatch):
+        explained = []
+        monkeypatch.setattr(
+            monitor, "_plan_line", lambda row: explained.append(row) or "x"
+        )
+        QueryMonitor(threshold=0.0).attach(engine)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT * FROM users"))
+            conn.execute(text("SELECT * FROM users"))
+
+        assert len(errors) == 2
+        assert len(explained) == 1
+
+    def test_fast_query_not_logged(self, engine, errors):
+        QueryMonitor(threshold=10.0).attach(engine)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT * FROM users"))
+
+        assert errors == []
+
+    def test_failed_explain_rolled_back_to_savepoint(self, errors):
+        executed = []
+
+        class Cursor:
+            def execute(self, statement, parameters=None):
+                executed.append(statement)
+                if statement.startswith("EXPLAIN"):
+                    raise RuntimeError("explain failed")
+
+            def close(self):
+                pass
+
+        conn = SimpleNamespace(
+            dialect=SimpleNamespace(name="postgresql"),
+            in_transaction=lambda: True,
+            connection=SimpleNamespace(cursor=Cursor),
+        )
+        plan = QueryMonitor(threshold=0.0).plan(conn, "SELECT 1", {})
+
+        assert plan == []
+        assert executed == [
+            "SAVEPOINT query_monitor_explain",
+            "EXPLAIN SELECT 1",
+            "ROLLBACK TO SAVEPOINT query_monitor_explain",
+            "RELEASE SAVEPOINT query_monitor_explain",
+        ]
+        assert "explain failed" in errors[0]
+
+
+def test_helpers():
+    assert statement_operation("\n  SELECT 1") == "select"
+    assert statement_operation("PRAGMA x") == "other"
+    assert full_scan_tables(["Seq Scan on sessions s  (cost=0..1)"]) == [
+        "sessions"
+    ]
+    assert full_scan_tables(["SCAN users USING INDEX ix"]) == []
+    assert parameter_shape([{"a": 1}, {"a": 2}], executemany=True) == (
+        "2x{a: int}"
+    )
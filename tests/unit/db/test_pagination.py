@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import bindparam, text
+
+from app.db import db
+from app.db.ids import ID_TYPE, USER_KEY, USER_REF
+from app.db.pagination import (
+    KeysetPaginator,
+    TotalMode,
+    decode_cursor,
+    encode_cursor,
+)
+from app.helpers.exceptions import BadClientReqeust
+from app.v1.session import SessionRepository
+
+USER_ID = "4f0fa05a8ff04892833fe56e7316ce30"
+
+
+def delete_sessions():
+    with db.engine.begin() as db_conn:
+        db_conn.execute(
+            text(
+                f"DELETE FROM sessions WHERE platform_user_id = {USER_REF}"
+            ).bindparams(bindparam("user_id", type_=ID_TYPE)),
+            {"user_id": USER_ID},
+        )
+
+
+class TestKeysetPaginator:
+    @pytest.fixture
+    def session_ids(self):
+        delete_sessions()
+        repo = SessionRepository(db)
+        session_ids = [
+            str(repo.create_new_session(USER_ID).id) for _ in range(7)
+        ]
+        yield session_ids
+        delete_sessions()
+
+    @pytest.fixture
+    def paginator(self):
+        yield KeysetPaginator(
+            db,
+            select="SELECT s.id, s.create_date FROM sessions AS s",
+            table="sessions",
+            keys=("s.create_date", "s.id"),
+            # only the sessions of this test, USER_ID is the superuser
+            where=f"""s.platform_user_id = (
+                SELECT p.{USER_KEY} FROM platform_users AS p
+                WHERE p.username = :username
+            )""",
+            types={"id": ID_TYPE},
+        )
+
+    def test_pages(self, paginator, session_ids):
+        params = {"username": "superuser"}
+        pages = [paginator.page(3, params=params)]
+        while pages[-1].next_cursor:
+            pages.append(
+                paginator.page(3, pages[-1].next_cursor, params=params)
+            )
+
+        assert [len(page.rows) for page in pages] == [3, 3, 1]
+        assert [page.current_page for page in pages] == [1, 2, 3]
+        seen = [row["id"] for page in pages for row in page.rows]
+        assert seen == list(reversed(session_ids))
+
+    def test_total(self, paginator, session_ids):
+        params = {"username": "superuser"}
+        exact = paginator.page(3, total=TotalMode.EXACT, params=params)
+        estimate = paginator.page(3, total=TotalMode.ESTIMATE, params=params)
+        none = paginator.page(3, params=params)
+
+        assert exact.total_page == 3
+        assert estimate.total_page >= 3
+        assert none.total_page is None
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor(2, ["2024-01-01 00:00:00.000000", "abc"])
+
+        assert decode_cursor(cursor, 2) == (
+            2,
+            ["2024-01-01 00:00:00.000000", "abc"],
+        )
+
+    @pytest.mark.parametrize(
+        "cursor",
+        ["not a cursor", encode_cursor(1, ["a", "b"]), encode_cursor(2, [])],
+    )
+    def test_invalid_cursor(self, cursor):
+        with pytest.raises(BadClientReqeust):
+            decode_cursor(cursor, 2)
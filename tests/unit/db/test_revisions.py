@@ -0,0 +1,156 @@
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from alembic.config import Config
+from alembic.runtime.environment import EnvironmentContext
+from alembic.script import ScriptDirectory
+
+from app.core.settings import Settings
+from app.db.migration import IrreversibleMigration
+
+ALEMBIC_DIR = Path(__file__).parents[3] / "alembic"
+USER_ID = "4f0fa05a8ff04892833fe56e7316ce30"
+SESSION_ID = "9c3e1b7d2a6f4e0b8d5c7a1f3e9b2d4c"
+
+
+def _base_columns():
+    return [
+        sa.Column("is_active", sa.SmallInteger, server_default="1"),
+        sa.Column("create_date", sa.DateTime, server_default=sa.func.now()),
+        sa.Column("update_date", sa.DateTime, server_default=sa.func.now()),
+    ]
+
+
+@pytest.fixture
+def script():
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    yield config, ScriptDirectory.from_config(config)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Schema the first revision starts from."""
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'revisions.db'}")
+    metadata = sa.MetaData()
+    sa.Table(
+        "platform_users",
+        metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("hash_id", sa.String(256), unique=True),
+        sa.Column("username", sa.String(128), unique=True),
+        sa.Column("email", sa.String(128), unique=True),
+        sa.Column("pass_hash", sa.String(128)),
+        *_base_columns(),
+    )
+    sa.Table(
+        "sessions",
+        metadata,
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column(
+            "platform_user_id",
+            sa.String(256),
+            sa.ForeignKey("platform_users.hash_id"),
+        ),
+        *_base_columns(),
+    )
+    metadata.create_all(engine)
+    with engine.begin() as db_conn:
+        db_conn.execute(
+            sa.text(
+                "INSERT INTO platform_users (hash_id, username, email,"
+                " pass_hash) VALUES (:id, 'user', 'user@mail.com', 'x')"
+            ),
+            {"id": USER_ID},
+        )
+        db_conn.execute(
+            sa.text(
+                "INSERT INTO sessions (id, platform_user_id)"
+                " VALUES (:session_id, :id)"
+            ),
+            {"session_id": SESSION_ID, "id": USER_ID},
+        )
+    yield engine
+    engine.dispose()
+
+
+def upgrade(script, engine, target):
+    config, directory = script
+    with engine.connect() as db_conn:
+        with EnvironmentContext(
+            config,
+            directory,
+            fn=lambda rev, _: directory._upgrade_revs(target, rev),
+        ) as env:
+            env.configure(
+                connection=db_conn,
+                render_as_batch=True,
+                transaction_per_migration=True,
+            )
+            with env.begin_transaction():
+                env.run_migrations()
+        db_conn.commit()
+
+
+class TestRevisions:
+    def test_single_chain(self, script):
+        _, directory = script
+        revisions = list(directory.walk_revisions())
+
+        assert directory.get_heads() == ["4c2d8e1f6a90"]
+        assert [
+            rev.revision for rev in revisions if not rev.down_revision
+        ] == ["1a7c3e5b9d02"]
+
+    def test_upgrade_existing_database(self, script, engine):
+        upgrade(script, engine, "4b1e7d9f3a46")
+        inspector = sa.inspect(engine)
+        session_columns = {
+            column["name"] for column in inspector.get_columns("sessions")
+        }
+        with engine.connect() as db_conn:
+            token_version = db_conn.execute(
+                sa.text("SELECT token_version FROM platform_users")
+            ).scalar()
+            session = db_conn.execute(
+                sa.text("SELECT create_date, last_seen FROM sessions")
+            ).one()
+
+        assert {
+            "refresh_hash",
+            "previous_refresh_hash",
+            "last_seen",
+        } <= session_columns
+        assert token_version == 0
+        assert session.last_seen == session.create_date
+        assert {
+            index["name"] for index in inspector.get_indexes("sessions")
+        } >= {"ix_sessions_create_date_id", "ix_sessions_platform_user_id"}
+
+    def test_compact_identifiers_sqlite(self, script, engine, monkeypatch):
+        monkeypatch.setattr(Settings, "COMPACT_IDS", True)
+        upgrade(script, engine, "4c2d8e1f6a90")
+        inspector = sa.inspect(engine)
+        with engine.connect() as db_conn:
+            user = db_conn.execute(
+                sa.text("SELECT id, hash_id FROM platform_users")
+            ).one()
+            session = db_conn.execute(
+                sa.text("SELECT id, platform_user_id FROM sessions")
+            ).one()
+
+        assert user.hash_id == bytes.fromhex(USER_ID)
+        assert session.id == bytes.fromhex(SESSION_ID)
+        assert session.platform_user_id == user.id
+        assert inspector.get_foreign_keys("sessions")[0][
+            "referred_columns"
+        ] == ["id"]
+        assert not inspector.has_table("sessions_legacy")
+
+    def test_compact_identifiers_irreversible(self, script):
+        _, directory = script
+        module = directory.get_revision("4c2d8e1f6a90").module
+
+        with pytest.raises(IrreversibleMigration):
+            module.downgrade()
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from app.helpers.admission import AdmissionGate
+from app.helpers.exceptions import DeadlineExceeded, ServiceOverloaded
+
+
+async def _hold(gate, priority, release, admitted, name):
+    async with gate.admit(priority):
+        admitted.append(name)
+        await release.wait()
+
+
+class TestAdmissionGate:
+    def test_queue_full_is_shed(self):
+        async def scenario():
+            gate = AdmissionGate(
+                "test", limit=1, queue_size=1, queue_timeout=1.0
+            )
+            release, admitted = asyncio.Event(), []
+            holder = asyncio.create_task(
+                _hold(gate, 0, release, admitted, "a")
+            )
+            queued = asyncio.create_task(
+                _hold(gate, 0, release, admitted, "b")
+            )
+            await asyncio.sleep(0)
+
+            with pytest.raises(ServiceOverloaded):
+                async with gate.admit():
+                    pass
+
+            release.set()
+            await asyncio.gather(holder, queued)
+            return gate, admitted
+
+        gate, admitted = asyncio.run(scenario())
+
+        assert admitted == ["a", "b"]
+        assert gate.active == 0
+
+    def test_queue_timeout_is_shed(self):
+        async def scenario():
+            gate = AdmissionGate(
+                "test", limit=1, queue_size=5, queue_timeout=0.01
+            )
+            release = asyncio.Event()
+            holder = asyncio.create_task(_hold(gate, 0, release, [], "a"))
+            await asyncio.sleep(0)
+
+            with pytest.raises(ServiceOverloaded) as exc:
+                async with gate.admit():
+                    pass
+
+            release.set()
+            await holder
+            return gate, exc.value
+
+        gate, exc = asyncio.run(scenario())
+
+        assert exc.retry_after == 0.01
+        assert gate.active == 0 and gate.queued == 0
+
+    def test_queue_wait_bounded_by_deadline(self):
+        async def scenario():
+            gate = AdmissionGate(
+                "test", limit=1, queue_size=5, queue_timeout=10.0
+            )
+            release = asyncio.Event()
+            holder = asyncio.create_task(_hold(gate, 0, release, [], "a"))
+            await asyncio.sleep(0)
+
+            with pytest.raises(DeadlineExceeded):
+                async with gate.admit(deadline=0.01):
+                    pass
+
+            release.set()
+            await holder
+            return gate
+
+        gate = asyncio.run(scenario())
+
+        assert gate.active == 0 and gate.queued == 0
+
+    def test_priority_admitted_first(self):
+        async def scenario():
+            gate = AdmissionGate(
+                "test", limit=1, queue_size=5, queue_timeout=1.0
+            )
+            release, admitted = asyncio.Event(), []
+            tasks = [
+                asyncio.create_task(_hold(gate, 0, release, admitted, "a"))
+            ]
+            await asyncio.sleep(0)
+            for priority, name in [(1, "anonymous"), (0, "authenticated")]:
+                tasks.append(
+                    asyncio.create_task(
+                        _hold(gate, priority, release, admitted, name)
+                    )
+                )
+            await asyncio.sleep(0)
+
+            release.set()
+            await asyncio.gather(*tasks)
+            return admitted
+
+        assert asyncio.run(scenario()) == ["a", "authenticated", "anonymous"]
@@ -0,0 +1,26 @@
+from app.helpers.bloom import BloomFilter
+
+
+class TestBloomFilter:
+    def test_no_false_negative(self):
+        bloom = BloomFilter(capacity=1000)
+        names = [f"user{i}" for i in range(1000)]
+        for name in names:
+            bloom.add(name)
+
+        assert all(name in bloom for name in names)
+        assert bloom.count == 1000
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"user{i}")
+
+        false_positives = sum(f"other{i}" in bloom for i in range(10_000))
+
+        assert false_positives < 300
+
+    def test_empty(self):
+        bloom = BloomFilter(capacity=0)
+
+        assert "user" not in bloom
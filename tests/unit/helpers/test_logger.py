@@ -0,0 +1,42 @@
+from app.helpers.logger import LogRateLimiter
+
+
+class TestLogRateLimiter:
+    def test_burst_then_sampled(self):
+        limiter = LogRateLimiter(
+            burst=3, window=60.0, sample_rate=5, max_keys=10
+        )
+        allowed = [limiter.acquire("jwt.expired")[0] for _ in range(13)]
+
+        # 3 burst messages, then 1 of every 5 (8th and 13th)
+        assert allowed.count(True) == 5
+        assert allowed[:3] == [True, True, True]
+        assert allowed[7] and allowed[12]
+
+    def test_keys_are_limited_separately(self):
+        limiter = LogRateLimiter(
+            burst=1, window=60.0, sample_rate=100, max_keys=10
+        )
+        limiter.acquire("a")
+
+        assert limiter.acquire("a") == (False, 0)
+        assert limiter.acquire("b") == (True, 0)
+
+    def test_suppressed_reported_on_next_window(self):
+        limiter = LogRateLimiter(
+            burst=1, window=60.0, sample_rate=100, max_keys=10
+        )
+        for _ in range(3):
+            limiter.acquire("a")
+        limiter.window = 0.0  # next message opens a new window
+
+        assert limiter.acquire("a") == (True, 2)
+
+    def test_max_keys_bounded(self):
+        limiter = LogRateLimiter(
+            burst=1, window=60.0, sample_rate=100, max_keys=2
+        )
+        for key in ["a", "b", "c"]:
+            limiter.acquire(key)
+
+        assert list(limiter._keys) == ["b", "c"]
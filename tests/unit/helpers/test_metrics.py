@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+import pytest
+
+from app.helpers.metrics import MetricsRegistry, _Metric
+
+
+def wait_for_dump(path, name, value):
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        if path.exists():
+            dump = json.loads(path.read_text())
+            if dump.get(name) == [[[], [value]]]:
+                return True
+        time.sleep(0.01)
+    return False
+
+
+class TestMetricsRegistry:
+    def test_render_counter_and_gauge(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("logins_total", "Logins", ["outcome"])
+        gauge = registry.gauge("in_flight", "In flight")
+        counter.inc("success")
+        counter.inc("success")
+        gauge.inc()
+
+        text = registry.render()
+
+        assert "# TYPE logins_total counter" in text
+        assert 'logins_total{outcome="success"} 2.0' in text
+        assert "in_flight 1.0" in text
+
+    def test_render_histogram(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency", "Latency", buckets=[1, 2])
+        histogram.observe(0.5)
+        histogram.observe(1.5)
+        histogram.observe(3)
+
+        text = registry.render()
+
+        assert 'latency_bucket{le="1"} 1.0' in text
+        assert 'latency_bucket{le="2"} 2.0' in text
+        assert 'latency_bucket{le="+Inf"} 3.0' in text
+        assert "latency_sum 5.0" in text
+        assert "latency_count 3.0" in text
+
+    def test_multiprocess_merge(self, tmp_path):
+        registry = MetricsRegistry(multiproc_dir=str(tmp_path))
+        counter = registry.counter("logins_total", "Logins")
+        gauge = registry.gauge("in_flight", "In flight")
+        counter.inc()
+        gauge.inc()
+
+        # dump of another worker that already exited
+        dead_pid = 2**22 + 1
+        (tmp_path / f"metrics_{dead_pid}.json").write_text(
+            '{"logins_total": [[[], [4.0]]], "in_flight": [[[], [3.0]]]}'
+        )
+
+        text = registry.render()
+
+        assert os.path.exists(tmp_path / f"metrics_{os.getpid()}.json")
+        assert "logins_total 5.0" in text
+        assert "in_flight 1.0" in text
+
+    def test_quiet_worker_flushed_in_background(self, tmp_path):
+        registry = MetricsRegistry(
+            multiproc_dir=str(tmp_path), flush_interval=0.01
+        )
+        counter = registry.counter("logins_total", "Logins")
+        dump = tmp_path / f"metrics_{os.getpid()}.json"
+        counter.inc()
+
+        assert wait_for_dump(dump, "logins_total", 1.0)
+        # last update before going quiet is flushed without another one
+        counter.inc()
+        assert wait_for_dump(dump, "logins_total", 2.0)
+
+    def test_metric_is_abstract(self):
+        with pytest.raises(TypeError):
+            _Metric(MetricsRegistry(), "metric", "Metric")
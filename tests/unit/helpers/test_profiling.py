@@ -0,0 +1,116 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+from app.helpers.profiling import (
+    RequestProfiler,
+    StackSampler,
+    sign_profile_header,
+)
+from app.helpers.tracing import RequestContext, span
+
+
+def _profiler(tmp_path, secret="secret", sample_rate=0.0, max_bytes=10**6):
+    return RequestProfiler(
+        directory=str(tmp_path),
+        secret=secret,
+        sample_rate=sample_rate,
+        interval=0.001,
+        max_bytes=max_bytes,
+    )
+
+
+class TestRequestProfiler:
+    def test_signed_header(self, tmp_path):
+        profiler = _profiler(tmp_path)
+
+        assert profiler.wants(sign_profile_header("secret"))
+        assert not profiler.wants(sign_profile_header("other"))
+        assert not profiler.wants(
+            sign_profile_header("secret", int(time.time()) - 3600)
+        )
+        assert not profiler.wants("")
+
+    def test_signed_header_disabled_without_secret(self, tmp_path):
+        profiler = _profiler(tmp_path, secret="")
+
+        assert not profiler.wants(sign_profile_header(""))
+
+    def test_sample_rate(self, tmp_path):
+        assert _profiler(tmp_path, sample_rate=1.0).wants("")
+
+    def test_profile_written_and_capped(self, tmp_path):
+        profiler = _profiler(tmp_path, max_bytes=1)
+        for req_id in ["first", "second"]:
+            sampler = profiler.start()
+            time.sleep(0.02)
+            path = profiler.finish(sampler, req_id)
+
+        profiles = list(tmp_path.glob("*.collapsed"))
+        assert profiles == [] or profiles == [path]
+        assert path is not None and path.name.endswith("_second.collapsed")
+
+
+class TestStackSampler:
+    def test_samples_threads_in_span(self):
+        # own context, the started request must not leak into other tests
+        stacks = contextvars.Context().run(self._sample_thread_in_span)
+
+        assert any("work (helpers/test_profiling.py" in s for s in stacks)
+
+    def _sample_thread_in_span(self):
+        RequestContext.start()
+        sampler = StackSampler(interval=0.001)
+        RequestContext.set_sampler(sampler)
+        sampler.start()
+
+        def work():
+            with span("work"):
+                time.sleep(0.05)
+
+        # threadpool workers run in a copy of the request context
+        ctx = contextvars.copy_context()
+        thread = threading.Thread(target=ctx.run, args=(work,))
+        thread.start()
+        thread.join()
+        stacks = sampler.stop()
+        RequestContext.set_sampler(None)
+        return stacks
+
+    def test_loop_thread_samples_only_request_tasks(self):
+        stacks = asyncio.run(self._serve_two_requests())
+
+        assert any("profiled_work (helpers/" in s for s in stacks)
+        assert any("spawned_work (helpers/" in s for s in stacks)
+        assert not any("other_work (helpers/" in s for s in stacks)
+
+    async def _serve_two_requests(self):
+        async def busy():
+            for _ in range(10):
+                time.sleep(0.003)
+                await asyncio.sleep(0)
+
+        async def other_work():
+            await busy()
+
+        async def spawned_work():
+            await busy()
+
+        async def profiled_work():
+            RequestContext.start()
+            sampler = StackSampler(interval=0.001)
+            RequestContext.set_sampler(sampler)
+            sampler.start()
+            # e.g. the endpoint task started by BaseHTTPMiddleware
+            spawned = asyncio.create_task(spawned_work())
+            await busy()
+            await spawned
+            RequestContext.set_sampler(None)
+            return sampler.stop()
+
+        # each task runs in its own copy of the context
+        other = asyncio.create_task(other_work())
+        stacks = await asyncio.create_task(profiled_work())
+        await other
+        return stacks
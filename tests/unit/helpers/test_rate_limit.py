@@ -0,0 +1,250 @@
+import hashlib
+import socketserver
+import threading
+import time
+
+import pytest
+
+from app.helpers.exceptions import TooManyClientRequest
+from app.helpers.rate_limit import (
+    MemoryBackend,
+    NullBackend,
+    RateLimiter,
+    RateLimitBackend,
+    RedisBackend,
+    RedisError,
+    SQLiteBackend,
+    create_backend,
+    refill,
+)
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """RESP server running the bucket script in python."""
+
+    def handle(self):
+        server = self.server
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2].decode())
+            server.commands.append(args)
+            if server.drop_next:
+                server.drop_next = False
+                return
+            self.wfile.write(server.reply(args))
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeRedisHandler)
+        self.commands = []
+        self.scripts = set()
+        self.buckets = {}
+        self.drop_next = False
+
+    def reply(self, args):
+        name = args[0].upper()
+        if name in ("AUTH", "SELECT"):
+            return b"+OK\r\n"
+        if name == "SCRIPT":
+            sha = hashlib.sha1(args[2].encode()).hexdigest()
+            self.scripts.add(sha)
+            return bulk(sha)
+        if name == "EVALSHA" and args[1] not in self.scripts:
+            return b"-NOSCRIPT No matching script\r\n"
+        if name in ("EVAL", "EVALSHA"):
+            return bulk(str(self.take(args[3], *map(float, args[4:6]))))
+        if name == "SCAN":
+            keys = [
+                key for key in self.buckets if key.startswith("ratelimit:")
+            ]
+            return (
+                b"*2\r\n"
+                + bulk("0")
+                + b"*%d\r\n" % len(keys)
+                + (b"".join(bulk(key) for key in keys))
+            )
+        if name == "DEL":
+            for key in args[1:]:
+                self.buckets.pop(key, None)
+            return b":%d\r\n" % (len(args) - 1)
+        return b"-ERR unknown command\r\n"
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        tokens, updated = self.buckets.get(key, (capacity, now))
+        tokens = refill(tokens, updated, now, capacity, rate)
+        retry = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        return retry
+
+
+def bulk(value):
+    data = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+@pytest.fixture
+def redis_server():
+    server = FakeRedis()
+    thread = threading.Thread(
+        target=server.serve_forever, args=(0.01,), daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FailingBackend(RateLimitBackend):
+    def take(self, key, capacity, rate):
+        raise ConnectionError("backend down")
+
+    def reset(self):
+        pass
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "rate_limit.db"))
+    return MemoryBackend()
+
+
+class TestRateLimitBackend:
+    def test_burst_then_retry_after(self, backend):
+        retries = [backend.take("ip", capacity=3, rate=1.0) for _ in range(4)]
+
+        assert retries[:3] == [0.0, 0.0, 0.0]
+        assert 0 < retries[3] <= 1.0
+
+    def test_keys_are_limited_separately(self, backend):
+        backend.take("a", capacity=1, rate=0.01)
+
+        assert backend.take("a", capacity=1, rate=0.01) > 0
+        assert backend.take("b", capacity=1, rate=0.01) == 0
+
+    def test_reset(self, backend):
+        backend.take("a", capacity=1, rate=0.01)
+        backend.reset()
+
+        assert backend.take("a", capacity=1, rate=0.01) == 0
+
+    def test_memory_max_keys_bounded(self):
+        backend = MemoryBackend(max_keys=2)
+        for key in ["a", "b", "c"]:
+            backend.take(key, capacity=1, rate=0.01)
+
+        assert list(backend._buckets) == ["b", "c"]
+
+
+class TestRateLimiter:
+    def test_hit_raises_when_exhausted(self):
+        limiter = RateLimiter(MemoryBackend())
+        limiter.hit("ip", capacity=1, per_seconds=60)
+
+        with pytest.raises(TooManyClientRequest) as exc:
+            limiter.hit("ip", capacity=1, per_seconds=60)
+        assert exc.value.retry_after > 0
+
+    def test_hit_fails_open(self):
+        limiter = RateLimiter(FailingBackend())
+
+        limiter.hit("ip", capacity=1, per_seconds=60)
+        limiter.hit("ip", capacity=1, per_seconds=60)
+
+    def test_create_backend(self, tmp_path):
+        assert isinstance(create_backend("memory://"), MemoryBackend)
+        assert isinstance(create_backend("none://"), NullBackend)
+        assert isinstance(
+            create_backend(f"sqlite://{tmp_path}/rl.db"), SQLiteBackend
+        )
+        assert isinstance(create_backend("redis://cache:6380/1"), RedisBackend)
+
+    @pytest.mark.parametrize(
+        "url", ["rediss://cache:6379", "redis:/", "sqlite://", "memcache://"]
+    )
+    def test_create_backend_rejects_invalid_url(self, url):
+        with pytest.raises(ValueError):
+            create_backend(url)
+
+    def test_backend_is_abstract(self):
+        with pytest.raises(TypeError):
+            RateLimitBackend()
+
+
+class TestRedisBackend:
+    def test_burst_then_retry_after(self, redis_server):
+        backend = RedisBackend(*redis_server.server_address)
+        retries = [backend.take("ip", capacity=2, rate=1.0) for _ in range(3)]
+
+        assert retries[:2] == [0.0, 0.0]
+        assert 0 < retries[2] <= 1.0
+        assert "ratelimit:ip" in redis_server.buckets
+
+    def test_auth_and_select_on_connect(self, redis_server):
+        host, port = redis_server.server_address
+        backend = create_backend(f"redis://:secret@{host}:{port}/2")
+        backend.take("ip", capacity=1, rate=1.0)
+
+        assert redis_server.commands[:2] == [
+            ["AUTH", "secret"],
+            ["SELECT", "2"],
+        ]
+
+    def test_noscript_falls_back_to_eval(self, redis_server):
+        backend = RedisBackend(*redis_server.server_address)
+        backend.take("ip", capacity=5, rate=1.0)
+        redis_server.scripts.clear()  # SCRIPT FLUSH or server restart
+
+        assert backend.take("ip", capacity=5, rate=1.0) == 0.0
+        assert [args[0] for args in redis_server.commands] == [
+            "SCRIPT",
+            "EVALSHA",
+            "EVALSHA",
+            "EVAL",
+        ]
+
+    def test_reset_deletes_buckets(self, redis_server):
+        backend = RedisBackend(*redis_server.server_address)
+        backend.take("a", capacity=1, rate=0.01)
+        backend.take("b", capacity=1, rate=0.01)
+        backend.reset()
+
+        assert redis_server.buckets == {}
+        assert backend.take("a", capacity=1, rate=0.01) == 0.0
+
+    def test_error_reply_raised(self, redis_server):
+        backend = RedisBackend(*redis_server.server_address)
+
+        with pytest.raises(RedisError, match="unknown command"):
+            backend._command("FLUSHALL")
+
+    def test_reconnects_after_connection_lost(self, redis_server):
+        backend = RedisBackend(*redis_server.server_address)
+        backend.take("ip", capacity=5, rate=1.0)
+        redis_server.drop_next = True
+
+        with pytest.raises(ConnectionError):
+            backend.take("ip", capacity=5, rate=1.0)
+        assert backend.take("ip", capacity=5, rate=1.0) == 0.0
+
+    def test_unreachable_server_fails_open(self, redis_server):
+        host, port = redis_server.server_address
+        redis_server.shutdown()
+        redis_server.server_close()
+        limiter = RateLimiter(RedisBackend(host, port))
+
+        limiter.hit("ip", capacity=1, per_seconds=60)
@@ -0,0 +1,52 @@
+import json
+
+from app.helpers.response import (
+    BaseFailResponse,
+    FailResponseBody,
+    FastJSONResponse,
+    PostSuccessResponse,
+    conditional_response,
+    etag_matches,
+    fail_response,
+)
+
+
+class TestResponse:
+    def test_prerendered_fail_body(self):
+        FailResponseBody.prerender("Prerendered detail")
+        response = fail_response("Prerendered detail", status_code=401)
+
+        assert response.status_code == 401
+        assert response.headers["content-type"] == "application/json"
+        assert json.loads(response.body) == (
+            BaseFailResponse(detail="Prerendered detail").model_dump()
+        )
+
+    def test_fail_body_not_prerendered(self):
+        response = fail_response("Dynamic detail", status_code=400)
+
+        assert json.loads(response.body)["detail"] == "Dynamic detail"
+
+    def test_fast_json_response_accepts_model(self):
+        content = PostSuccessResponse(data={"username": "superuser"})
+        response = FastJSONResponse(content=content)
+
+        assert json.loads(response.body) == content.model_dump()
+
+    def test_conditional_response(self):
+        content = PostSuccessResponse(data={"username": "superuser"})
+        response = conditional_response(content, None)
+        etag = response.headers["etag"]
+        not_modified = conditional_response(content, f'W/{etag}, "other"')
+
+        assert response.status_code == 200
+        assert json.loads(response.body) == content.model_dump()
+        assert etag.startswith('"') and etag.endswith('"')
+        assert not_modified.status_code == 304
+        assert not_modified.body == b""
+        assert not_modified.headers["etag"] == etag
+
+    def test_etag_matches(self):
+        assert etag_matches("*", '"a"')
+        assert not etag_matches('"b"', '"a"')
+        assert not etag_matches(None, '"a"')
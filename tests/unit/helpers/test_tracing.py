@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import functools
+
+from app.helpers.tracing import (
+    RequestContext,
+    server_timing_header,
+    span,
+    traced,
+)
+
+
+def isolated(test):
+    """Run the test in a copy of the context, its request must not leak."""
+
+    @functools.wraps(test)
+    def run(*args, **kwargs):
+        return contextvars.copy_context().run(test, *args, **kwargs)
+
+    return run
+
+
+class TestRequestContext:
+    def test_phase_outside_request_is_ignored(self):
+        with span("outside"):
+            pass
+
+        assert "outside" not in RequestContext.phases()
+
+    @isolated
+    def test_repeated_phase_is_summed(self):
+        RequestContext.start()
+        RequestContext.add_phase("db", 0.5)
+        RequestContext.add_phase("db", 0.25)
+
+        assert RequestContext.phases() == {"db": 0.75}
+
+    @isolated
+    def test_counts(self):
+        RequestContext.start()
+        RequestContext.add_count("db_statements")
+        RequestContext.add_count("db_statements", 2)
+
+        assert RequestContext.counts() == {"db_statements": 3}
+
+    @isolated
+    def test_deadline(self):
+        RequestContext.start()
+        assert RequestContext.remaining() is None
+
+        RequestContext.set_deadline(5)
+        assert 4 < RequestContext.remaining() <= 5
+
+        RequestContext.clear_deadline()
+        assert RequestContext.remaining() is None
+
+    @isolated
+    def test_traced_records_phase(self):
+        @traced("unit.work")
+        def work(value):
+            return value * 2
+
+        RequestContext.start()
+        assert work(2) == 4
+        assert "unit.work" in RequestContext.phases()
+
+    def test_concurrent_requests_are_isolated(self):
+        async def handle(name):
+            req_id = RequestContext.start()
+            await asyncio.sleep(0.01)
+            RequestContext.add_phase(name, 1.0)
+            await asyncio.sleep(0.01)
+            return req_id, RequestContext.req_id(), RequestContext.phases()
+
+        async def main():
+            return await asyncio.gather(handle("a"), handle("b"))
+
+        (id_a, seen_a, phases_a), (id_b, seen_b, phases_b) = asyncio.run(
+            main()
+        )
+
+        assert id_a != id_b
+        assert seen_a == id_a and seen_b == id_b
+        assert phases_a == {"a": 1.0}
+        assert phases_b == {"b": 1.0}
+
+    def test_server_timing_header(self):
+        header = server_timing_header({"db": 0.0015}, 0.002)
+
+        assert header == "db;dur=1.500, total;dur=2.000"
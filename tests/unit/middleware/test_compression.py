@@ -0,0 +1,103 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.compression import CompressionMiddleware, accepts_gzip
+
+BIG_JSON = b'{"data": "' + b"x" * 4096 + b'"}'
+LINES = [b'{"line": %d}\n' % i for i in range(500)]
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, min_size=1024)
+
+
+@app.get("/big")
+async def big() -> Response:
+    return Response(
+        BIG_JSON, media_type="application/json", headers={"ETag": '"v1"'}
+    )
+
+
+@app.get("/small")
+async def small() -> Response:
+    return Response(b'{"ok": true}', media_type="application/json")
+
+
+@app.get("/image")
+async def image() -> Response:
+    return Response(b"\x89PNG" * 1024, media_type="image/png")
+
+
+@app.get("/stream")
+async def stream() -> StreamingResponse:
+    return StreamingResponse(iter(LINES), media_type="application/x-ndjson")
+
+
+@app.get("/small-stream")
+async def small_stream() -> StreamingResponse:
+    return StreamingResponse(iter(LINES[:3]), media_type="application/json")
+
+
+client = TestClient(app)
+
+
+class TestCompressionMiddleware:
+    def test_large_body_compressed(self):
+        response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(BIG_JSON)
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == 'W/"v1"'
+        assert response.content == BIG_JSON
+
+    def test_small_body_not_compressed(self):
+        response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+
+    def test_not_accepted(self):
+        response = client.get("/big", headers={"Accept-Encoding": "identity"})
+
+        assert "content-encoding" not in response.headers
+        assert response.headers["etag"] == '"v1"'
+        assert response.content == BIG_JSON
+
+    def test_content_type_not_listed(self):
+        response = client.get("/image", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+        assert "vary" not in response.headers
+
+    def test_stream_compressed(self):
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.content == b"".join(LINES)
+
+    def test_small_stream_not_compressed(self):
+        response = client.get(
+            "/small-stream", headers={"Accept-Encoding": "gzip"}
+        )
+
+        assert "content-encoding" not in response.headers
+        assert response.content == b"".join(LINES[:3])
+
+    @pytest.mark.parametrize(
+        "accept_encoding, result",
+        [
+            ("gzip, deflate, br", True),
+            ("br;q=1.0, gzip;q=0.8", True),
+            ("gzip;q=0", False),
+            ("*", True),
+            ("*;q=0, gzip", True),
+            ("gzip;q=0, *", False),
+            ("identity", False),
+            ("", False),
+        ],
+    )
+    def test_accepts_gzip(self, accept_encoding, result):
+        assert accepts_gzip(accept_encoding) is result
@@ -0,0 +1,57 @@
+import pytest
+from starlette.requests import Request
+
+from app.helpers.tracing import RequestContext
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.deadline import DeadlineMiddleware
+
+
+def _request(timeout=None):
+    headers = []
+    if timeout is not None:
+        headers.append((b"x-request-timeout", timeout.encode()))
+    return Request({"type": "http", "headers": headers})
+
+
+@pytest.fixture
+def deadlines():
+    middleware = DeadlineMiddleware()
+    middleware.timeouts = {
+        AdmissionMiddleware.HEAVY: 15.0,
+        AdmissionMiddleware.DEFAULT: 10.0,
+    }
+    middleware.max_timeout = 30.0
+    yield middleware
+    RequestContext.clear_deadline()
+
+
+class TestDeadlineMiddleware:
+    @pytest.mark.parametrize(
+        "route_class, header, expected",
+        [
+            (AdmissionMiddleware.HEAVY, None, 15),
+            (AdmissionMiddleware.DEFAULT, None, 10),
+            (AdmissionMiddleware.DEFAULT, "2.5", 2.5),
+            # capped
+            (AdmissionMiddleware.DEFAULT, "600", 30),
+            # invalid, configured one kept
+            (AdmissionMiddleware.DEFAULT, "soon", 10),
+            (AdmissionMiddleware.DEFAULT, "0", 10),
+            (AdmissionMiddleware.DEFAULT, "nan", 10),
+        ],
+    )
+    def test_deadline(self, deadlines, route_class, header, expected):
+        deadlines.start_req(_request(header), route_class)
+
+        assert expected - 1 < RequestContext.remaining() <= expected
+
+    def test_no_deadline_for_health(self, deadlines):
+        deadlines.start_req(_request("1"), None)
+
+        assert RequestContext.remaining() is None
+
+    def test_lifted_when_finished(self, deadlines):
+        deadlines.start_req(_request(), AdmissionMiddleware.DEFAULT)
+        deadlines.finish_req()
+
+        assert RequestContext.remaining() is None
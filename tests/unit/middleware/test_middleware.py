@@ -0,0 +1,93 @@
+import asyncio
+
+from app.main import app as fastapi_app
+from app.middleware import Middlewares
+from app.middleware.admission import AdmissionMiddleware
+
+
+def _scope(path, headers=()):
+    return {
+        "type": "http",
+        # route templates of the metrics are looked up on it
+        "app": fastapi_app,
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": list(headers),
+        "client": ("127.0.0.1", 40000),
+        "server": ("testserver", 80),
+    }
+
+
+async def _call(app, scope):
+    """Run `app` for one request, return the sent messages."""
+    sent = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # the client never goes away
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+class TestAdmission:
+    def test_slot_held_until_body_is_sent(self):
+        gate = Middlewares.ADMISSION.gates[AdmissionMiddleware.HEAVY]
+        active = []
+
+        async def streaming(scope, receive, send):
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [],
+            })
+            for chunk in [b"a", b"b", b""]:
+                active.append(gate.active)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": bool(chunk),
+                })
+
+        sent = asyncio.run(
+            _call(Middlewares(streaming), _scope("/v1/auth/register"))
+        )
+
+        assert sent[0]["status"] == 200
+        assert active == [1, 1, 1]
+        assert gate.active == 0
+
+    def test_shed_before_authentication(self, monkeypatch):
+        gate = Middlewares.ADMISSION.gates[AdmissionMiddleware.DEFAULT]
+        monkeypatch.setattr(gate, "limit", 0)
+        monkeypatch.setattr(gate, "queue_size", 0)
+        authenticated = []
+        monkeypatch.setattr(
+            Middlewares.SECURITY,
+            "authenticate_user",
+            lambda **kwargs: authenticated.append(kwargs),
+        )
+
+        async def endpoint(scope, receive, send):
+            raise AssertionError("shed request reached the endpoint")
+
+        scope = _scope(
+            "/v1/auth/logout", [(b"authorization", b"Bearer token")]
+        )
+        sent = asyncio.run(_call(Middlewares(endpoint), scope))
+
+        assert sent[0]["status"] == 503
+        assert authenticated == []
+        assert gate.active == 0
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import bindparam, text
+
+from app.db import db
+from app.db.ids import ID_TYPE, USER_REF
+from app.v1.session import SessionRepository
+from app.v1.session.activity import ActivityBuffer
+
+USER_ID = "4f0fa05a8ff04892833fe56e7316ce30"
+
+
+class FailingRepository:
+    def update_last_seen(self, last_seen):
+        raise RuntimeError("db is down")
+
+
+class TestActivityBuffer:
+    @pytest.fixture
+    def repo(self):
+        repo = SessionRepository(db)
+        yield repo
+        with db.engine.begin() as db_conn:
+            db_conn.execute(
+                text(
+                    f"DELETE FROM sessions WHERE platform_user_id = {USER_REF}"
+                ).bindparams(bindparam("user_id", type_=ID_TYPE)),
+                {"user_id": USER_ID},
+            )
+
+    def test_touch_coalesces(self, repo):
+        buffer = ActivityBuffer(repo)
+        first, last = datetime(2024, 1, 1), datetime(2024, 1, 2)
+        buffer.touch("session", now=first)
+        buffer.touch("session", now=last)
+
+        assert buffer.pending("session") == last
+        assert len(buffer._pending) == 1
+        buffer.close()
+
+    def test_flush_writes_last_seen(self, repo):
+        session_id = str(repo.create_new_session(USER_ID).id)
+        buffer = ActivityBuffer(repo)
+        seen = datetime.now().replace(microsecond=0)
+        buffer.touch(session_id, now=seen)
+
+        assert buffer.flush() == 1
+        assert buffer.pending(session_id) is None
+        assert repo.get_session_by_session_id(session_id).last_seen == seen
+
+        # an older time from another worker does not move it back
+        buffer.touch(session_id, now=seen - timedelta(minutes=1))
+        buffer.close()
+
+        assert repo.get_session_by_session_id(session_id).last_seen == seen
+
+    def test_flush_when_full(self, repo):
+        session_id = str(repo.create_new_session(USER_ID).id)
+        buffer = ActivityBuffer(repo, flush_size=1)
+        buffer.touch(session_id)
+
+        assert buffer.pending(session_id) is None
+        assert repo.get_session_by_session_id(session_id).last_seen
+        buffer.close()
+
+    def test_bounded_memory(self, repo):
+        buffer = ActivityBuffer(repo, max_entries=2)
+        for session_id in ("first", "second", "third"):
+            buffer.touch(session_id)
+
+        assert buffer.pending("first") is None
+        assert list(buffer._pending) == ["second", "third"]
+        buffer.close()
+
+    def test_failed_flush_is_retried(self):
+        buffer = ActivityBuffer(FailingRepository())  # type: ignore
+        buffer.touch("session")
+
+        assert buffer.flush() == 0
+        assert buffer.pending("session") is not None
+        buffer.close()
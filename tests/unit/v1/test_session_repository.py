@@ -1,8 +1,9 @@
 import pytest
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
 from app.db import db
+from app.db.ids import ID_TYPE, USER_REF
 from app.v1.session.repository import SessionRepository
 from tests.unit.data_session_repository import (
     CREATE_SESSION,
@@ -27,15 +28,23 @@ class TestSessionRepository:
 
         assert isinstance(session, type)
         assert isinstance(session.id, str)
-        assert session.platform_user_id == user_id
         assert session.is_active == 1
 
         with db.engine.connect() as db_conn:
+            # the user hash id, or its integer id with COMPACT_IDS
+            user_ref = db_conn.execute(
+                text(f"SELECT {USER_REF}").bindparams(
+                    bindparam("user_id", type_=ID_TYPE)
+                ),
+                {"user_id": user_id},
+            ).scalar()
             query = text(
                 """
                 DELETE FROM sessions
                 WHERE sessions.id = :session_id
             """
-            )
+            ).bindparams(bindparam("session_id", type_=ID_TYPE))
             db_conn.execute(query, {"session_id": session.id})
             db_conn.commit()
+
+        assert session.platform_user_id == user_ref
@@ -1,8 +1,11 @@
+from datetime import datetime, timedelta
+
 import pytest
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
 from app.db import db
+from app.db.ids import ID_TYPE, USER_REF
 from app.helpers.exceptions import ConflictClientRequest
 from app.v1.session import SessionRepository, SessionService
 from tests.unit.data_session_service import (
@@ -15,11 +18,11 @@ from tests.unit.data_session_service import (
 def delete_session(user_id):
     with db.engine.connect() as db_conn:
         query = text(
-            """
+            f"""
             DELETE FROM sessions
-            WHERE sessions.platform_user_id = :user_id
+            WHERE sessions.platform_user_id = {USER_REF}
         """
-        )
+        ).bindparams(bindparam("user_id", type_=ID_TYPE))
         db_conn.execute(query, {"user_id": user_id})
         db_conn.commit()
 
@@ -53,3 +56,28 @@ class TestSessionSercice:
         assert str(exc_info.value) == result
 
         delete_session(user_id)
+
+    @pytest.mark.parametrize("user_id", CREATE_SESSION_SUCCESS)
+    def test_idle_session_is_replaced(self, gen_service, user_id):
+        session_id = gen_service.create_session(user_id)
+        with db.engine.begin() as db_conn:
+            db_conn.execute(
+                text(
+                    """
+                    UPDATE sessions
+                    SET create_date = :long_ago
+                    WHERE id = :sess_id
+                """
+                ).bindparams(bindparam("sess_id", type_=ID_TYPE)),
+                {
+                    "sess_id": session_id,
+                    "long_ago": datetime.now() - timedelta(days=1),
+                },
+            )
+        session = gen_service.get_user_session(sess_id=session_id)
+
+        assert gen_service.is_idle(session)
+        assert gen_service.create_session(user_id) != session_id
+        assert gen_service.get_user_session(sess_id=session_id) is None
+
+        delete_session(user_id)
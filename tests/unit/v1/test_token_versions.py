@@ -0,0 +1,35 @@
+from app.v1.auth.versions import TokenVersionCache
+
+
+class TestTokenVersionCache:
+    def test_get_set(self):
+        versions = TokenVersionCache(ttl=60)
+        versions.set("user", 3)
+
+        assert versions.get("user") == 3
+        assert versions.get("other") is None
+
+    def test_expired(self):
+        versions = TokenVersionCache(ttl=-1)
+        versions.set("user", 3)
+
+        assert versions.get("user") is None
+
+    def test_invalidate(self):
+        versions = TokenVersionCache(ttl=60)
+        versions.set("user", 3)
+        versions.set("other", 1)
+        versions.invalidate(["user", "unknown"])
+
+        assert versions.get("user") is None
+        assert versions.get("other") == 1
+
+    def test_bounded(self):
+        versions = TokenVersionCache(ttl=60, max_entries=2)
+        versions.set("first", 1)
+        versions.set("second", 1)
+        versions.get("first")
+        versions.set("third", 1)
+
+        assert versions.get("second") is None
+        assert versions.get("first") == 1
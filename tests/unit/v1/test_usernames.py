@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+from sqlalchemy.exc import OperationalError
+
+from app.v1.auth.usernames import UsernameFilter
+
+
+class FakeAuthRepository:
+    """Users of the db shared by every worker."""
+
+    def __init__(self, *usernames):
+        self.users = []
+        self.down = False
+        for username in usernames:
+            self.register(username)
+
+    def register(self, username):
+        self.users.append(
+            SimpleNamespace(id=len(self.users) + 1, username=username)
+        )
+
+    def count_users(self):
+        self._check()
+        return len(self.users)
+
+    def iter_usernames(self, after_id=0):
+        self._check()
+        return [user for user in self.users if user.id > after_id]
+
+    def _check(self):
+        if self.down:
+            raise OperationalError("SELECT", {}, Exception("unreachable"))
+
+
+class TestUsernameFilter:
+    def test_names_of_other_workers_refreshed(self):
+        repo = FakeAuthRepository("alice")
+        usernames = UsernameFilter(repo, refresh_interval=0)
+        usernames.update()
+        # registered through another worker
+        repo.register("Bob")
+
+        assert usernames.maybe_taken("ALICE")
+        assert usernames.maybe_taken("bob")
+        assert not usernames.maybe_taken("carol")
+
+    def test_refresh_waits_for_interval(self):
+        repo = FakeAuthRepository("alice")
+        usernames = UsernameFilter(repo, refresh_interval=60)
+        usernames.update()
+        repo.register("bob")
+
+        assert not usernames.maybe_taken("bob")
+
+    def test_reread_names_counted_once(self):
+        repo = FakeAuthRepository("alice", "bob")
+        usernames = UsernameFilter(repo, refresh_interval=0)
+        usernames.update()
+        for _ in range(3):
+            usernames.update()
+
+        assert usernames._filter.count == 2
+
+    def test_db_unreachable(self):
+        repo = FakeAuthRepository("alice")
+        repo.down = True
+        usernames = UsernameFilter(repo, refresh_interval=0)
+        # startup does not fail, every name is left to the db
+        usernames.update()
+        assert usernames.maybe_taken("carol")
+
+        repo.down = False
+        assert not usernames.maybe_taken("carol")
+        assert usernames.maybe_taken("alice")